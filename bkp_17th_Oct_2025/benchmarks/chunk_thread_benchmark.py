@@ -0,0 +1,258 @@
+"""
+Chunk Thread Benchmark for AIVA MCP Server
+
+Compares the two ways of documenting a chunked file:
+
+- per-chunk: every chunk is a standalone prompt in its own agent thread
+  (current default, chunks run concurrently)
+- shared-thread: all chunks are turns of one agent thread; the instruction
+  block and file skeleton are sent once (CHUNK_SHARED_THREAD=true)
+
+By default the agent service is simulated by an in-memory client with a virtual
+clock, so the benchmark is deterministic and needs no Azure access. Like the real
+service, a run reads the WHOLE thread (earlier prompts and answers), so prompt
+tokens are counted from the thread history. Use --live to run against the agent
+configured in the environment instead (real latency and reported token usage).
+
+Usage:
+    python benchmarks/chunk_thread_benchmark.py [file] [--chunks 6] [--concurrency 4] [--live]
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import itertools
+from types import SimpleNamespace
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import azure_client  # noqa: E402
+from utils.token_counter import get_token_counter  # noqa: E402
+from utils.code_documentation_helper import (  # noqa: E402
+    ANALYSIS_INSTRUCTION,
+    CHUNK_MAX_CONCURRENCY,
+    FILE_SKELETON_INSTRUCTION,
+    _build_chunk_prompt,
+    _build_thread_prompts,
+    create_file_skeleton,
+    split_code_intelligently,
+)
+
+DEFAULT_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "Test2", "trunkreceive-service.ts")
+
+# Simulated service latencies (seconds)
+THREAD_CREATE_LATENCY = 0.25
+MESSAGE_CREATE_LATENCY = 0.05
+UPLOAD_SECONDS_PER_KB = 0.002
+RUN_QUEUE_LATENCY = 1.0
+PREFILL_TOKENS_PER_SECOND = 20000
+OUTPUT_TOKENS_PER_SECOND = 60
+# Documented code is longer than the source it documents
+OUTPUT_EXPANSION = 1.3
+# Long runs are expected when documenting big chunks; do not let the default timeout cut them off
+RUN_TIMEOUT = 3600
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the same counter the chunker uses for its budgets."""
+    return get_token_counter().count(text)
+
+
+class VirtualClock:
+    """Per-thread virtual clock replacing time.monotonic/time.sleep of the agent client."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.now = 0.0
+
+    def monotonic(self) -> float:
+        return getattr(self._local, "now", 0.0)
+
+    def sleep(self, seconds: float):
+        self._local.now = self.monotonic() + max(0.0, seconds)
+
+
+class SimulatedAgentsClient:
+    """In-memory stand-in for AIProjectClient.agents with thread-history token accounting."""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self._threads: Dict[str, List[str]] = {}
+        self._runs: Dict[str, SimpleNamespace] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.uploaded_bytes = 0
+        self.threads = SimpleNamespace(create=self._create_thread)
+        self.messages = SimpleNamespace(create=self._create_message, list=self._list_messages)
+        self.runs = SimpleNamespace(create=self._create_run, get=self._get_run)
+
+    def _create_thread(self):
+        self.clock.sleep(THREAD_CREATE_LATENCY)
+        thread_id = f"thread_{next(self._ids)}"
+        with self._lock:
+            self._threads[thread_id] = []
+        return SimpleNamespace(id=thread_id)
+
+    def _create_message(self, thread_id: str, role: str, content: str):
+        size = len(content.encode("utf-8"))
+        self.clock.sleep(MESSAGE_CREATE_LATENCY + size / 1024 * UPLOAD_SECONDS_PER_KB)
+        with self._lock:
+            self.uploaded_bytes += size
+            self._threads[thread_id].append(content)
+
+    def _create_run(self, thread_id: str, agent_id: str):
+        history = self._threads[thread_id]
+        prompt = history[-1]
+        code = prompt.split("## Code to Analyze:")[-1]
+        answer = "### PART 1: CHUNK ANALYSIS\nSimulated analysis.\n\n### PART 2: DOCUMENTED CODE\n```\n" + code + "\n```"
+        prompt_tokens = sum(count_tokens(message) for message in history)
+        completion_tokens = int(count_tokens(code) * OUTPUT_EXPANSION)
+        duration = (RUN_QUEUE_LATENCY + prompt_tokens / PREFILL_TOKENS_PER_SECOND
+                    + completion_tokens / OUTPUT_TOKENS_PER_SECOND)
+        run = SimpleNamespace(
+            id=f"run_{next(self._ids)}", thread_id=thread_id, status="queued", last_error=None,
+            done_at=self.clock.monotonic() + duration, answer=answer,
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        )
+        with self._lock:
+            self._runs[run.id] = run
+        return run
+
+    def _get_run(self, thread_id: str, run_id: str):
+        run = self._runs[run_id]
+        if run.status != "completed" and self.clock.monotonic() >= run.done_at:
+            run.status = "completed"
+            with self._lock:
+                self._threads[thread_id].append(run.answer)
+        elif run.status == "queued":
+            run.status = "in_progress"
+        return run
+
+    def _list_messages(self, thread_id: str, order: str = "desc", limit: int = 1):
+        text = SimpleNamespace(text=SimpleNamespace(value=self._threads[thread_id][-1]))
+        return [SimpleNamespace(text_messages=[text])]
+
+
+def makespan(durations: List[float], workers: int) -> float:
+    """Wall time of running the durations in order on a pool of ``workers`` threads."""
+    finish_times = [0.0] * max(1, workers)
+    for duration in durations:
+        slot = finish_times.index(min(finish_times))
+        finish_times[slot] += duration
+    return max(finish_times)
+
+
+def build_prompts(code: str, target_chunks: int):
+    """Split the file like the chunking path does and build the prompts of both modes."""
+    instruction_part = ANALYSIS_INSTRUCTION
+    skeleton = create_file_skeleton(code)
+    chunk_size = max(1000, len(code) // target_chunks + 1)
+    chunks = split_code_intelligently(code, chunk_size, first_chunk_size=chunk_size)
+    file_context = FILE_SKELETON_INSTRUCTION.format(total_chunks=len(chunks), skeleton=skeleton) if skeleton else ""
+    per_chunk = [_build_chunk_prompt(i, chunk, len(chunks), instruction_part, file_context)
+                 for i, chunk in enumerate(chunks)]
+    shared = _build_thread_prompts(chunks, instruction_part, file_context)
+    return per_chunk, shared
+
+
+def run_simulated(per_chunk: List[str], shared: List[str], concurrency: int) -> Dict[str, Dict]:
+    """Run both modes against the simulated service."""
+    clock = VirtualClock()
+    azure_client.time = SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep)
+    results = {}
+
+    manager = azure_client.AzureAIProjectManager()
+    manager.project_endpoint = "simulated"
+    agents = SimulatedAgentsClient(clock)
+    manager._client = SimpleNamespace(agents=agents)
+    durations = []
+    for prompt in per_chunk:
+        clock.reset()
+        manager.run_agent(prompt, agent_id="simulated", timeout=RUN_TIMEOUT)
+        durations.append(clock.monotonic())
+    results["per-chunk"] = dict(
+        manager.get_usage_stats(), uploaded_bytes=agents.uploaded_bytes,
+        latency_sequential=makespan(durations, 1), latency_concurrent=makespan(durations, concurrency)
+    )
+
+    manager = azure_client.AzureAIProjectManager()
+    manager.project_endpoint = "simulated"
+    agents = SimulatedAgentsClient(clock)
+    manager._client = SimpleNamespace(agents=agents)
+    clock.reset()
+    manager.run_agent_thread(shared, agent_id="simulated", timeout=RUN_TIMEOUT)
+    latency = clock.monotonic()
+    results["shared-thread"] = dict(
+        manager.get_usage_stats(), uploaded_bytes=agents.uploaded_bytes,
+        latency_sequential=latency, latency_concurrent=latency
+    )
+    azure_client.time = time
+    return results
+
+
+def run_live(per_chunk: List[str], shared: List[str], concurrency: int) -> Dict[str, Dict]:
+    """Run both modes against the Code Documenter Agent configured in the environment."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    agent_id = os.getenv("CODE_DOCUMENTER_AGENT_ID", "")
+    results = {}
+
+    manager = azure_client.AzureAIProjectManager()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda prompt: manager.run_agent(prompt, agent_id=agent_id, timeout=RUN_TIMEOUT), per_chunk))
+    latency = time.monotonic() - start
+    results["per-chunk"] = dict(
+        manager.get_usage_stats(), uploaded_bytes=sum(len(p.encode("utf-8")) for p in per_chunk),
+        latency_sequential=float("nan"), latency_concurrent=latency
+    )
+
+    manager = azure_client.AzureAIProjectManager()
+    start = time.monotonic()
+    manager.run_agent_thread(shared, agent_id=agent_id, timeout=RUN_TIMEOUT)
+    latency = time.monotonic() - start
+    results["shared-thread"] = dict(
+        manager.get_usage_stats(), uploaded_bytes=sum(len(p.encode("utf-8")) for p in shared),
+        latency_sequential=latency, latency_concurrent=latency
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-chunk vs shared-thread chunk documentation")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE, help="Source file to chunk")
+    parser.add_argument("--chunks", type=int, default=6, help="Target number of chunks")
+    parser.add_argument("--concurrency", type=int, default=CHUNK_MAX_CONCURRENCY,
+                        help="Chunks in flight in per-chunk mode")
+    parser.add_argument("--live", action="store_true", help="Use the real agent instead of the simulation")
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        code = f.read()
+    per_chunk, shared = build_prompts(code, args.chunks)
+    print(f"File: {os.path.basename(args.file)} ({len(code)} chars), {len(per_chunk)} chunks, "
+          f"{'live agent' if args.live else 'simulated agent'}")
+
+    runner = run_live if args.live else run_simulated
+    results = runner(per_chunk, shared, args.concurrency)
+
+    header = f"{'mode':<14}{'threads':>8}{'runs':>6}{'sent KB':>10}{'prompt tok':>12}{'output tok':>12}" \
+             f"{'seq s':>9}{f'x{args.concurrency} s':>9}"
+    print(header)
+    print("-" * len(header))
+    for mode, stats in results.items():
+        print(f"{mode:<14}{stats['threads']:>8}{stats['runs']:>6}{stats['uploaded_bytes'] / 1024:>10.1f}"
+              f"{stats['prompt_tokens']:>12}{stats['completion_tokens']:>12}"
+              f"{stats['latency_sequential']:>9.1f}{stats['latency_concurrent']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
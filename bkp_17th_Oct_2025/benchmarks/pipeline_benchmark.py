@@ -0,0 +1,673 @@
+"""
+Pipeline Benchmark for AIVA MCP Server
+
+Measures the throughput of the documentation pipeline without Azure or GitHub.
+
+Scenarios:
+
+- generate_documentation: one call per sample file
+- chunking: code_documenter_agent_with_chunking on every sample file
+- multi_file: generate_multi_file_documentation once per sample directory
+- github_document: github_unified_tool(operation="document") per file
+- github_directory: github_unified_tool(operation="document_directory", confirm="yes") per directory
+
+The Code Documenter Agent is replaced by MockAgent (configurable latency and
+response size) and the GitHub REST API by MockGitHubSession, an in-memory
+stand-in serving the sample repositories of this tree (model/, TestDocumenter/,
+Test2/) through the Contents and Git Data endpoints the tools use. Writes are
+kept in memory, so commits made by one call are visible to the next.
+
+Every scenario runs in a fresh process so the reported peak RSS is its own.
+Results can be saved as JSON (--output) and compared with a run made on another
+commit (--compare).
+
+Usage:
+    python benchmarks/pipeline_benchmark.py [--scenarios chunking,multi_file] [--output head.json]
+    python benchmarks/pipeline_benchmark.py --compare base.json [head.json]
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import base64
+import hashlib
+import argparse
+import platform
+import threading
+import subprocess
+import multiprocessing
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit, unquote
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# tools_api/main.py imports its modules top-level (code_documentation_tool, github_tools)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "tools_api"))
+
+SAMPLES_ROOT = os.path.dirname(REPO_ROOT)
+SAMPLE_DIRS = ("model", "TestDocumenter", "Test2")
+SOURCE_EXTENSIONS = (".java", ".ts", ".tsx", ".js", ".py", ".cs", ".cpp", ".c", ".h")
+# Outputs of earlier documentation runs that live next to the sample sources
+GENERATED_MARKERS = ("_documented", "_analysis", "_ANALYSIS", "_old")
+
+MOCK_OWNER = "bench"
+MOCK_REPO = "samples"
+MOCK_BRANCH = "main"
+
+SCENARIOS = ("generate_documentation", "chunking", "multi_file", "github_document", "github_directory")
+
+# Metrics printed by the report and the comparison: (key, label, higher is better)
+REPORT_METRICS = (
+    ("files_per_min", "files/min", True),
+    ("latency_p50", "p50 s", False),
+    ("latency_p95", "p95 s", False),
+    ("agent_calls_per_file", "agent/file", False),
+    ("github_calls_per_file", "github/file", False),
+    ("prompt_tokens_per_file", "tokens/file", False),
+    ("peak_rss_mb", "peak MB", False),
+)
+
+
+def discover_sample_files(directories=SAMPLE_DIRS) -> List[str]:
+    """Source files of the sample directories, as repository paths relative to SAMPLES_ROOT."""
+    files = []
+    for directory in directories:
+        for root, _, names in os.walk(os.path.join(SAMPLES_ROOT, directory)):
+            for name in names:
+                stem, extension = os.path.splitext(name)
+                if extension in SOURCE_EXTENSIONS and not any(marker in stem for marker in GENERATED_MARKERS):
+                    files.append(os.path.relpath(os.path.join(root, name), SAMPLES_ROOT).replace(os.sep, "/"))
+    return sorted(files)
+
+
+def read_sample(path: str) -> str:
+    with open(os.path.join(SAMPLES_ROOT, path), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None if it cannot be measured)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+class MockAgent:
+    """
+    Local stand-in for the Code Documenter Agent.
+
+    Answers in the two-part format the parsers expect. The documented code is
+    the submitted code with comment lines added until it is ``response_ratio``
+    times as long; reduce/merge prompts get an analysis only. Each call sleeps
+    ``latency`` seconds plus ``seconds_per_1k_tokens`` per 1000 prompt and
+    completion tokens.
+    """
+
+    def __init__(self, latency: float = 0.05, seconds_per_1k_tokens: float = 0.02,
+                 response_ratio: float = 1.3, analysis_words: int = 400):
+        from utils.token_counter import count_tokens
+        self._count_tokens = count_tokens
+        self.latency = latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.response_ratio = response_ratio
+        self.analysis_words = analysis_words
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def document(self, prompt: str, include_analysis: bool = True, language: Optional[str] = None) -> str:
+        """Drop-in replacement for code_documentation_tool.code_documenter_agent and run_documenter_prompt."""
+        response = self._respond(prompt)
+        prompt_tokens = self._count_tokens(prompt)
+        completion_tokens = self._count_tokens(response)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        time.sleep(self.latency + (prompt_tokens + completion_tokens) / 1000 * self.seconds_per_1k_tokens)
+        return response
+
+    def document_thread(self, prompts: List[str], on_response=None) -> List[str]:
+        """Drop-in replacement for code_documentation_tool.code_documenter_agent_thread."""
+        responses = []
+        for i, prompt in enumerate(prompts):
+            responses.append(self.document(prompt))
+            if on_response:
+                on_response(i, responses[-1])
+        return responses
+
+    def _respond(self, prompt: str) -> str:
+        heading = "CHUNK ANALYSIS" if "### PART 1: CHUNK ANALYSIS" in prompt else "COMPREHENSIVE ANALYSIS"
+        analysis = f"### PART 1: {heading}\n" + self._analysis_text()
+        if "## Chunk Analyses:" in prompt:
+            return analysis
+        code = prompt.split("## Code to Analyze:")[-1].strip("\n")
+        return f"{analysis}\n\n### PART 2: DOCUMENTED CODE\n```\n{self._document_code(code)}\n```"
+
+    def _analysis_text(self) -> str:
+        sections = ["Executive Summary", "Architecture & Design", "Code Quality", "Security (OWASP Top 10)",
+                    "Performance & Scalability", "Technical Debt"]
+        words_per_section = max(1, self.analysis_words // len(sections))
+        return "\n".join(f"- {section}: " + " ".join(["finding"] * words_per_section) for section in sections)
+
+    def _document_code(self, code: str) -> str:
+        comment = "// Documented: describes the statement above"
+        consumed = produced = 0
+        lines = []
+        for line in code.split("\n"):
+            lines.append(line)
+            consumed += len(line) + 1
+            produced += len(line) + 1
+            while produced + len(comment) + 1 <= consumed * self.response_ratio:
+                lines.append(comment)
+                produced += len(comment) + 1
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
+
+
+def _git_sha(kind: str, data: bytes) -> str:
+    return hashlib.sha1(f"{kind} {len(data)}\0".encode("utf-8") + data).hexdigest()
+
+
+class MockGitHubSession:
+    """
+    In-memory stand-in for the GitHub REST API, used in place of the pooled session of github_tools.
+
+    Serves the files under ``root`` as repository MOCK_OWNER/MOCK_REPO and implements
+    the endpoints the tools call: contents (GET/PUT), branches, commits, git refs,
+    blobs, trees and commits. Responses are real ``requests.Response`` objects with
+    ETags, and If-None-Match is answered with 304.
+    """
+
+    _ROUTES = (
+        ("GET", re.compile(r"contents/?(?P<path>.*)"), "_get_contents"),
+        ("PUT", re.compile(r"contents/(?P<path>.+)"), "_put_contents"),
+        ("GET", re.compile(r"branches/(?P<ref>[^/]+)"), "_get_branch"),
+        ("GET", re.compile(r"commits/(?P<ref>[^/]+)"), "_get_commit_ref"),
+        ("GET", re.compile(r"git/ref/heads/(?P<ref>.+)"), "_get_ref"),
+        ("GET", re.compile(r"git/commits/(?P<sha>\w+)"), "_get_git_commit"),
+        ("GET", re.compile(r"git/trees/(?P<sha>\w+)"), "_get_tree"),
+        ("POST", re.compile(r"git/blobs"), "_post_blob"),
+        ("POST", re.compile(r"git/trees"), "_post_tree"),
+        ("POST", re.compile(r"git/commits"), "_post_commit"),
+        ("PATCH", re.compile(r"git/refs/heads/(?P<ref>.+)"), "_patch_ref"),
+    )
+
+    def __init__(self, root: str = SAMPLES_ROOT, paths: Optional[List[str]] = None, latency: float = 0.0):
+        self.latency = latency
+        self.headers: Dict[str, str] = {}
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, bytes] = {}
+        self._trees: Dict[str, Dict[str, str]] = {}
+        self._commits: Dict[str, Dict[str, Any]] = {}
+        files = {}
+        for path in paths if paths is not None else discover_sample_files():
+            with open(os.path.join(root, path), "rb") as f:
+                files[path] = self._store_blob(f.read())
+        self._head = self._store_commit(self._store_tree(files), [], "Initial sample repository")
+
+    def request(self, method: str, url: str, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(url)
+        prefix = f"/repos/{MOCK_OWNER}/{MOCK_REPO}/"
+        if not parts.path.startswith(prefix):
+            return self._response(404, {"message": "Not Found"}, url)
+        route = unquote(parts.path[len(prefix):])
+        for route_method, pattern, handler in self._ROUTES:
+            match = pattern.fullmatch(route)
+            if route_method == method.upper() and match:
+                with self._lock:
+                    self.calls[handler.lstrip("_")] += 1
+                    status, body = getattr(self, handler)(kwargs.get("json"), **match.groupdict())
+                etag = f'"{hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()}"'
+                if method.upper() == "GET" and status == 200 and (kwargs.get("headers") or {}).get("If-None-Match") == etag:
+                    return self._response(304, None, url, etag)
+                return self._response(status, body, url, etag if status == 200 else None)
+        return self._response(404, {"message": f"Not Found: {method} {route}"}, url)
+
+    def close(self):
+        pass
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    @staticmethod
+    def _response(status: int, body: Any, url: str, etag: Optional[str] = None):
+        import requests
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.reason = {200: "OK", 201: "Created", 304: "Not Modified", 404: "Not Found", 409: "Conflict",
+                           422: "Unprocessable Entity"}.get(status, "")
+        response._content = b"" if body is None else json.dumps(body).encode("utf-8")
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
+        if etag:
+            response.headers["ETag"] = etag
+        return response
+
+    # --- object store ---
+
+    def _store_blob(self, data: bytes) -> str:
+        sha = _git_sha("blob", data)
+        self._blobs[sha] = data
+        return sha
+
+    def _store_tree(self, files: Dict[str, str]) -> str:
+        sha = _git_sha("tree", json.dumps(sorted(files.items())).encode("utf-8"))
+        self._trees[sha] = files
+        return sha
+
+    def _store_commit(self, tree_sha: str, parents: List[str], message: str) -> str:
+        sha = _git_sha("commit", json.dumps([tree_sha, parents, message, len(self._commits)]).encode("utf-8"))
+        self._commits[sha] = {"tree": tree_sha, "parents": parents, "message": message}
+        return sha
+
+    def _head_files(self) -> Dict[str, str]:
+        return self._trees[self._commits[self._head]["tree"]]
+
+    def _content_entry(self, path: str, blob_sha: str) -> Dict[str, Any]:
+        return {"name": path.rsplit("/", 1)[-1], "path": path, "type": "file", "sha": blob_sha,
+                "size": len(self._blobs[blob_sha]), "download_url": f"https://raw.example/{path}"}
+
+    # --- handlers: (payload, **route params) -> (status, body) ---
+
+    def _get_contents(self, payload, path: str):
+        path = path.strip("/")
+        files = self._head_files()
+        if path in files:
+            entry = self._content_entry(path, files[path])
+            entry.update(encoding="base64", content=base64.b64encode(self._blobs[files[path]]).decode("ascii"))
+            return 200, entry
+        prefix = f"{path}/" if path else ""
+        children = {}
+        for file_path, blob_sha in files.items():
+            if file_path.startswith(prefix):
+                name = file_path[len(prefix):].split("/", 1)[0]
+                if "/" in file_path[len(prefix):]:
+                    children[name] = {"name": name, "path": prefix + name, "type": "dir", "sha": "", "size": 0,
+                                      "download_url": None}
+                else:
+                    children[name] = self._content_entry(file_path, blob_sha)
+        if not children:
+            return 404, {"message": "Not Found"}
+        return 200, [children[name] for name in sorted(children)]
+
+    def _put_contents(self, payload, path: str):
+        files = dict(self._head_files())
+        files[path] = self._store_blob(base64.b64decode(payload["content"]))
+        self._head = self._store_commit(self._store_tree(files), [self._head], payload.get("message", ""))
+        return 201, {"content": self._content_entry(path, files[path]), "commit": {"sha": self._head}}
+
+    def _get_branch(self, payload, ref: str):
+        if ref != MOCK_BRANCH:
+            return 404, {"message": "Branch not found"}
+        return 200, {"name": ref, "commit": {"sha": self._head}}
+
+    def _get_commit_ref(self, payload, ref: str):
+        if ref in self._commits:
+            return 200, {"sha": ref}
+        return 404, {"message": "No commit found"}
+
+    def _get_ref(self, payload, ref: str):
+        if ref != MOCK_BRANCH:
+            return 404, {"message": "Not Found"}
+        return 200, {"ref": f"refs/heads/{ref}", "object": {"sha": self._head, "type": "commit"}}
+
+    def _get_git_commit(self, payload, sha: str):
+        if sha not in self._commits:
+            return 404, {"message": "Not Found"}
+        return 200, {"sha": sha, "tree": {"sha": self._commits[sha]["tree"]}}
+
+    def _get_tree(self, payload, sha: str):
+        tree_sha = self._commits[sha]["tree"] if sha in self._commits else sha
+        if tree_sha not in self._trees:
+            return 404, {"message": "Not Found"}
+        files = self._trees[tree_sha]
+        directories = {path.rsplit("/", 1)[0] for path in files if "/" in path}
+        entries = [{"path": path, "type": "blob", "sha": blob_sha} for path, blob_sha in sorted(files.items())]
+        entries += [{"path": path, "type": "tree"} for path in sorted(directories)]
+        return 200, {"sha": tree_sha, "tree": entries, "truncated": False}
+
+    def _post_blob(self, payload):
+        return 201, {"sha": self._store_blob(base64.b64decode(payload["content"]))}
+
+    def _post_tree(self, payload):
+        files = dict(self._trees.get(payload.get("base_tree"), {}))
+        files.update({entry["path"]: entry["sha"] for entry in payload["tree"]})
+        return 201, {"sha": self._store_tree(files)}
+
+    def _post_commit(self, payload):
+        sha = self._store_commit(payload["tree"], payload["parents"], payload["message"])
+        return 201, {"sha": sha, "html_url": f"https://github.com/{MOCK_OWNER}/{MOCK_REPO}/commit/{sha}"}
+
+    def _patch_ref(self, payload, ref: str):
+        if self._head not in self._commits[payload["sha"]]["parents"] and not payload.get("force"):
+            return 422, {"message": "Update is not a fast forward"}
+        self._head = payload["sha"]
+        return 200, {"ref": f"refs/heads/{ref}", "object": {"sha": self._head}}
+
+
+class WorkItem(NamedTuple):
+    """One timed call of a scenario."""
+    label: str
+    files: int
+    run: Callable[[], Any]
+
+
+class _ToolCollector:
+    """Minimal FastMCP stand-in that keeps the functions registered with @mcp.tool()."""
+
+    def __init__(self):
+        self.tools: Dict[str, Callable] = {}
+
+    def tool(self, *args, **kwargs):
+        def register(func):
+            self.tools[func.__name__] = func
+            return func
+        return register
+
+
+def _configure_environment(config: Dict[str, Any]):
+    """Environment for a scenario process; must run before the tools are imported."""
+    if not config["with_caches"]:
+        # Caches would answer repeated inputs without reaching the agent or GitHub
+        for name in ("USE_DOC_RESULT_CACHE", "USE_INCREMENTAL_DOCS", "USE_GITHUB_ETAG_CACHE"):
+            os.environ[name] = "false"
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark-token")
+
+
+def _install_mocks(agent: MockAgent, session: MockGitHubSession):
+    """Route agent calls to ``agent`` and GitHub API calls to ``session``."""
+    import code_documentation_tool
+    import github_tools
+
+    # The helper reaches the agent through the top-level code_documentation_tool module
+    code_documentation_tool.code_documenter_agent = agent.document
+    code_documentation_tool.code_documenter_agent_thread = agent.document_thread
+    code_documentation_tool.run_documenter_prompt = agent.document
+    github_tools._session = session
+
+
+def _load_github_unified_tool(session: MockGitHubSession) -> Callable:
+    """
+    Import the packaged GitHub integration tool and return its github_unified_tool.
+
+    The package imports its helpers as ``tools_api.utils``; in this tree utils/ sits
+    next to tools_api/, so it is registered under that name first.
+    """
+    import importlib
+    sys.modules.setdefault("tools_api.utils", importlib.import_module("utils"))
+    from tools_api import github_integration_tool, github_tools as packaged_github_tools
+
+    packaged_github_tools._session = session
+    collector = _ToolCollector()
+    github_integration_tool.register_github_integration_tools(collector)
+    return collector.tools["github_unified_tool"]
+
+
+def _build_work_items(scenario: str, files: List[str], session: MockGitHubSession) -> List[WorkItem]:
+    repository = f"{MOCK_OWNER}/{MOCK_REPO}"
+    directories: Dict[str, List[str]] = {}
+    for path in files:
+        directories.setdefault(path.rsplit("/", 1)[0], []).append(path)
+
+    if scenario == "generate_documentation":
+        from code_documentation_tool import generate_documentation
+        return [WorkItem(path, 1, lambda code=read_sample(path): generate_documentation(code)) for path in files]
+
+    if scenario == "chunking":
+        from utils.code_documentation_helper import ANALYSIS_INSTRUCTION, code_documenter_agent_with_chunking
+        return [
+            WorkItem(path, 1, lambda code=read_sample(path): code_documenter_agent_with_chunking(
+                ANALYSIS_INSTRUCTION + "\n" + code, include_analysis=True))
+            for path in files
+        ]
+
+    if scenario == "multi_file":
+        from utils.code_documentation_helper import generate_multi_file_documentation
+        return [
+            WorkItem(directory, len(paths), lambda paths=paths: generate_multi_file_documentation(
+                [{"path": path, "content": read_sample(path)} for path in paths],
+                f"https://github.com/{repository}", MOCK_BRANCH))
+            for directory, paths in sorted(directories.items())
+        ]
+
+    unified = _load_github_unified_tool(session)
+    if scenario == "github_document":
+        return [
+            WorkItem(path, 1, lambda path=path: unified(repository=repository, operation="document",
+                                                       file_path=path, branch=MOCK_BRANCH))
+            for path in files
+        ]
+
+    if scenario == "github_directory":
+        extensions = ",".join(sorted({os.path.splitext(path)[1] for path in files}))
+        return [
+            WorkItem(directory, len(paths), lambda directory=directory: unified(
+                repository=repository, operation="document_directory", file_path=directory,
+                branch=MOCK_BRANCH, file_extensions=extensions, confirm="yes"))
+            for directory, paths in sorted(directories.items())
+        ]
+
+    raise ValueError(f"Unknown scenario '{scenario}'. Valid scenarios: {', '.join(SCENARIOS)}")
+
+
+def _is_failure(result: Any) -> bool:
+    text = result if isinstance(result, str) else ""
+    return not text or text.lstrip().startswith(("Error", "ERROR", "❌"))
+
+
+def run_scenario(scenario: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one scenario against the mocks and return its metrics."""
+    import logging
+    logging.basicConfig(level=getattr(logging, config["log_level"].upper(), logging.WARNING))
+    _configure_environment(config)
+
+    files = discover_sample_files(config["directories"])
+    agent = MockAgent(config["agent_latency"], config["agent_seconds_per_1k_tokens"],
+                      config["response_ratio"], config["analysis_words"])
+    session = MockGitHubSession(paths=files, latency=config["github_latency"])
+    try:
+        _install_mocks(agent, session)
+        items = _build_work_items(scenario, files, session)
+    except ImportError as e:
+        return {"scenario": scenario, "skipped": f"unavailable in this tree: {e}"}
+    setup_github_calls = session.total_calls()
+
+    latencies: List[float] = []
+    errors = []
+
+    def timed(item: WorkItem):
+        start = time.perf_counter()
+        try:
+            result = item.run()
+            error = str(result)[:200] if _is_failure(result) else None
+        except Exception as e:
+            error = str(e)
+        latencies.append(time.perf_counter() - start)
+        if error:
+            errors.append(f"{item.label}: {error}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, config["concurrency"])) as executor:
+        list(executor.map(timed, items))
+    wall = time.perf_counter() - start
+
+    file_count = max(1, sum(item.files for item in items))
+    agent_stats = agent.stats()
+    return {
+        "scenario": scenario,
+        "files": file_count,
+        "calls": len(items),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "files_per_min": round(file_count / wall * 60, 2) if wall else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 4),
+        "latency_p95": round(percentile(latencies, 95), 4),
+        "agent_calls_per_file": round(agent_stats["calls"] / file_count, 2),
+        "github_calls_per_file": round((session.total_calls() - setup_github_calls) / file_count, 2),
+        "prompt_tokens_per_file": round(agent_stats["prompt_tokens"] / file_count),
+        "completion_tokens_per_file": round(agent_stats["completion_tokens"] / file_count),
+        "github_calls": dict(session.calls),
+        "peak_rss_mb": round(peak_rss_mb() or 0.0, 1),
+    }
+
+
+def run_suite(scenarios: List[str], config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the scenarios, each in its own process unless config["in_process"] is set."""
+    results = {}
+    for scenario in scenarios:
+        if config["in_process"]:
+            results[scenario] = run_scenario(scenario, config)
+        else:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                results[scenario] = pool.apply(run_scenario, (scenario, config))
+        print_result(results[scenario])
+    return {
+        "commit": git_revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": config,
+        "scenarios": results,
+    }
+
+
+def git_revision() -> str:
+    """Short SHA of the checked-out commit, with "-dirty" when the tree has local changes."""
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no", "."], cwd=REPO_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_result(result: Dict[str, Any]):
+    if result.get("skipped"):
+        print(f"{result['scenario']:<24} skipped: {result['skipped']}")
+        return
+    values = "".join(f"{result[key]:>13}" for key, _, _ in REPORT_METRICS)
+    errors = f"  ({len(result['errors'])} errors)" if result["errors"] else ""
+    print(f"{result['scenario']:<24}{result['files']:>6}{values}{errors}")
+
+
+def print_header():
+    header = f"{'scenario':<24}{'files':>6}" + "".join(f"{label:>13}" for _, label, _ in REPORT_METRICS)
+    print(header)
+    print("-" * len(header))
+
+
+def print_comparison(base: Dict[str, Any], head: Dict[str, Any]):
+    """Print every metric of two runs side by side with the relative change."""
+    print(f"base {base['commit']} ({base['date']})  vs  head {head['commit']} ({head['date']})")
+    header = f"{'scenario':<24}{'metric':<14}{'base':>12}{'head':>12}{'change':>10}"
+    print(header)
+    print("-" * len(header))
+    for scenario, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(scenario)
+        if not base_result or base_result.get("skipped") or head_result.get("skipped"):
+            print(f"{scenario:<24}not comparable (missing or skipped in one run)")
+            continue
+        for key, label, higher_is_better in REPORT_METRICS:
+            before, after = base_result[key], head_result[key]
+            change = (after - before) / before * 100 if before else 0.0
+            better = change > 0 if higher_is_better else change < 0
+            marker = "" if abs(change) < 1 else (" +" if better else " -")
+            print(f"{scenario:<24}{label:<14}{before:>12}{after:>12}{change:>9.1f}%{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the documentation pipeline with a mock agent and mock GitHub")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--dirs", default=",".join(SAMPLE_DIRS), help="Sample directories (relative to the repository root)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls in flight per scenario")
+    parser.add_argument("--agent-latency", type=float, default=0.05, help="Seconds per agent call")
+    parser.add_argument("--agent-seconds-per-1k-tokens", type=float, default=0.02,
+                        help="Extra agent seconds per 1000 prompt + completion tokens")
+    parser.add_argument("--response-ratio", type=float, default=1.3, help="Documented code size / source size")
+    parser.add_argument("--analysis-words", type=int, default=400, help="Words in each mock analysis")
+    parser.add_argument("--github-latency", type=float, default=0.0, help="Seconds per GitHub API call")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="Keep the result, incremental and ETag caches enabled")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run all scenarios in this process (peak RSS is then cumulative)")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the pipeline")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="Compare BASE.json with HEAD.json, or with a fresh run when only BASE is given")
+    args = parser.parse_args()
+
+    base = None
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if len(args.compare) > 1:
+            with open(args.compare[1], "r", encoding="utf-8") as f:
+                print_comparison(base, json.load(f))
+            return
+
+    config = {
+        "directories": [d.strip() for d in args.dirs.split(",") if d.strip()],
+        "concurrency": args.concurrency,
+        "agent_latency": args.agent_latency,
+        "agent_seconds_per_1k_tokens": args.agent_seconds_per_1k_tokens,
+        "response_ratio": args.response_ratio,
+        "analysis_words": args.analysis_words,
+        "github_latency": args.github_latency,
+        "with_caches": args.with_caches,
+        "in_process": args.in_process,
+        "log_level": args.log_level,
+    }
+    files = discover_sample_files(config["directories"])
+    print(f"{len(files)} sample files in {', '.join(config['directories'])}, commit {git_revision()}")
+    print_header()
+    run = run_suite([s.strip() for s in args.scenarios.split(",") if s.strip()], config)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"Results written to {args.output}")
+    if base:
+        print()
+        print_comparison(base, run)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from fastapi import FastAPI, Request, Depends
+from fastapi.responses import PlainTextResponse
 from mcp.server.sse import SseServerTransport
 from starlette.routing import Mount
-from server import mcp
+from server import mcp, close_agent_client, get_metrics_snapshot, render_prometheus_metrics
 import uvicorn
 
 app = FastAPI(docs_url=None, redoc_url=None)
@@ -25,6 +26,19 @@ async def handle_sse(request: Request):
         )
 
 
+@app.get("/metrics", tags=["Monitoring"])
+async def metrics(format: str = "prometheus"):
+    """Per-stage durations and counters of agent calls (Prometheus text; ?format=json adds recent spans)."""
+    if format == "json":
+        return get_metrics_snapshot()
+    return PlainTextResponse(render_prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("shutdown")
+async def shutdown_agent_client():
+    await close_agent_client()
+
+
 if __name__ == "__main__":
 
     uvicorn.run(app, host="0.0.0.0", port=8000)
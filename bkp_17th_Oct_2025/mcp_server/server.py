@@ -1,17 +1,22 @@
 """ Azure AI Agent Service MCP Server """
 
 import os
+import sys
 import time
+import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from fastapi import Response
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential, ClientSecretCredential
 
 
 import logging
-import threading
+
+# utils/ is shared with tools_api and sits next to this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.metrics import current_span, traced, get_metrics_snapshot, render_prometheus_metrics  # noqa: E402
+from utils.single_flight import USE_REQUEST_COALESCING, SingleFlight, flight_key  # noqa: E402
+from utils.response_parser import PART2_MARKERS, MarkerIndex  # noqa: E402
 
 
 # Load environment variables from the mcp-server directory
@@ -19,6 +24,16 @@ env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(env_path)
 #load_dotenv()  # Load from current directory as fallback
 
+# Reads its run/poll settings (AGENT_RUN_TIMEOUT, AGENT_POLL_*) from the environment on import
+from utils.azure_client import (  # noqa: E402
+    AGENT_RUN_TIMEOUT,
+    AGENT_POLL_INITIAL_INTERVAL,
+    AGENT_POLL_MAX_INTERVAL,
+    get_project_manager,
+)
+
+logger = logging.getLogger(__name__)
+
 mcp = FastMCP(
     name="Encora AIVA MCP Server",
     instructions="This MCP server integrates with Azure AI Agent Service to handle Encora AIVA agentic workflows."
@@ -26,94 +41,236 @@ mcp = FastMCP(
 
 PROJECT_ENDPOINT_STRING = os.getenv("PROJECT_ENDPOINT_STRING", "")
 
-ACTIVE_STATUSES = {"queued", "in_progress", "requires_action"}
 TERMINAL_FAILURE_STATUSES = {"failed"}
-DEFAULT_POLL_INTERVAL = 1.0  # seconds
-DEFAULT_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "180"))  # seconds; configurable via env
+MAX_CONCURRENT_RUNS = int(os.getenv("AGENT_MAX_CONCURRENT_RUNS", "20"))
+STREAM_FLUSH_CHARS = int(os.getenv("AGENT_STREAM_FLUSH_CHARS", "512"))  # streamed text per progress notification
+STREAM_FLUSH_INTERVAL = float(os.getenv("AGENT_STREAM_FLUSH_INTERVAL", "0.5"))  # seconds; max delay of streamed text
+
+# Concurrent runs are limited per event loop; asyncio primitives are bound to the loop that uses them
+_run_slots: asyncio.Semaphore | None = None
+_run_slots_loop: asyncio.AbstractEventLoop | None = None
+# Identical prompts sent to the same agent at the same time share one run
+_agent_flights = SingleFlight("invoke_agent")
+
+
+def _get_run_slots() -> asyncio.Semaphore:
+    """Return the semaphore limiting concurrent runs (AGENT_MAX_CONCURRENT_RUNS) on the running loop."""
+    global _run_slots, _run_slots_loop
+    loop = asyncio.get_running_loop()
+    if _run_slots is None or _run_slots_loop is not loop:
+        _run_slots = asyncio.Semaphore(MAX_CONCURRENT_RUNS)
+        _run_slots_loop = loop
+    return _run_slots
+
+
+async def close_agent_client() -> None:
+    """Close the shared async client and credential (called on server shutdown)."""
+    await get_project_manager().aclose()
+
+
+def _agent_config(agent_env_var: str, friendly_name: str | None) -> tuple[str, str, str | None]:
+    """Return (agent id, label, configuration error message or None)."""
+    agent_id = os.getenv(agent_env_var, "").strip()
+    label = friendly_name or agent_env_var.replace("_", " ").title()
+    if not PROJECT_ENDPOINT_STRING:
+        return agent_id, label, "⚠️ Configuration error: PROJECT_ENDPOINT_STRING not set"
+    if not agent_id:
+        return agent_id, label, f"⚠️ Configuration error: {agent_env_var} not set"
+    return agent_id, label, None
+
 
+def _is_error_response(response: str) -> bool:
+    """Whether an _invoke_agent* return value is an error message."""
+    return response.startswith(("⚠️", "❌"))
 
-def _invoke_agent(
+
+async def _invoke_agent(
     agent_env_var: str,
     prompt: str,
     *,
     friendly_name: str | None = None,
-    timeout: float = DEFAULT_TIMEOUT,
-    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    timeout: float = AGENT_RUN_TIMEOUT,
+    poll_interval: float = AGENT_POLL_INITIAL_INTERVAL,
+    max_poll_interval: float = AGENT_POLL_MAX_INTERVAL,
 ) -> str:
     """Generic Azure Agent runner used by all MCP tool wrappers.
 
+    Runs are awaited on the server's event loop, so many requests can wait on
+    their agents concurrently (up to AGENT_MAX_CONCURRENT_RUNS) without holding
+    a thread each. Concurrent calls with the same agent, prompt, timeout and
+    polling settings share one run (USE_REQUEST_COALESCING). The run itself goes
+    through the shared async runner (AzureAIProjectManager.run_agent_async), which
+    records it as an "agent_call" span.
+
     Args:
         agent_env_var: Environment variable name that stores the agent ID.
         prompt: User-provided prompt/content.
         friendly_name: Human label used in error messages (defaults to env var simplified).
         timeout: Max seconds to wait for a run to reach a terminal state.
-        poll_interval: Sleep interval between status polls.
+        poll_interval: First delay between status polls; grows up to max_poll_interval.
+        max_poll_interval: Upper bound for the delay between status polls.
 
     Returns:
         str: Final text response (may be empty) or a formatted error message.
     """
-    agent_id = os.getenv(agent_env_var, "").strip()
-    label = friendly_name or agent_env_var.replace("_", " ").title()
-    if not PROJECT_ENDPOINT_STRING:
-        return "⚠️ Configuration error: PROJECT_ENDPOINT_STRING not set"
-    if not agent_id:
-        return f"⚠️ Configuration error: {agent_env_var} not set"
+    agent_id, label, config_error = _agent_config(agent_env_var, friendly_name)
+    if config_error:
+        return config_error
+
+    if USE_REQUEST_COALESCING:
+        return await _agent_flights.do_async(
+            flight_key(
+                "invoke_agent", agent_id,
+                f"timeout={timeout},poll={poll_interval},max_poll={max_poll_interval}",
+                content=prompt
+            ),
+            _run_agent, agent_id, label, prompt, timeout, poll_interval, max_poll_interval
+        )
+    return await _run_agent(agent_id, label, prompt, timeout, poll_interval, max_poll_interval)
 
-    start_time = time.time()
 
-    try:
-        # Use ClientSecretCredential if available, otherwise fall back to DefaultAzureCredential
-        azure_client_secret = os.getenv("AZURE_CLIENT_SECRET", "").strip()
-        azure_tenant_id = os.getenv("AZURE_TENANT_ID", "").strip()
-        azure_client_id = os.getenv("AZURE_CLIENT_ID", "").strip()
-        
-        if azure_client_secret and azure_tenant_id and azure_client_id:
-            credential = ClientSecretCredential(
-                tenant_id=azure_tenant_id,
-                client_id=azure_client_id,
-                client_secret=azure_client_secret
-            )
-        else:
-            credential = DefaultAzureCredential()
-
-        ai_client = AIProjectClient(
-            endpoint=PROJECT_ENDPOINT_STRING,
-            credential=credential,
-            subscription_id=os.getenv("AZURE_SUBSCRIPTION_ID"),
-            resource_group_name=os.getenv("AZURE_RESOURCE_GROUP_NAME"),
-            project_name=os.getenv("AZURE_PROJECT_NAME")
+async def _run_agent(
+    agent_id: str, label: str, prompt: str, timeout: float, poll_interval: float, max_poll_interval: float
+) -> str:
+    """Run the agent on the prompt in a new thread and return its answer (see _invoke_agent)."""
+    async with _get_run_slots():
+        response = await get_project_manager().run_agent_async(
+            prompt, agent_id=agent_id, timeout=timeout,
+            poll_interval=poll_interval, max_poll_interval=max_poll_interval
         )
-        with ai_client:
-            thread = ai_client.agents.threads.create()
-            ai_client.agents.messages.create(thread_id=thread.id, role="user", content=prompt)
-            run = ai_client.agents.runs.create_and_process(thread_id=thread.id, agent_id=agent_id)
-
-            # Some backends may already return a terminal run from create_and_process
-            while getattr(run, "status", None) in ACTIVE_STATUSES:
-                if time.time() - start_time > timeout:
-                    return f"⚠️ {label} timed out after {int(timeout)}s"
-                time.sleep(poll_interval)
-                run = ai_client.agents.runs.get(thread_id=run.thread_id, run_id=run.id)
-
-            status = getattr(run, "status", "unknown")
-            if status in TERMINAL_FAILURE_STATUSES:
-                last_error = getattr(run, "last_error", "unknown error")
-                return f"❌ {label} run failed: {last_error}"
-
-            # Fetch latest message
-            messages = ai_client.agents.messages.list(thread_id=thread.id, order="desc", limit=1)
-            msg = next(iter(messages), None)
-            if msg and getattr(msg, "text_messages", None):
-                try:
-                    return msg.text_messages[-1].text.value  # type: ignore[attr-defined]
-                except Exception:
-                    return "⚠️ Response parsing error: unexpected message structure"
-            return "⚠️ No textual response produced"
+    return _tool_response(label, response)
+
+
+def _tool_response(label: str, response: str) -> str:
+    """Rewrite a run_agent_async error ("ERROR: ..." / "WARNING: ...") in the server's error format."""
+    if response.startswith("ERROR:"):
+        return f"❌ {label}: {response[len('ERROR:'):].strip()}"
+    if response.startswith("WARNING:"):
+        return f"⚠️ {label}: {response[len('WARNING:'):].strip()}"
+    return response
+
+
+def _record_usage(run) -> None:
+    """Add the token usage of a finished run to the current span."""
+    usage = getattr(run, "usage", None)
+    current_span().add("tokens_in", getattr(usage, "prompt_tokens", 0) or 0)
+    current_span().add("tokens_out", getattr(usage, "completion_tokens", 0) or 0)
+
+
+async def _report_progress(ctx: Context, progress: float, message: str) -> None:
+    """Send one progress notification; delivery failures never fail the run."""
+    try:
+        try:
+            await ctx.report_progress(progress, message=message)
+        except TypeError:  # mcp < 1.10: progress notifications carry no message
+            await ctx.report_progress(progress)
+            await ctx.info(message)
+    except Exception as e:
+        logger.debug(f"Progress notification dropped: {e}")
+
+
+@traced("agent_call", failed=_is_error_response)
+async def _invoke_agent_streaming(
+    agent_env_var: str,
+    prompt: str,
+    ctx: Context,
+    *,
+    friendly_name: str | None = None,
+    timeout: float = AGENT_RUN_TIMEOUT,
+    flush_chars: int = STREAM_FLUSH_CHARS,
+    flush_interval: float = STREAM_FLUSH_INTERVAL,
+) -> str:
+    """Streaming counterpart of _invoke_agent.
+
+    The run is streamed and the agent's text deltas are forwarded to the client
+    as progress notifications while it is generated (progress = characters
+    received so far; message = the new text). Deltas are batched until
+    ``flush_chars`` characters or ``flush_interval`` seconds accumulate.
+    The deltas are also fed to a MarkerIndex, so the start of the documented
+    code section is known (and the analysis before it flushed) as soon as the
+    PART 2 marker arrives.
+
+    Args:
+        agent_env_var: Environment variable name that stores the agent ID.
+        prompt: User-provided prompt/content.
+        ctx: MCP request context used to send notifications.
+        friendly_name: Human label used in error messages (defaults to env var simplified).
+        timeout: Max seconds to wait for the run to finish.
+        flush_chars: Buffered characters that trigger a notification.
+        flush_interval: Max seconds buffered text waits before it is sent.
+
+    Returns:
+        str: Complete text response or a formatted error message.
+    """
+    agent_id, label, config_error = _agent_config(agent_env_var, friendly_name)
+    if config_error:
+        return config_error
+    current_span().set(agent=label, streaming=True)
+    current_span().add("chars_in", len(prompt))
+
+    parts: list[str] = []
+    pending: list[str] = []
+    received = 0
+    last_flush = time.monotonic()
+    markers = MarkerIndex()
+    code_section_at = -1
+
+    async def flush() -> None:
+        nonlocal last_flush
+        if pending:
+            await _report_progress(ctx, received, "".join(pending))
+            pending.clear()
+        last_flush = time.monotonic()
+
+    run = None
+    try:
+        ai_client = await get_project_manager().get_async_client()
+        async with _get_run_slots():
+            thread = await ai_client.agents.threads.create()
+            await ai_client.agents.messages.create(thread_id=thread.id, role="user", content=prompt)
+            try:
+                async with asyncio.timeout(timeout):
+                    async with await ai_client.agents.runs.stream(thread_id=thread.id, agent_id=agent_id) as stream:
+                        async for event_type, event_data, _ in stream:
+                            if event_type == "thread.message.delta":
+                                text = getattr(event_data, "text", "") or ""
+                                parts.append(text)
+                                pending.append(text)
+                                received += len(text)
+                                if code_section_at < 0 and markers.feed(text).split_known:
+                                    code_section_at = markers.find(PART2_MARKERS[0])
+                                    logger.info(f"{label}: documented code section starts at character {code_section_at}")
+                                    current_span().set(code_section_at=code_section_at)
+                                    await flush()
+                                elif sum(map(len, pending)) >= flush_chars or time.monotonic() - last_flush >= flush_interval:
+                                    await flush()
+                            elif str(event_type).startswith("thread.run."):
+                                run = event_data
+                            elif event_type == "error":
+                                await flush()
+                                return f"❌ {label} stream failed: {event_data}"
+            except TimeoutError:
+                await flush()
+                if run is not None:
+                    try:
+                        await ai_client.agents.runs.cancel(thread_id=thread.id, run_id=run.id)
+                    except Exception:
+                        pass  # The timeout is reported either way
+                return f"⚠️ {label} timed out after {int(timeout)}s"
+            await flush()
+
+        status = getattr(run, "status", "unknown")
+        _record_usage(run)
+        if status in TERMINAL_FAILURE_STATUSES:
+            last_error = getattr(run, "last_error", "unknown error")
+            return f"❌ {label} run failed: {last_error}"
+        return "".join(parts) or "⚠️ No textual response produced"
     except Exception as e:  # Broad catch to preserve existing contract of returning a string
-        return f"⚠️ Error invoking {label}: {e}"  # Do not expose stack for now (could log separately)
+        return f"⚠️ Error invoking {label}: {e}"
+
 
 @mcp.tool()
-def run_code_reviewer_agent(prompt: str) -> str:
+async def run_code_reviewer_agent(prompt: str) -> str:
     """
     Forward a user's natural language request to the Code Reviewer Agent.
 
@@ -126,10 +283,10 @@ def run_code_reviewer_agent(prompt: str) -> str:
     Returns:
         str: The final response from the Code Reviewer Agent, or an error message if the run fails.
     """   
-    return _invoke_agent("CODE_REVIEW_AGENT_ID", prompt, friendly_name="Code Reviewer Agent")
+    return await _invoke_agent("CODE_REVIEW_AGENT_ID", prompt, friendly_name="Code Reviewer Agent")
 
 @mcp.tool()
-def run_code_planner_agent(prompt: str) -> str:
+async def run_code_planner_agent(prompt: str) -> str:
     """
         Forward a user's natural language request to the Coding Planner Agent.
     
@@ -159,10 +316,10 @@ def run_code_planner_agent(prompt: str) -> str:
             str: The detailed coding plan in markdown format, or an error message if there is a problem accessing
             the Jira project or required information is missing.
     """   
-    return _invoke_agent("CODE_PLANNER_AGENT_ID", prompt, friendly_name="Coding Planner Agent")
+    return await _invoke_agent("CODE_PLANNER_AGENT_ID", prompt, friendly_name="Coding Planner Agent")
 
 @mcp.tool()
-def run_test_case_generator_agent(prompt: str) -> str:
+async def run_test_case_generator_agent(prompt: str) -> str:
     """
     Forwards a user's natural language request to the QA Manual Test Case Generator Agent.
  
@@ -185,10 +342,10 @@ def run_test_case_generator_agent(prompt: str) -> str:
      Returns:
         str: The final response from the QA Test Case Generator Agent with the generate test scenarios, or an error message if the run fails.
     """   
-    return _invoke_agent("QA_SCENARIO_AGENT_ID", prompt, friendly_name="QA Manual Test Case Generator Agent")
+    return await _invoke_agent("QA_SCENARIO_AGENT_ID", prompt, friendly_name="QA Manual Test Case Generator Agent")
 
 @mcp.tool()
-def run_test_case_generator_gherkin_agent(prompt: str) -> str:
+async def run_test_case_generator_gherkin_agent(prompt: str) -> str:
     """
     Forwards a user's natural language request to the QA Gherkin Test Case Generator Agent.
  
@@ -205,10 +362,10 @@ def run_test_case_generator_gherkin_agent(prompt: str) -> str:
      Returns:
         str: The final response from the QA Gherkin Test Case Generator Agent with the URL to download the .feature file that holds the generated test cases, or an error message if the run fails.
     """   
-    return _invoke_agent("QA_GHERKIN_AGENT_ID", prompt, friendly_name="QA Gherkin Test Case Generator Agent")
+    return await _invoke_agent("QA_GHERKIN_AGENT_ID", prompt, friendly_name="QA Gherkin Test Case Generator Agent")
 
 @mcp.tool()
-def run_project_status_reporter_agent(prompt: str) -> str:
+async def run_project_status_reporter_agent(prompt: str) -> str:
     """
     Forwards a user's natural language request to the Project Status Reporter Agent.
  
@@ -217,10 +374,10 @@ def run_project_status_reporter_agent(prompt: str) -> str:
       - The Jira project and sprint to report on (required)
       - Any specific sections or data points to include (optional)
     """   
-    return _invoke_agent("PROJECT_STATUS_REPORTER_AGENT_ID", prompt, friendly_name="Project Status Reporter Agent")
+    return await _invoke_agent("PROJECT_STATUS_REPORTER_AGENT_ID", prompt, friendly_name="Project Status Reporter Agent")
 
 @mcp.tool()
-def run_test_generation_agent(prompt: str) -> str:
+async def run_test_generation_agent(prompt: str) -> str:
     """
     Forward a user's request to the Test Case generation Agent.
 
@@ -234,10 +391,10 @@ def run_test_generation_agent(prompt: str) -> str:
     Returns:
         str: The Generated test sources links.
     """   
-    return _invoke_agent("AGENT_ID", prompt, friendly_name="Test Case Generation Agent")
+    return await _invoke_agent("AGENT_ID", prompt, friendly_name="Test Case Generation Agent")
 
 @mcp.tool()
-def run_code_documenter_agent(prompt: str) -> str:
+async def run_code_documenter_agent(prompt: str) -> str:
     """
     Forward a user's natural language request to the Code Documenter Agent.
 
@@ -251,7 +408,25 @@ def run_code_documenter_agent(prompt: str) -> str:
     Returns:
         str: The final response from the Code Documenter Agent, or an error message if the run fails.
     """   
-    return _invoke_agent("CODE_DOCUMENTER_AGENT_ID", prompt, friendly_name="Code Documenter Agent")
+    return await _invoke_agent("CODE_DOCUMENTER_AGENT_ID", prompt, friendly_name="Code Documenter Agent")
+
+@mcp.tool()
+async def run_code_documenter_agent_streaming(prompt: str, ctx: Context) -> str:
+    """
+    Streaming variant of run_code_documenter_agent for large files.
+
+    The documentation is forwarded while the agent generates it, as MCP progress notifications
+    (progress = characters received so far, message = the newly generated text), so the client
+    sees output within seconds instead of waiting for the whole run. The complete response is
+    still returned at the end.
+
+    Args:
+        prompt (str): user prompt with code snippet, project details, or documentation requirements
+
+    Returns:
+        str: The final response from the Code Documenter Agent, or an error message if the run fails.
+    """
+    return await _invoke_agent_streaming("CODE_DOCUMENTER_AGENT_ID", prompt, ctx, friendly_name="Code Documenter Agent")
 
 # === Start MCP ===
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+"""
+Shared pytest setup.
+
+The tools import each other as top-level modules (``import code_documentation_tool``,
+``from utils.result_cache import ...``), the way tools_api/main.py runs them, so the
+repository root and tools_api/ are put on sys.path before any test module is collected.
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(REPO_ROOT, "tools_api"), REPO_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def github_repo(tmp_path, monkeypatch):
+    """
+    Factory serving ``{path: text}`` as repository bench/samples (branch main).
+
+    github_tools talks to the in-memory MockGitHubSession of the pipeline benchmark
+    instead of api.github.com, with a fresh ETag cache and repository index cache.
+    """
+    from collections import OrderedDict
+
+    import github_tools
+    from benchmarks.pipeline_benchmark import MockGitHubSession
+    from utils.github_http_cache import GitHubETagCache
+
+    monkeypatch.setattr(github_tools, "USE_GITHUB_ETAG_CACHE", True)
+    monkeypatch.setattr(github_tools, "github_etag_cache", GitHubETagCache(str(tmp_path / "etag_cache")))
+    monkeypatch.setattr(github_tools, "_repository_indexes", OrderedDict())
+
+    def make(files):
+        root = tmp_path / "repository"
+        for path, text in files.items():
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            (root / path).write_text(text, encoding="utf-8")
+        session = MockGitHubSession(str(root), sorted(files))
+        monkeypatch.setattr(github_tools, "_session", session)
+        return session
+
+    return make
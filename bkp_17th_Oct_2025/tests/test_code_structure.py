@@ -0,0 +1,130 @@
+"""Tests for the boundary-aware splitter: utils/code_structure.py and split_code_intelligently."""
+
+from utils.code_structure import detect_language, index_code_units
+from utils.code_documentation_helper import split_code_intelligently
+
+JAVA_SOURCE = """package com.example;
+
+import java.util.List;
+
+/**
+ * Orders service.
+ */
+public class OrderService {
+    private final String name = "{not a block}";
+
+    // Creates an order
+    @Transactional
+    public void create(List<String> items) {
+        if (items.isEmpty()) {
+            throw new IllegalArgumentException("empty }");
+        }
+    }
+
+    /* Cancels
+       an order */
+    public void cancel(String id) {
+        String json = "{\\"id\\": 1}";
+    }
+}
+"""
+
+PYTHON_SOURCE = '''import os
+
+
+class Repository:
+    """Stores rows."""
+
+    def __init__(self):
+        self.rows = []
+
+    @property
+    def size(self):
+        text = """
+def not_a_function():
+    pass
+"""
+        return len(self.rows)
+
+
+def helper(value):
+    if value:
+        return value
+    else:
+        return None
+'''
+
+
+def _units(code, language):
+    return [(unit.kind, unit.name) for unit in index_code_units(code, language) if unit.kind != "other"]
+
+
+def test_units_cover_the_file_exactly():
+    for code, language in ((JAVA_SOURCE, "java"), (PYTHON_SOURCE, "python")):
+        units = index_code_units(code, language)
+        assert "\n".join(unit.text for unit in units) == code
+        assert all(a.end_line == b.start_line for a, b in zip(units, units[1:]))
+
+
+def test_java_units_ignore_braces_in_strings_and_comments():
+    assert _units(JAVA_SOURCE, "java") == [("class", "OrderService"), ("method", "create"), ("method", "cancel")]
+
+
+def test_leading_comments_and_annotations_stay_with_their_declaration():
+    units = {unit.name: unit for unit in index_code_units(JAVA_SOURCE, "java")}
+    assert units["create"].text.lstrip().startswith("// Creates an order\n    @Transactional")
+    assert units["create"].signature == "public void create(List<String> items) {"
+    assert units["cancel"].text.lstrip().startswith("/* Cancels")
+
+
+def test_python_units_ignore_code_in_strings():
+    assert _units(PYTHON_SOURCE, "python") == [
+        ("class", "Repository"), ("method", "__init__"), ("method", "size"), ("function", "helper")
+    ]
+    size = next(unit for unit in index_code_units(PYTHON_SOURCE, "python") if unit.name == "size")
+    assert size.text.lstrip().startswith("@property")
+
+
+def test_detect_language():
+    assert detect_language("src/App.tsx") == "typescript"
+    assert detect_language("lib/module.hpp") == "cpp"
+    assert detect_language(code=PYTHON_SOURCE) == "python"
+    assert detect_language(code=JAVA_SOURCE) == "java"
+
+
+def _java_class(methods):
+    body = "\n\n".join(
+        f"    public int method{i}(int value) {{\n        int result = value * {i};\n        return result + {i};\n    }}"
+        for i in range(methods)
+    )
+    return f"public class Big {{\n{body}\n}}\n"
+
+
+def test_split_keeps_method_bodies_whole_and_respects_the_budget():
+    code = _java_class(40)
+    chunks = split_code_intelligently(code, 600, "java")
+    assert len(chunks) > 1
+    assert "\n".join(chunks) == code
+    assert all(len(chunk) <= 600 for chunk in chunks)
+    for chunk in chunks:
+        assert chunk.count("{") - chunk.count("}") in (0, 1, -1)
+        assert "int result" not in chunk.split("\n")[0]
+
+
+def test_split_uses_the_first_chunk_budget_and_measure():
+    code = _java_class(40)
+    chunks = split_code_intelligently(code, 100, "java", first_chunk_size=30, measure=lambda text: len(text.split()))
+    assert "\n".join(chunks) == code
+    assert len(chunks[0].split()) <= 30
+    assert all(len(chunk.split()) <= 100 for chunk in chunks[1:])
+
+
+def test_oversized_unit_falls_back_to_line_splitting():
+    code = "public class Huge {\n    public void run() {\n" + "        call();\n" * 200 + "    }\n}\n"
+    chunks = split_code_intelligently(code, 300, "java")
+    assert "\n".join(chunks) == code
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+
+def test_small_code_is_one_chunk():
+    assert split_code_intelligently(JAVA_SOURCE, 100000, "java") == [JAVA_SOURCE]
@@ -0,0 +1,66 @@
+"""Tests for the breadth-first dependency closure (collect_dependency_closure)."""
+
+from utils import code_documentation_helper as helper
+
+# a -> b, c; b -> d; c -> d; d -> a (cycle back to the root)
+FILES = {
+    "pkg/a.py": "import pkg.b\nimport pkg.c\n",
+    "pkg/b.py": "import pkg.d\n",
+    "pkg/c.py": "import pkg.d\n",
+    "pkg/d.py": "import pkg.a\n" + "# padding\n" * 20,
+    "docs/notes.txt": "not code\n",
+}
+
+
+def _paths(files):
+    return [file_info["path"] for file_info in files]
+
+
+def test_depth_one_collects_direct_imports_only(github_repo):
+    github_repo(FILES)
+    files = helper.collect_dependency_closure("bench", "samples", "main", "pkg/a.py", FILES["pkg/a.py"], depth=1)
+    assert _paths(files) == ["pkg/a.py", "pkg/b.py", "pkg/c.py"]
+    assert files[1]["content"] == FILES["pkg/b.py"]
+
+
+def test_transitive_imports_are_fetched_once_despite_cycles(github_repo):
+    session = github_repo(FILES)
+    files = helper.collect_dependency_closure("bench", "samples", "main", "pkg/a.py", FILES["pkg/a.py"], depth=5)
+    assert _paths(files) == ["pkg/a.py", "pkg/b.py", "pkg/c.py", "pkg/d.py"]
+    # The root is passed in; every other file is downloaded exactly once
+    assert session.calls["get_contents"] == 3
+
+
+def test_file_budget_includes_the_root(github_repo):
+    github_repo(FILES)
+    files = helper.collect_dependency_closure(
+        "bench", "samples", "main", "pkg/a.py", FILES["pkg/a.py"], depth=5, max_files=2
+    )
+    assert _paths(files) == ["pkg/a.py", "pkg/b.py"]
+
+
+def test_byte_budget_stops_before_the_file_that_exceeds_it(github_repo):
+    github_repo(FILES)
+    budget = len(FILES["pkg/a.py"]) + len(FILES["pkg/b.py"]) + len(FILES["pkg/c.py"]) + 10
+    files = helper.collect_dependency_closure(
+        "bench", "samples", "main", "pkg/a.py", FILES["pkg/a.py"], depth=5, max_bytes=budget
+    )
+    assert _paths(files) == ["pkg/a.py", "pkg/b.py", "pkg/c.py"]
+    assert sum(len(file_info["content"]) for file_info in files) <= budget
+
+
+def test_files_without_dependency_support_are_leaves(github_repo):
+    session = github_repo(FILES)
+    files = helper.collect_dependency_closure("bench", "samples", "main", "docs/notes.txt", FILES["docs/notes.txt"])
+    assert _paths(files) == ["docs/notes.txt"]
+    assert session.calls["get_contents"] == 0
+
+
+def test_unreadable_dependencies_are_skipped(github_repo, monkeypatch):
+    github_repo(FILES)
+    fetch = helper._fetch_dependency
+    monkeypatch.setattr(helper, "_fetch_dependency",
+                        lambda owner, repo, branch, path: None if path == "pkg/b.py" else fetch(owner, repo, branch, path))
+    files = helper.collect_dependency_closure("bench", "samples", "main", "pkg/a.py", FILES["pkg/a.py"], depth=5)
+    # d is still reached through c
+    assert _paths(files) == ["pkg/a.py", "pkg/c.py", "pkg/d.py"]
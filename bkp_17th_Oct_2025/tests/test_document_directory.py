@@ -0,0 +1,154 @@
+"""Tests for the concurrent document_directory pipeline (github_integration_tool)."""
+
+import importlib
+import sys
+import threading
+import time
+
+import pytest
+
+from benchmarks.pipeline_benchmark import MockAgent, MockGitHubSession
+
+
+def _import_packaged_tool():
+    """
+    Import tools_api.github_integration_tool, which imports its helpers as tools_api.utils.
+
+    utils/ is registered under that name as the benchmark does. Importing the
+    package loads second copies of the utils submodules and rebinds them on the
+    utils package, so the original bindings are restored for the other tests.
+    """
+    utils = importlib.import_module("utils")
+    bindings = dict(vars(utils))
+    sys.modules.setdefault("tools_api.utils", utils)
+    try:
+        return importlib.import_module("tools_api.github_integration_tool")
+    finally:
+        vars(utils).clear()
+        vars(utils).update(bindings)
+
+
+github_integration_tool = _import_packaged_tool()
+
+FILES = {
+    "svc/Orders.java": "public class Orders {\n    int count;\n}\n",
+    "svc/Billing.java": "public class Billing {\n    int total;\n}\n",
+    "svc/Shipping.java": "public class Shipping {\n    int weight;\n}\n",
+    "svc/Orders_documented.java": "// documented by an earlier run\npublic class Orders {}\n",
+    "svc/notes.md": "# Notes\n",
+}
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """The packaged github_integration_tool talking to a mock GitHub and a mock agent."""
+    from tools_api import github_tools
+
+    root = tmp_path / "repository"
+    for path, text in FILES.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(text, encoding="utf-8")
+    session = MockGitHubSession(str(root), sorted(FILES))
+    agent = MockAgent(latency=0.0, seconds_per_1k_tokens=0.0)
+    monkeypatch.setattr(github_tools, "_session", session)
+    monkeypatch.setattr(github_tools, "USE_GITHUB_ETAG_CACHE", False)
+    monkeypatch.setattr(github_integration_tool, "code_documenter_agent", agent.document)
+    return github_integration_tool, session, agent
+
+
+def _read(session, path):
+    return session._blobs[session._head_files()[path]].decode("utf-8")
+
+
+def test_select_directory_files_skips_earlier_outputs():
+    select_directory_files = github_integration_tool.select_directory_files
+    contents = [
+        {"path": "svc/B.java", "type": "file"},
+        {"path": "svc/A.java", "type": "file"},
+        {"path": "svc/A_documented.java", "type": "file"},
+        {"path": "svc/A_analysis_java.md", "type": "file"},
+        {"path": "svc/sub", "type": "dir"},
+        {"path": "svc/readme.md", "type": "file"},
+    ]
+    assert select_directory_files(contents, ".java, .MD", "_documented") == ["svc/A.java", "svc/B.java", "svc/readme.md"]
+    assert select_directory_files(contents, ".java", "_documented") == ["svc/A.java", "svc/B.java"]
+
+
+def test_every_file_is_documented_in_one_commit(pipeline):
+    tool, session, agent = pipeline
+    old_head = session._head
+    events = []
+    summary = tool.run_document_directory_pipeline("bench", "samples", "svc", "main", file_extensions=".java",
+                                                   progress_callback=events.append)
+
+    assert (summary["total"], summary["documented"], summary["failed"]) == (3, 3, 0)
+    assert agent.stats()["calls"] == 3
+    assert session.calls["post_commit"] == 1
+    assert session.calls["patch_ref"] == 1
+    assert summary["commit"]["sha"] == session._head
+    assert session._commits[session._head]["parents"] == [old_head]
+
+    outputs = {item["file"]: item["outputs"] for item in summary["files"]}
+    assert outputs["svc/Billing.java"] == ["svc/Billing_documented.java", "svc/Billing_analysis_java.md"]
+    assert "public class Billing" in _read(session, "svc/Billing_documented.java")
+    assert "Executive Summary" in _read(session, "svc/Billing_analysis_java.md")
+    # The earlier output is not documented itself, it is replaced by the new documentation
+    assert "int count;" in _read(session, "svc/Orders_documented.java")
+
+    stages = {}
+    for event in events:
+        stages.setdefault(event["file"], []).append(event["stage"])
+    assert stages == {path: ["fetched", "documented", "uploaded"] for path in outputs}
+    assert events[-1]["completed"] == events[-1]["total"] == 3
+
+
+def test_failing_file_is_reported_and_skipped(pipeline, monkeypatch):
+    tool, session, agent = pipeline
+
+    def document(prompt, include_analysis=True, language=None):
+        if "Billing" in prompt:
+            return "Error: agent run failed"
+        return agent.document(prompt, include_analysis, language)
+
+    monkeypatch.setattr(tool, "code_documenter_agent", document)
+    summary = tool.run_document_directory_pipeline("bench", "samples", "svc", "main", file_extensions=".java")
+
+    failed = [item for item in summary["files"] if item["status"] == "failed"]
+    assert [(item["file"], item["stage"]) for item in failed] == [("svc/Billing.java", "document")]
+    assert summary["documented"] == 2
+    assert session.calls["post_commit"] == 1
+    assert "svc/Orders_documented.java" in session._head_files()
+    assert "svc/Billing_documented.java" not in session._head_files()
+
+    report = tool.format_directory_summary("bench/samples", summary, [])
+    assert "2 documented, 1 failed, 3 total" in report
+    assert "❌ svc/Billing.java (document stage): Error: agent run failed" in report
+
+
+def test_nothing_is_committed_when_every_file_fails(pipeline, monkeypatch):
+    tool, session, _ = pipeline
+    monkeypatch.setattr(tool, "code_documenter_agent", lambda prompt, include_analysis=True: "")
+    summary = tool.run_document_directory_pipeline("bench", "samples", "svc", "main", file_extensions=".java")
+    assert summary["documented"] == 0 and summary["commit"] is None
+    assert session.calls["post_commit"] == 0
+
+
+def test_agent_runs_are_bounded_by_the_document_pool(pipeline, monkeypatch):
+    tool, session, agent = pipeline
+    monkeypatch.setattr(tool, "DIRECTORY_DOCUMENT_CONCURRENCY", 2)
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+
+    def document(prompt, include_analysis=True, language=None):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return agent.document(prompt, include_analysis, language)
+
+    monkeypatch.setattr(tool, "code_documenter_agent", document)
+    summary = tool.run_document_directory_pipeline("bench", "samples", "svc", "main", file_extensions=".java")
+    assert summary["documented"] == 3
+    assert running["max"] == 2
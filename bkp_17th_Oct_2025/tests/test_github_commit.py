@@ -0,0 +1,84 @@
+"""Tests for single-commit uploads through the Git Data API (commit_files_to_github)."""
+
+import pytest
+
+import github_tools
+
+FILES = {"src/App.java": "class App {}\n", "README.md": "# Samples\n"}
+
+
+def _head(session):
+    return session._head
+
+
+def test_files_land_in_one_commit_on_top_of_the_head(github_repo):
+    session = github_repo(FILES)
+    old_head = _head(session)
+    result = github_tools.commit_files_to_github("bench", "samples", [
+        {"path": "/docs/App.md", "content": "# App\\n\\nDocumented  \\n"},
+        {"path": "src/App.java", "content": "/** App */\nclass App {}\n"},
+    ], "Add documentation")
+
+    assert result["files"] == ["docs/App.md", "src/App.java"]
+    assert result["commit"]["sha"] == _head(session)
+    assert session._commits[_head(session)]["parents"] == [old_head]
+    assert session._commits[_head(session)]["message"] == "Add documentation"
+    assert session.calls["post_commit"] == 1
+    assert session.calls["patch_ref"] == 1
+    assert session.calls["post_blob"] == 2
+
+    # Untouched files are kept from the base tree; content is cleaned like commit_to_github
+    assert github_tools.fetch_github_file_content("bench", "samples", "README.md") == "# Samples\n"
+    assert github_tools.fetch_github_file_content("bench", "samples", "docs/App.md") == "# App\nDocumented"
+    assert github_tools.fetch_github_file_content("bench", "samples", "src/App.java") == "/** App */\nclass App {}"
+
+
+def test_create_blob_only_cleans_on_request(github_repo):
+    session = github_repo(FILES)
+    raw = github_tools.create_blob("bench", "samples", "a  \n\nb\n")
+    clean = github_tools.create_blob("bench", "samples", "a  \n\nb\n", clean=True)
+    assert session._blobs[raw] == b"a  \n\nb\n"
+    assert session._blobs[clean] == b"a\nb"
+
+
+def test_commit_is_rebuilt_when_the_branch_moves(github_repo):
+    session = github_repo(FILES)
+    post_commit = session._post_commit
+    moved = []
+
+    def post_commit_racing(payload):
+        if not moved:
+            # Another writer commits between reading the head and updating the ref
+            moved.append(session._put_contents({"content": "IyBPdGhlcgo=", "message": "Other"}, "OTHER.md"))
+        return post_commit(payload)
+
+    session._post_commit = post_commit_racing
+    blob_sha = github_tools.create_blob("bench", "samples", "/** App */\n")
+    result = github_tools.commit_tree_to_github("bench", "samples", [{"path": "src/App.java", "sha": blob_sha}], "Docs")
+
+    assert session.calls["post_commit"] == 2
+    assert session.calls["post_blob"] == 1
+    assert result["commit"]["sha"] == _head(session)
+    assert github_tools.fetch_github_file_content("bench", "samples", "OTHER.md") == "# Other\n"
+    assert github_tools.fetch_github_file_content("bench", "samples", "src/App.java") == "/** App */\n"
+
+
+def test_conflict_is_raised_after_the_last_attempt(github_repo):
+    session = github_repo(FILES)
+    post_commit = session._post_commit
+
+    def post_commit_always_racing(payload):
+        session._put_contents({"content": "IyBPdGhlcgo=", "message": "Other"}, "OTHER.md")
+        return post_commit(payload)
+
+    session._post_commit = post_commit_always_racing
+    blob_sha = github_tools.create_blob("bench", "samples", "x\n")
+    with pytest.raises(github_tools.GitHubConflictError):
+        github_tools.commit_tree_to_github("bench", "samples", [{"path": "x.txt", "sha": blob_sha}], "X", max_attempts=2)
+    assert session.calls["post_commit"] == 2
+
+
+def test_empty_commits_are_rejected(github_repo):
+    github_repo(FILES)
+    with pytest.raises(github_tools.GitHubError):
+        github_tools.commit_files_to_github("bench", "samples", [], "Nothing")
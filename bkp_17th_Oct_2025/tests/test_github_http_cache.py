@@ -0,0 +1,70 @@
+"""Tests for the ETag cache of GitHub fetches and listings (utils/github_http_cache.py, github_tools)."""
+
+import base64
+
+import pytest
+
+import github_tools
+from utils.github_http_cache import GitHubETagCache
+
+FILES = {"src/App.java": "class App {}\n", "src/Util.java": "class Util {}\n", "README.md": "# Samples\n"}
+
+
+def test_entries_persist_with_their_etag(tmp_path):
+    cache = GitHubETagCache(str(tmp_path))
+    cache.store("https://api.github.com/x?ref=main", '"abc"', {"value": 1})
+    reloaded = GitHubETagCache(str(tmp_path))
+    assert reloaded.lookup("https://api.github.com/x?ref=main") == {"etag": '"abc"', "value": {"value": 1}}
+    assert reloaded.lookup("https://api.github.com/x?ref=dev") is None
+    reloaded.record_not_modified()
+    assert reloaded.stats()["not_modified"] == 1
+
+
+def test_unchanged_file_is_revalidated_not_downloaded(github_repo):
+    session = github_repo(FILES)
+    assert github_tools.fetch_github_file_content("bench", "samples", "src/App.java") == "class App {}\n"
+    assert github_tools.fetch_github_file_content("bench", "samples", "src/App.java") == "class App {}\n"
+    assert session.calls["get_contents"] == 2
+    assert github_tools.github_etag_cache.stats()["not_modified"] == 1
+
+
+def test_changed_file_is_downloaded_again(github_repo):
+    github_repo(FILES)
+    github_tools.fetch_github_file_content("bench", "samples", "src/App.java")
+    github_tools.github_request("PUT", "https://api.github.com/repos/bench/samples/contents/src/App.java", json={
+        "message": "Edit", "content": base64.b64encode(b"class App { int x; }\n").decode("ascii")
+    })
+    assert github_tools.fetch_github_file_content("bench", "samples", "src/App.java") == "class App { int x; }\n"
+    assert github_tools.github_etag_cache.stats()["not_modified"] == 0
+
+
+def test_directory_listings_are_cached(github_repo):
+    github_repo(FILES)
+    first = github_tools.list_repository_contents("bench", "samples", "src")
+    second = github_tools.list_repository_contents("bench", "samples", "src")
+    assert [entry["path"] for entry in first] == ["src/App.java", "src/Util.java"]
+    assert second == first
+    assert github_tools.github_etag_cache.stats()["not_modified"] == 1
+
+
+def test_each_ref_has_its_own_entry(github_repo):
+    github_repo(FILES)
+    github_tools.fetch_github_file_content("bench", "samples", "README.md")
+    github_tools.fetch_github_file_content("bench", "samples", "README.md", branch="release")
+    stats = github_tools.github_etag_cache.stats()
+    assert stats["size"] == 2 and stats["not_modified"] == 0
+
+
+def test_cache_can_be_disabled(github_repo, monkeypatch):
+    github_repo(FILES)
+    monkeypatch.setattr(github_tools, "USE_GITHUB_ETAG_CACHE", False)
+    github_tools.fetch_github_file_content("bench", "samples", "README.md")
+    github_tools.fetch_github_file_content("bench", "samples", "README.md")
+    stats = github_tools.github_etag_cache.stats()
+    assert stats["size"] == 0 and stats["not_modified"] == 0
+
+
+def test_directories_are_rejected_as_files(github_repo):
+    github_repo(FILES)
+    with pytest.raises(github_tools.GitHubError, match="is a directory"):
+        github_tools.fetch_github_file_content("bench", "samples", "src")
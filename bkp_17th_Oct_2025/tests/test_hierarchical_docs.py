@@ -0,0 +1,196 @@
+"""Tests for the HIERARCHICAL large-file strategy (code_documenter_agent_hierarchical) and its routing."""
+
+import re
+import threading
+
+import pytest
+
+import code_documentation_tool
+from utils import code_documentation_helper as helper
+from utils.token_counter import get_token_counter
+
+REGIONS = 8
+FUNCTIONS = [
+    f"def step_{i}(value):\n"
+    f"    \"\"\"Step {i} of the pipeline.\"\"\"\n"
+    f"    total = value + {i}\n"
+    f"    for _ in range(3):\n"
+    f"        total = total * 2 + {i}\n"
+    f"    return total\n"
+    for i in range(1, REGIONS + 1)
+]
+CODE = "\n\n".join(FUNCTIONS)
+PROMPT = "Document this file.\n\n## Code to Analyze:\n" + CODE
+
+
+class FakeAgent:
+    """Answers summary, merge, region and report prompts; ``fail`` picks prompts to answer with an error."""
+
+    def __init__(self, fail=lambda prompt: False):
+        self.fail = fail
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, include_analysis=True, language=None):
+        with self._lock:
+            self.prompts.append(prompt)
+        if self.fail(prompt):
+            return "Error: agent run failed"
+        if "Summarize the following code region" in prompt:
+            part = re.search(r"part (\d+) of", prompt).group(1)
+            return f"### PART 1: CHUNK ANALYSIS\nsummary of region {part}"
+        if "Merge them into one set of notes" in prompt:
+            return "### PART 1: CHUNK ANALYSIS\n" + " + ".join(re.findall(r"summary of region \d+", prompt))
+        if "Merge them into a single comprehensive analysis" in prompt:
+            return f"### PART 1: COMPREHENSIVE ANALYSIS\nreport over {prompt.count('#### ')} notes"
+        code = prompt.split("## Code to Analyze:\n", 1)[1].split("\n\nNote: This is part")[0]
+        return "### PART 2: DOCUMENTED CODE\n# documented\n" + code
+
+    def of_kind(self, marker):
+        return [prompt for prompt in self.prompts if marker in prompt]
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Fake agent with one region per function and a binary summary tree."""
+    fake = FakeAgent()
+    monkeypatch.setattr(code_documentation_tool, "run_documenter_prompt", fake)
+    # Regions are measured in tokens only, with room for one function but not for two
+    monkeypatch.setattr(helper, "AGENT_MESSAGE_MAX_CHARS", 10 ** 8)
+    monkeypatch.setattr(helper, "HIERARCHY_REGION_MAX_TOKENS", get_token_counter().count(FUNCTIONS[-1]) * 3 // 2)
+    monkeypatch.setattr(helper, "HIERARCHY_FANOUT", 2)
+    return fake
+
+
+def _documented_code(result):
+    return result.split("### PART 2: DOCUMENTED CODE")[1]
+
+
+def test_call_count_follows_the_summary_tree(monkeypatch):
+    # 8 summaries + 4 + 2 + 1 merges + 8 regions + 1 report
+    assert helper._hierarchy_calls(8, 2) == 24
+    assert helper._hierarchy_calls(8, 8) == 18
+    monkeypatch.setattr(helper, "HIERARCHY_FANOUT", 2)
+    assert helper._hierarchy_fanout(8, 100, max_calls=0) == 2
+    assert helper._hierarchy_fanout(8, 100, max_calls=20) == 4
+    # The widest tree is used when the budget cannot be met
+    assert helper._hierarchy_fanout(8, 100, max_calls=5) == 8
+
+
+def test_long_context_keeps_the_whole_file_and_nearest_ancestors():
+    chain = [("Whole file", "root notes")] + [(f"Level {k}", f"notes {k} " + "word " * 40) for k in range(1, 6)]
+    budget = get_token_counter().count(helper._format_chunk_notes([chain[0], chain[4], chain[5]])) + 1
+    context = helper._hierarchy_context(chain, max_tokens=budget)
+    assert "#### Whole file" in context and "#### Level 4" in context and "#### Level 5" in context
+    assert "#### Level 1" not in context and "#### Level 3" not in context
+    assert context.index("Whole file") < context.index("Level 4") < context.index("Level 5")
+
+
+def test_regions_are_documented_and_recombined_in_order(agent):
+    result = helper.code_documenter_agent_hierarchical(PROMPT, language="python", max_calls=0)
+
+    assert result.startswith("### PART 1: COMPREHENSIVE ANALYSIS\n\nreport over 2 notes")
+    assert f"processed in {REGIONS} regions (4 summary levels)" in result
+    code = _documented_code(result)
+    positions = [code.index(f"def step_{i}(") for i in range(1, REGIONS + 1)]
+    assert positions == sorted(positions)
+    assert code.count("# documented") == REGIONS
+    assert len(agent.prompts) == helper._hierarchy_calls(REGIONS, 2)
+
+
+def test_regions_see_their_ancestor_summaries_only(agent):
+    helper.code_documenter_agent_hierarchical(PROMPT, language="python", max_calls=0)
+    first = next(prompt for prompt in agent.of_kind("Document the following code region") if "part 1 of" in prompt)
+
+    context = first.split("## Code to Analyze:")[0]
+    assert "#### Whole file" in context
+    assert "#### Parts 1-4 of 8" in context and "#### Parts 1-2 of 8" in context
+    assert "Parts 5-8" not in context and "Parts 3-4" not in context
+    # Only the region itself is sent as code
+    assert "def step_1(" in first and "def step_2(" not in first
+
+
+def test_call_budget_widens_the_tree(agent):
+    result = helper.code_documenter_agent_hierarchical(PROMPT, language="python", max_calls=20)
+    # Fanout 4: 8 summaries + 2 + 1 merges + 8 regions + 1 report
+    assert len(agent.prompts) == 20
+    assert "(3 summary levels)" in result
+    assert _documented_code(result).count("# documented") == REGIONS
+
+
+def test_failed_summaries_and_merges_keep_the_structure(agent):
+    agent.fail = lambda prompt: "part 3 of 8" in prompt and "Summarize" in prompt or "Merge them into one" in prompt
+    result = helper.code_documenter_agent_hierarchical(PROMPT, language="python", max_calls=0)
+
+    third = next(prompt for prompt in agent.of_kind("Document the following code region") if "part 3 of" in prompt)
+    # The failed summary is replaced by the region outline, failed merges by their child notes
+    assert "def step_3(value)" in third.split("## Code to Analyze:")[0]
+    assert "summary of region 4" in third.split("## Code to Analyze:")[0]
+    assert _documented_code(result).count("# documented") == REGIONS
+
+
+def test_failed_report_falls_back_to_the_whole_file_summary(agent):
+    agent.fail = lambda prompt: "Merge them into a single comprehensive analysis" in prompt
+    result = helper.code_documenter_agent_hierarchical(PROMPT, language="python", max_calls=0)
+    analysis = result.split("### PART 2")[0]
+    assert "summary of region 1 + summary of region 2" in analysis
+    assert "summary of region 8" in analysis
+
+
+def test_all_regions_failing_is_an_error(agent):
+    agent.fail = lambda prompt: "Document the following code region" in prompt
+    result = helper.code_documenter_agent_hierarchical(PROMPT, language="python", max_calls=0)
+    assert result.startswith("Error: Failed to process large file")
+
+
+def test_small_files_are_documented_directly(agent, monkeypatch):
+    monkeypatch.setattr(helper, "HIERARCHY_REGION_MAX_TOKENS", 100000)
+    calls = []
+    monkeypatch.setattr(helper, "code_documenter_agent_with_chunking",
+                        lambda prompt, include_analysis=True, **kwargs: calls.append(prompt) or "direct")
+    assert helper.code_documenter_agent_hierarchical(PROMPT, language="python") == "direct"
+    assert calls == [PROMPT] and agent.prompts == []
+
+
+def test_handle_large_content_returns_content_for_the_hierarchical_strategy(agent, monkeypatch):
+    monkeypatch.setattr(helper, "LARGE_FILE_THRESHOLD_TOKENS", 10)
+    assert helper.handle_large_content(PROMPT, helper.LargeFileStrategy.HIERARCHICAL, "python") == PROMPT
+    assert agent.prompts == []
+
+
+@pytest.fixture
+def routed(agent, monkeypatch):
+    """HIERARCHICAL strategy with the hierarchical documenter replaced by a recorder"""
+    routed = []
+
+    def hierarchical(prompt, language=None, **kwargs):
+        routed.append(language)
+        return "### PART 1: COMPREHENSIVE ANALYSIS\nreport\n\n### PART 2: DOCUMENTED CODE\n" + CODE
+
+    monkeypatch.setattr(helper, "LARGE_FILE_STRATEGY", helper.LargeFileStrategy.HIERARCHICAL)
+    monkeypatch.setattr(helper, "code_documenter_agent_hierarchical", hierarchical)
+    monkeypatch.setattr(code_documentation_tool, "USE_DOC_RESULT_CACHE", False)
+    return routed
+
+
+@pytest.mark.parametrize("threshold, expected", [(10, ["python"]), (10 ** 6, [])])
+def test_code_documenter_agent_uses_the_strategy_only_above_the_threshold(routed, agent, monkeypatch,
+                                                                         threshold, expected):
+    monkeypatch.setattr(helper, "LARGE_FILE_THRESHOLD_TOKENS", threshold)
+    code_documentation_tool.code_documenter_agent(CODE, language="python")
+    assert routed == expected
+    # Below the threshold the prompt goes to the agent as usual
+    assert len(agent.prompts) == (0 if expected else 1)
+
+
+def test_generate_documentation_routes_large_files_to_the_hierarchical_strategy(routed, monkeypatch, tmp_path):
+    monkeypatch.setattr(helper, "LARGE_FILE_THRESHOLD_TOKENS", 10)
+    code_documentation_tool.generate_documentation(CODE, original_path=str(tmp_path / "pipeline.py"))
+    assert routed and set(routed) == {"python"}
+
+
+@pytest.mark.parametrize("threshold, expected", [(10, ["python"]), (10 ** 6, [])])
+def test_process_large_file_uses_the_strategy_only_above_the_threshold(routed, monkeypatch, threshold, expected):
+    monkeypatch.setattr(helper, "LARGE_FILE_THRESHOLD_TOKENS", threshold)
+    helper.process_large_file(PROMPT, "pipeline.py")
+    assert routed == expected
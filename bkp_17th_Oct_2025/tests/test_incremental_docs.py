@@ -0,0 +1,151 @@
+"""Tests for incremental re-documentation (utils/incremental_docs.py) and its use in generate_documentation."""
+
+import re
+
+import pytest
+
+from utils import incremental_docs
+from utils.incremental_docs import (
+    INCREMENTAL_NOTE,
+    DocumentationRecord,
+    DocumentationRecordStore,
+    plan_incremental_update,
+    record_target,
+    save_documentation_record,
+)
+from utils.code_documentation_helper import CHUNK_INSTRUCTION
+
+ANALYSIS = "Executive summary of the Calculator class: twenty small arithmetic helpers, no I/O, no state."
+
+
+def java_class(changed_method=None):
+    methods = []
+    for i in range(20):
+        body = f"return value * {i};" if i != changed_method else f"return value * {i} + 1;"
+        methods.append(f"    public int method{i}(int value) {{\n        {body}\n    }}")
+    return "package com.example;\n\npublic class Calculator {\n" + "\n\n".join(methods) + "\n}\n"
+
+
+def document_java(code):
+    """What the fake agent does: a Javadoc line above every method"""
+    return re.sub(r"^( *)public int (\w+)\(", r"\1/** Computes \2. */\n\1public int \2(", code, flags=re.MULTILINE)
+
+
+def test_record_target_includes_the_operation_type():
+    repo_info = {"owner": "o", "repo": "r", "branch": "main", "path": "src/Calc.java"}
+    assert record_target(repo_info=repo_info) == "github:o/r@main:src/Calc.java#document"
+    assert record_target(repo_info={**repo_info, "operation_type": "review"}) == "github:o/r@main:src/Calc.java#review"
+    assert record_target("Calc.java").endswith("Calc.java#document")
+    assert record_target() is None
+
+
+def test_saved_records_drop_the_markdown_fence(tmp_path, monkeypatch):
+    store = DocumentationRecordStore(str(tmp_path))
+    monkeypatch.setattr(incremental_docs, "record_store", store)
+    source = java_class()
+    save_documentation_record("local:Calc.java#document", source, "```java\n" + document_java(source) + "\n```",
+                              ANALYSIS, "java")
+    record = store.get("local:Calc.java#document")
+    assert record.documented_code == document_java(source).strip("\n")
+    assert record.language == "java"
+
+
+def test_plan_reuses_unchanged_units_of_a_fenced_record():
+    source = java_class()
+    record = DocumentationRecord(source, "```java\n" + document_java(source) + "\n```", ANALYSIS, "java", 0)
+    segments = plan_incremental_update(record, java_class(changed_method=7))
+    changed = [text for is_changed, text in segments if is_changed]
+    assert len(changed) == 1 and "value * 7 + 1" in changed[0]
+    assert "/** Computes method6. */" in "\n".join(text for is_changed, text in segments if not is_changed)
+
+
+def test_plan_gives_up_when_the_output_does_not_align():
+    source = java_class()
+    record = DocumentationRecord(source, "public class Renamed {\n}\n", ANALYSIS, "java", 0)
+    assert plan_incremental_update(record, java_class(changed_method=1)) is None
+
+
+@pytest.fixture
+def documentation_run(tmp_path, monkeypatch):
+    """generate_documentation with fake full and per-region agents and a temporary record store"""
+    import code_documentation_tool
+
+    calls = {"full": 0, "regions": []}
+    state = {"source": "", "analysis": ANALYSIS}
+
+    def full_agent(prompt, include_analysis=True, **kwargs):
+        calls["full"] += 1
+        return (f"### PART 1: COMPREHENSIVE ANALYSIS\n{state['analysis']}\n\n"
+                f"### PART 2: DOCUMENTED CODE\n```java\n{document_java(state['source'])}\n```")
+
+    def region_agent(prompt):
+        region = prompt.split(CHUNK_INSTRUCTION, 1)[1][1:].rsplit("\n\n" + INCREMENTAL_NOTE, 1)[0]
+        calls["regions"].append(region)
+        return f"### PART 2: DOCUMENTED CODE\n```java\n{document_java(region)}\n```"
+
+    store = DocumentationRecordStore(str(tmp_path / "records"))
+    monkeypatch.setattr(incremental_docs, "record_store", store)
+    monkeypatch.setattr(code_documentation_tool, "record_store", store)
+    monkeypatch.setattr(code_documentation_tool, "code_documenter_agent_with_chunking", full_agent)
+    monkeypatch.setattr(code_documentation_tool, "run_documenter_prompt", region_agent)
+    path = str(tmp_path / "Calculator.java")
+
+    def run(source, **kwargs):
+        state["source"] = source
+        return code_documentation_tool.generate_documentation(source, original_path=path, **kwargs)
+
+    return run, calls, state, store, path
+
+
+def test_second_run_of_a_one_method_edit_is_incremental(documentation_run):
+    run, calls, _, _, _ = documentation_run
+    run(java_class(), incremental=True)
+    assert calls["full"] == 1
+
+    edited = java_class(changed_method=7)
+    result = run(edited, incremental=True)
+    assert calls["full"] == 1
+    assert len(calls["regions"]) == 1
+    assert "value * 7 + 1" in calls["regions"][0] and "method6" not in calls["regions"][0]
+    assert "updated incrementally; 1 changed region(s)" in result
+    documented = result.split("### PART 2: DOCUMENTED CODE", 1)[1].strip()
+    assert documented == document_java(edited).strip()
+
+
+def test_incremental_mode_is_off_by_default(documentation_run):
+    run, calls, _, store, path = documentation_run
+    assert incremental_docs.USE_INCREMENTAL_DOCS is False
+    run(java_class())
+    run(java_class(changed_method=3))
+    assert calls["full"] == 2
+    assert store.get(record_target(path)) is None
+
+
+def test_synthetic_analyses_are_not_recorded(documentation_run):
+    run, calls, state, store, path = documentation_run
+    state["analysis"] = "ok"
+    run(java_class(), incremental=True)
+    assert calls["full"] == 1
+    assert store.get(record_target(path)) is None
+
+    state["analysis"] = ANALYSIS
+    run(java_class(), incremental=True)
+    assert store.get(record_target(path)).analysis == ANALYSIS
+
+
+def test_repeated_edits_eventually_refresh_the_analysis(documentation_run, monkeypatch):
+    run, calls, state, store, path = documentation_run
+    monkeypatch.setattr(incremental_docs, "INCREMENTAL_MAX_CHANGED_RATIO", 0.12)
+    run(java_class(), incremental=True)
+    assert store.get(record_target(path)).analysis_changed_ratio == 0
+
+    # Each one-method edit is small on its own, but they add up against the same analysis
+    state["analysis"] = ANALYSIS + " Refreshed."
+    source, ratios = java_class(), []
+    for method in (3, 7, 11):
+        source = source.replace(f"return value * {method};", f"return value * {method} + 1;")
+        run(source, incremental=True)
+        ratios.append(store.get(record_target(path)).analysis_changed_ratio)
+    assert calls["full"] == 2 and len(calls["regions"]) == 2
+    assert 0 < ratios[0] < ratios[1] <= 0.12 and ratios[2] == 0
+    assert store.get(record_target(path)).analysis == ANALYSIS + " Refreshed."
@@ -0,0 +1,157 @@
+"""Tests for the bounded job queue behind the API endpoints (utils/job_queue.py)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue, JobQueueFullError, JobStatus
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(**kwargs):
+        queues.append(JobQueue(**kwargs))
+        return queues[-1]
+
+    yield make
+    for job_queue in queues:
+        job_queue.shutdown(wait=True)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition not reached in time"
+        time.sleep(0.005)
+
+
+def test_job_result_and_status(make_queue):
+    job_queue = make_queue(workers=2)
+    job = job_queue.submit("add", lambda a, b=0: a + b, 2, b=3)
+    assert job.future.result(timeout=5) == 5
+    assert job_queue.get(job.job_id) is job
+    status = job.to_dict()
+    assert status["status"] == JobStatus.SUCCEEDED and status["error"] is None
+    assert status["run_seconds"] is not None and status["queued_seconds"] >= 0
+    # Inputs are released once the job is done
+    assert job.args == () and job.kwargs == {}
+
+
+def test_jobs_run_in_submission_order_on_one_worker(make_queue):
+    job_queue = make_queue(workers=1)
+    order = []
+    jobs = [job_queue.submit("append", order.append, index) for index in range(5)]
+    for job in jobs:
+        job.future.result(timeout=5)
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_workers_run_jobs_in_parallel(make_queue):
+    job_queue = make_queue(workers=3)
+    barrier = threading.Barrier(3, timeout=5)
+    jobs = [job_queue.submit("meet", barrier.wait) for _ in range(3)]
+    # Would raise BrokenBarrierError if fewer than 3 jobs ran at the same time
+    assert sorted(job.future.result(timeout=5) for job in jobs) == [0, 1, 2]
+
+
+def test_full_queue_rejects_new_jobs(make_queue):
+    job_queue = make_queue(workers=1, max_size=1)
+    release = threading.Event()
+    running = job_queue.submit("block", release.wait, 5)
+    _wait_for(lambda: running.status == JobStatus.RUNNING)
+    waiting = job_queue.submit("next", lambda: "done")
+    assert waiting.status == JobStatus.QUEUED
+
+    with pytest.raises(JobQueueFullError) as error:
+        job_queue.submit("rejected", lambda: None)
+    assert error.value.max_size == 1
+    stats = job_queue.stats()
+    assert (stats["running"], stats["queued"], stats["rejected"]) == (1, 1, 1)
+
+    release.set()
+    assert waiting.future.result(timeout=5) == "done"
+    assert job_queue.stats()["succeeded"] == 2
+
+
+def test_failures_are_recorded_and_raised(make_queue):
+    job_queue = make_queue(workers=1)
+
+    def fail():
+        raise ValueError("agent unavailable")
+
+    job = job_queue.submit("fail", fail)
+    with pytest.raises(ValueError, match="agent unavailable"):
+        job.future.result(timeout=5)
+    assert job.status == JobStatus.FAILED
+    assert job.error == "agent unavailable"
+    assert job_queue.stats()["failed"] == 1
+
+
+def test_run_awaits_without_blocking_the_event_loop(make_queue):
+    job_queue = make_queue(workers=1)
+    release = threading.Event()
+
+    async def scenario():
+        job = asyncio.ensure_future(job_queue.run("block", lambda: release.wait(5) and "finished"))
+        # The loop keeps serving other work while the job blocks a worker
+        await asyncio.sleep(0.05)
+        assert not job.done()
+        release.set()
+        return await job
+
+    assert asyncio.run(scenario()) == "finished"
+
+
+def test_run_raises_what_the_job_raised(make_queue):
+    job_queue = make_queue(workers=1)
+
+    async def scenario():
+        return await job_queue.run("divide", lambda: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(scenario())
+
+
+def test_cancelled_waiters_do_not_kill_the_worker(make_queue):
+    job_queue = make_queue(workers=1)
+    release = threading.Event()
+    running = job_queue.submit("block", lambda: release.wait(5) and "finished")
+    queued = job_queue.submit("never", lambda: "ran")
+
+    async def scenario():
+        # Both callers give up: the running job carries on, the queued one is dropped
+        for job in (running, queued):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(job_queue.wait(job), 0.05)
+        release.set()
+
+    asyncio.run(scenario())
+    assert running.future.result(timeout=5) == "finished"
+    _wait_for(lambda: queued.done)
+    assert queued.status == JobStatus.FAILED and queued.error == "Cancelled before it started"
+    # The single worker is still alive and the running count is back to zero
+    assert job_queue.submit("after", lambda: "ok").future.result(timeout=5) == "ok"
+    assert job_queue.stats()["running"] == 0
+
+
+def test_finished_jobs_expire_after_the_ttl(make_queue):
+    job_queue = make_queue(workers=1, result_ttl=60)
+    job = job_queue.submit("noop", lambda: None)
+    job.future.result(timeout=5)
+    assert job_queue.get(job.job_id) is job
+    job.finished_at -= 120
+    assert job_queue.get(job.job_id) is None
+    assert job_queue.stats()["tracked_jobs"] == 0
+
+
+def test_only_the_newest_finished_jobs_are_kept(make_queue):
+    job_queue = make_queue(workers=1, max_finished=2)
+    jobs = [job_queue.submit("noop", lambda: None) for _ in range(4)]
+    for job in jobs:
+        job.future.result(timeout=5)
+    _wait_for(lambda: job_queue.stats()["succeeded"] == 4)
+    assert [job_queue.get(job.job_id) is not None for job in jobs] == [False, False, True, True]
@@ -0,0 +1,121 @@
+"""Tests for the repository path index (github_tools) and import resolution against it."""
+
+import base64
+
+import github_tools
+from utils import code_documentation_helper as helper
+
+FILES = {
+    "src/main/java/com/acme/App.java": (
+        "package com.acme;\n"
+        "\n"
+        "import java.util.List;\n"
+        "import com.acme.model.Order;\n"
+        "import com.acme.util.*;\n"
+        "\n"
+        "public class App {\n"
+        "    private Helper helper;\n"
+        "    private Order order;\n"
+        "}\n"
+    ),
+    "src/main/java/com/acme/Helper.java": "package com.acme;\n\npublic class Helper {}\n",
+    "src/main/java/com/acme/Unused.java": "package com.acme;\n\npublic class Unused {}\n",
+    "src/main/java/com/acme/model/Order.java": "package com.acme.model;\n\npublic class Order {}\n",
+    "src/main/java/com/acme/util/Dates.java": "package com.acme.util;\n\npublic class Dates {}\n",
+    "src/main/java/com/acme/util/Strings.java": "package com.acme.util;\n\npublic class Strings {}\n",
+    "app/service.py": "from app.models import Order\nimport app.settings\nimport os\n",
+    "app/models.py": "class Order:\n    pass\n",
+    "app/settings.py": "DEBUG = False\n",
+    "main.ts": "import { api } from './api';\nimport { Widget } from './shared/widget';\nimport React from 'react';\n",
+    "api.ts": "export const api = {};\n",
+    "shared/widget/index.ts": "export class Widget {}\n",
+}
+
+
+def _index(paths, truncated=False):
+    tree = [{"path": path, "type": "blob"} for path in paths]
+    tree += [{"path": path.rsplit("/", 1)[0], "type": "tree"} for path in paths if "/" in path]
+    return github_tools.RepositoryIndex("bench", "samples", "abc123", tree, truncated)
+
+
+def test_normalize_strips_dots_and_slashes():
+    assert github_tools.RepositoryIndex.normalize("./src/../src/App.java") == "src/App.java"
+    assert github_tools.RepositoryIndex.normalize("/src/App.java ") == "src/App.java"
+    assert github_tools.RepositoryIndex.normalize(".") == ""
+
+
+def test_index_answers_path_queries():
+    index = _index(["src/App.java", "src/Util.java", "src/sub/Deep.java", "README.md"])
+    assert index.exists("src/App.java")
+    assert index.exists("./src/sub/../App.java")
+    assert not index.exists("src")
+    assert "src/sub" in index.directories
+    assert index.resolve(["missing/App.java", "src/Util.java", "src/App.java"]) == "src/Util.java"
+    assert index.resolve(["missing/App.java"]) is None
+    assert index.files_in("src", ".java") == ["src/App.java", "src/Util.java"]
+    assert index.files_in("") == ["README.md"]
+    assert index.find("Deep.java") == ["src/sub/Deep.java"]
+    assert index.find("*.java") == ["src/App.java", "src/Util.java", "src/sub/Deep.java"]
+    assert index.find("src/*.md") == []
+
+
+def test_index_is_cached_per_commit(github_repo):
+    session = github_repo(FILES)
+    first = github_tools.get_repository_index("bench", "samples", "main")
+    second = github_tools.get_repository_index("bench", "samples", "main")
+    assert first is second
+    assert session.calls["get_tree"] == 1
+    assert first.exists("app/models.py")
+
+    github_tools.github_request("PUT", "https://api.github.com/repos/bench/samples/contents/app/extra.py", json={
+        "message": "Add extra", "content": base64.b64encode(b"X = 1\n").decode("ascii")
+    })
+    third = github_tools.get_repository_index("bench", "samples", "main")
+    assert third is not first
+    assert third.commit_sha != first.commit_sha
+    assert third.exists("app/extra.py") and not first.exists("app/extra.py")
+    assert session.calls["get_tree"] == 2
+
+
+def test_java_imports_resolve_without_downloading_files(github_repo):
+    session = github_repo(FILES)
+    dependencies = helper.discover_dependencies(
+        FILES["src/main/java/com/acme/App.java"], "bench", "samples", "main", "java"
+    )
+    # Only explicit imports are followed; Helper is used from the same package without one
+    assert dependencies == {
+        "src/main/java/com/acme/model/Order.java",
+        "src/main/java/com/acme/util/Dates.java",
+        "src/main/java/com/acme/util/Strings.java",
+    }
+    assert session.calls["get_contents"] == 0
+
+
+def test_python_and_typescript_imports_resolve_without_downloading_files(github_repo):
+    session = github_repo(FILES)
+    assert helper.discover_dependencies(
+        FILES["app/service.py"], "bench", "samples", "main", "python"
+    ) == {"app/models.py", "app/settings.py"}
+    assert helper.discover_dependencies(
+        FILES["main.ts"], "bench", "samples", "main", "typescript"
+    ) == {"api.ts", "shared/widget/index.ts"}
+    assert session.calls["get_contents"] == 0
+
+
+def test_find_repository_files_by_pattern_uses_the_index(github_repo):
+    session = github_repo(FILES)
+    assert helper.find_repository_files_by_pattern("bench", "samples", ["Order.java", "*.ts"]) == {
+        "src/main/java/com/acme/model/Order.java", "main.ts", "api.ts", "shared/widget/index.ts"
+    }
+    assert session.calls["get_contents"] == 0
+
+
+def test_truncated_index_miss_falls_back_to_probing(github_repo):
+    session = github_repo(FILES)
+    partial = _index(["app/service.py"], truncated=True)
+    assert helper._resolve_repository_path("bench", "samples", "main", ["app/models.py"], partial) == "app/models.py"
+    assert session.calls["get_contents"] == 1
+
+    complete = _index(["app/service.py"])
+    assert helper._resolve_repository_path("bench", "samples", "main", ["app/models.py"], complete) is None
+    assert session.calls["get_contents"] == 1
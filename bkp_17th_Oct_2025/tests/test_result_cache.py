@@ -0,0 +1,195 @@
+"""Tests for utils/result_cache.py and its use in code_documenter_agent."""
+
+import os
+
+import pytest
+
+from utils.result_cache import DocumentationResultCache, PersistentLRUCache, is_cacheable_result, normalize_source
+
+DOCUMENTED = "### PART 1: COMPREHENSIVE ANALYSIS\nFine.\n\n### PART 2: DOCUMENTED CODE\n/** Adds. */\nint add() {}"
+
+
+def test_normalize_source_ignores_cosmetic_differences():
+    assert normalize_source("\n\nint a;  \r\nint b;\t\r\n\n") == "int a;\nint b;"
+
+
+def test_make_key_covers_every_field():
+    key = DocumentationResultCache.make_key("int a;", "instruction", "java", True)
+    assert key == DocumentationResultCache.make_key("int a;   \r\n", "instruction", "Java", True)
+    assert key != DocumentationResultCache.make_key("int b;", "instruction", "java", True)
+    assert key != DocumentationResultCache.make_key("int a;", "instruction v2", "java", True)
+    assert key != DocumentationResultCache.make_key("int a;", "instruction", "python", True)
+    assert key != DocumentationResultCache.make_key("int a;", "instruction", "java", False)
+    assert key != DocumentationResultCache.make_key("int a;", "instruction", "java", True, {"mode": "first"})
+    assert (DocumentationResultCache.make_key("int a;", "instruction", "java", True, {"a": 1, "b": 2})
+            == DocumentationResultCache.make_key("int a;", "instruction", "java", True, {"b": 2, "a": 1}))
+
+
+def test_values_persist_across_instances(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path), max_size=10, max_bytes=1024 * 1024)
+    cache.set("k1", {"text": "value"})
+    assert cache.get("k1") == {"text": "value"}
+
+    reloaded = PersistentLRUCache(str(tmp_path), max_size=10, max_bytes=1024 * 1024)
+    assert reloaded.get("k1") == {"text": "value"}
+    assert reloaded.get("missing") is None
+    assert reloaded.stats()["hits"] == 1 and reloaded.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path), max_size=3, max_bytes=1024 * 1024)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        os.utime(cache._entry_path(key), (0, 0))
+        cache._index[key].last_accessed = {"a": 1, "b": 3, "c": 2}[key]
+    cache.set("d", "d")
+    assert cache.get("a") is None
+    assert [cache.get(key) for key in ("b", "c", "d")] == ["b", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_is_enforced(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path), max_size=100, max_bytes=300)
+    cache.set("big", "x" * 1000)
+    assert cache.get("big") is None
+    for index in range(10):
+        cache.set(f"k{index}", "y" * 50)
+    assert cache.stats()["bytes"] <= 300
+
+
+def test_unreadable_entries_are_dropped(tmp_path):
+    cache = PersistentLRUCache(str(tmp_path), max_size=10, max_bytes=1024 * 1024)
+    cache.set("k", "value")
+    with open(cache._entry_path("k"), "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert cache.get("k") is None
+    assert not os.path.exists(cache._entry_path("k"))
+
+
+@pytest.mark.parametrize("result", [
+    None,
+    "   ",
+    "Error calling Code Documenter Agent: timeout",
+    "⚠️ Agent run timed out",
+    "### PART 1: COMPREHENSIVE ANALYSIS\nok\n### PART 2: DOCUMENTED CODE\nint a;\n\n// Error processing chunk 2: Empty result",
+    "### PART 1: COMPREHENSIVE ANALYSIS\nok\n### PART 2: DOCUMENTED CODE\nint a;\n\n// Exception in chunk 3: connection reset",
+    "### PART 2: DOCUMENTED CODE\n// Error: Chunk 1 too large to process\nint a;",
+])
+def test_failed_or_partial_results_are_not_cacheable(result):
+    assert not is_cacheable_result(result)
+
+
+def test_complete_results_are_cacheable():
+    assert is_cacheable_result(DOCUMENTED)
+
+
+@pytest.fixture
+def documentation_tool(tmp_path, monkeypatch):
+    """code_documentation_tool with a temporary result cache and a recording agent"""
+    import code_documentation_tool
+
+    calls = []
+
+    def fake_agent(prompt, include_analysis=True, **kwargs):
+        calls.append(include_analysis)
+        return fake_agent.result
+
+    fake_agent.result = DOCUMENTED
+    monkeypatch.setattr(code_documentation_tool, "USE_DOC_RESULT_CACHE", True)
+    monkeypatch.setattr(code_documentation_tool, "result_cache", DocumentationResultCache(str(tmp_path)))
+    monkeypatch.setattr(code_documentation_tool, "code_documenter_agent_with_chunking", fake_agent)
+    return code_documentation_tool, fake_agent, calls
+
+
+def test_agent_results_are_served_from_cache(documentation_tool):
+    tool, _, calls = documentation_tool
+    assert tool.code_documenter_agent("int add() {}", language="java") == DOCUMENTED
+    assert tool.code_documenter_agent("int add() {}  \n", language="java") == DOCUMENTED
+    assert calls == [True]
+
+
+def test_include_analysis_reaches_the_agent_and_the_key(documentation_tool):
+    tool, _, calls = documentation_tool
+    tool.code_documenter_agent("int add() {}", include_analysis=True)
+    tool.code_documenter_agent("int add() {}", include_analysis=False)
+    tool.code_documenter_agent("int add() {}", include_analysis=False)
+    assert calls == [True, False]
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("CHUNK_INSTRUCTION", "Document this part differently.\n{chunk}"),
+    ("CHUNK_ANALYSIS_MODE", "reduce"),
+    ("CHUNK_SHARED_THREAD", True),
+    ("CHUNK_SKELETON_MAX_TOKENS", 17),
+    ("LARGE_FILE_STRATEGY", "hierarchical"),
+])
+def test_pipeline_settings_are_part_of_the_key(documentation_tool, monkeypatch, setting, value):
+    from utils import code_documentation_helper as helper
+
+    tool, _, calls = documentation_tool
+    tool.code_documenter_agent("int add() {}", language="java")
+    monkeypatch.setattr(helper, setting, value)
+    tool.code_documenter_agent("int add() {}", language="java")
+    assert len(calls) == 2
+
+
+def test_partial_chunked_results_are_not_cached(documentation_tool):
+    tool, agent, calls = documentation_tool
+    agent.result = DOCUMENTED + "\n\n// Exception in chunk 2: connection reset"
+    tool.code_documenter_agent("int add() {}")
+    tool.code_documenter_agent("int add() {}")
+    assert len(calls) == 2
+
+
+def test_failed_chunks_mark_the_stitched_result_uncacheable(monkeypatch):
+    import code_documentation_tool
+    from utils import code_documentation_helper as helper
+
+    def chunk_agent(prompt):
+        if "int f2()" in prompt:
+            return "Error: agent timeout"
+        code = prompt.split("## Code to Analyze:\n")[-1].split("\n\nNote:")[0]
+        return f"### PART 1: COMPREHENSIVE ANALYSIS\nFine.\n\n### PART 2: DOCUMENTED CODE\n/** Doc */\n{code}"
+
+    # Twelve chunks; the whole prompt is over the message limit, every chunk prompt is not
+    monkeypatch.setattr(helper, "split_code_intelligently",
+                        lambda *args, **kwargs: [f"int f{i}() {{}}" for i in range(1, 13)])
+    monkeypatch.setattr(helper, "AGENT_MESSAGE_MAX_CHARS", 20000)
+    monkeypatch.setattr(code_documentation_tool, "run_documenter_prompt", chunk_agent)
+    prompt = "Document this.\n## Code to Analyze:\n" + "int x;\n" * 4000
+    result = helper.code_documenter_agent_with_chunking(prompt, max_concurrency=1, shared_thread=False,
+                                                        analysis_mode="first")
+
+    assert "int f1()" in result and "int f3()" in result and "int f2()" not in result
+    assert "1 of 12 chunks failed (2)" in result
+    assert not is_cacheable_result(result)
+
+
+def test_pipeline_prompts_carry_the_analysis_instruction_at_most_once(monkeypatch):
+    import code_documentation_tool
+    from utils import code_documentation_helper as helper
+
+    instruction = helper.ANALYSIS_INSTRUCTION.split("## Code to Analyze:")[0]
+    sent = []
+
+    def raw_agent(prompt):
+        sent.append(prompt)
+        code = prompt.split("## Code to Analyze:\n")[-1].split("\n\nNote:")[0]
+        return f"### PART 1: COMPREHENSIVE ANALYSIS\nFine.\n\n### PART 2: DOCUMENTED CODE\n{code}"
+
+    monkeypatch.setattr(code_documentation_tool, "USE_DOC_RESULT_CACHE", False)
+    monkeypatch.setattr(code_documentation_tool, "run_documenter_prompt", raw_agent)
+    monkeypatch.setattr(helper, "CHUNK_ANALYSIS_MODE", "first")
+    monkeypatch.setattr(helper, "CHUNK_SHARED_THREAD", False)
+
+    # A prompt that fits is sent once, with the instruction added once
+    code_documentation_tool.code_documenter_agent("int add() {}")
+    assert len(sent) == 1 and sent[0].count(instruction) == 1
+
+    # Chunk prompts: the full instruction on the first chunk only
+    sent.clear()
+    monkeypatch.setattr(helper, "split_code_intelligently", lambda *args, **kwargs: ["int f1() {}", "int f2() {}"])
+    monkeypatch.setattr(helper, "AGENT_MESSAGE_MAX_CHARS", 20000)
+    code_documentation_tool.code_documenter_agent("int x;\n" * 4000)
+    assert [prompt.count(instruction) for prompt in sent] == [1, 0]
+
@@ -0,0 +1,175 @@
+"""Tests for request coalescing of identical in-flight calls (utils/single_flight.py)."""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_prefers_the_blob_sha():
+    assert flight_key("doc", "bench/samples", "App.java", blob_sha="abc") == "doc|bench/samples|App.java|blob:abc"
+    assert flight_key("doc", None, "", content="x") == flight_key("doc", "", None, content="x")
+    assert flight_key("doc", "a", content="x") != flight_key("doc", "a", content="y")
+    assert flight_key("doc", "a", content="x") != flight_key("doc", "b", content="x")
+
+
+def test_concurrent_threads_share_one_run():
+    flights = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flights.do, "key", work)
+        assert started.wait(5)
+        followers = [executor.submit(flights.do, "key", work) for _ in range(3)]
+        while flights.stats()["coalesced"] < 3:
+            time.sleep(0.005)
+        assert flights.stats()["in_flight"] == 1
+        release.set()
+        assert [future.result(5) for future in [leader, *followers]] == ["result"] * 4
+
+    assert len(runs) == 1
+    assert flights.stats() == {"in_flight": 0, "executions": 1, "coalesced": 3}
+
+
+def test_nothing_is_kept_after_the_call():
+    flights = SingleFlight("test")
+    assert flights.do("key", lambda: 1) == 1
+    assert flights.do("key", lambda: 2) == 2
+    assert flights.stats()["executions"] == 2
+
+
+def test_followers_receive_the_leaders_exception():
+    flights = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("agent failed")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, "key", fail)
+        assert started.wait(5)
+        follower = executor.submit(flights.do, "key", lambda: "not run")
+        while flights.stats()["coalesced"] < 1:
+            time.sleep(0.005)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="agent failed"):
+                future.result(5)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_coroutines_share_one_run():
+    flights = SingleFlight("test")
+    runs = []
+
+    async def work(value):
+        runs.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def scenario():
+        same = await asyncio.gather(*(flights.do_async("key", work, 21) for _ in range(3)))
+        other = await flights.do_async("other", work, 5)
+        return same, other
+
+    assert asyncio.run(scenario()) == ([42, 42, 42], 10)
+    assert runs == [21, 5]
+
+
+def test_cancelled_follower_leaves_the_run_alone():
+    flights = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do_async("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do_async("key", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader, follower.cancelled()
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+@pytest.fixture
+def server_module(monkeypatch):
+    """mcp_server/server.py, imported the way it runs (as a script from mcp_server/)."""
+    pytest.importorskip("mcp.server.fastmcp")
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp_server"))
+    import server
+
+    return server
+
+
+@pytest.fixture
+def server(server_module, monkeypatch):
+    """mcp_server/server.py with the agent run replaced by a counting fake."""
+    server = server_module
+    runs = []
+
+    async def run_agent(agent_id, label, prompt, timeout, poll_interval, max_poll_interval):
+        runs.append(timeout)
+        await asyncio.sleep(0.05)
+        return f"answer within {timeout}s"
+
+    monkeypatch.setattr(server, "PROJECT_ENDPOINT_STRING", "https://example.invalid")
+    monkeypatch.setattr(server, "USE_REQUEST_COALESCING", True)
+    monkeypatch.setattr(server, "_agent_flights", SingleFlight("invoke_agent"))
+    monkeypatch.setattr(server, "_run_agent", run_agent)
+    monkeypatch.setenv("TEST_AGENT_ID", "agent-1")
+    return server, runs
+
+
+def test_agent_calls_share_a_run_only_with_the_same_timeout(server):
+    module, runs = server
+
+    async def scenario():
+        return await asyncio.gather(
+            module._invoke_agent("TEST_AGENT_ID", "prompt", timeout=30),
+            module._invoke_agent("TEST_AGENT_ID", "prompt", timeout=30),
+            module._invoke_agent("TEST_AGENT_ID", "prompt", timeout=600),
+        )
+
+    assert asyncio.run(scenario()) == ["answer within 30s", "answer within 30s", "answer within 600s"]
+    assert sorted(runs) == [30, 600]
+
+
+def test_runs_go_through_the_shared_runner_with_per_loop_slots(server_module, monkeypatch):
+    calls = []
+
+    class FakeManager:
+        async def run_agent_async(self, prompt, agent_id=None, **settings):
+            calls.append((agent_id, settings))
+            return "ERROR: Agent run timed out after 5s" if prompt == "slow" else "answer"
+
+    monkeypatch.setattr(server_module, "get_project_manager", lambda: FakeManager())
+
+    async def scenario(prompt):
+        response = await server_module._run_agent("agent-1", "Test Agent", prompt, 5, 0.1, 2)
+        return response, server_module._get_run_slots()
+
+    answer, first_slots = asyncio.run(scenario("fast"))
+    timeout, second_slots = asyncio.run(scenario("slow"))
+    assert answer == "answer"
+    assert timeout == "❌ Test Agent: Agent run timed out after 5s"
+    assert calls[0] == ("agent-1", {"timeout": 5, "poll_interval": 0.1, "max_poll_interval": 2})
+    # Each event loop gets its own semaphore
+    assert first_slots is not second_slots
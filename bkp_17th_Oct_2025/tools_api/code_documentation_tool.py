@@ -23,22 +23,37 @@ from azure.ai.projects import AIProjectClient
 
 # Support both package and script execution contexts for internal imports
 try:
-    from .utils.azure_client import AzureCredentialManager
+    from .utils.azure_client import AzureCredentialManager, get_project_manager
     from .utils.file_searcher import FileSearcher
     from .utils.response_parser import parse_analysis_and_code
+    from .utils.result_cache import USE_DOC_RESULT_CACHE, result_cache, is_cacheable_result
+    from .utils.code_structure import detect_language
+    from .utils.metrics import current_span, traced
+    from .utils.single_flight import USE_REQUEST_COALESCING, SingleFlight, flight_key
+    from .utils.incremental_docs import (
+        USE_INCREMENTAL_DOCS,
+        record_store,
+        record_target,
+        redocument_incrementally,
+        save_documentation_record,
+    )
     from .utils.code_documentation_helper import (
         LargeFileStrategy,
         LARGE_FILE_THRESHOLD,
         LARGE_FILE_STRATEGY,
+        FALLBACK_ANALYSIS_PREFIX,
         ANALYSIS_INSTRUCTION,
         TYPESCRIPT_ANALYSIS_INSTRUCTION,
         CHUNK_INSTRUCTION,
         validate_environment,
         discover_dependencies,
+        collect_dependency_closure,
         find_repository_files_by_pattern,
         find_target_files,
         generate_multi_file_documentation,
         code_documenter_agent_with_chunking,
+        code_documenter_agent_hierarchical,
+        documentation_settings,
         process_large_file,
         split_code_intelligently,
         create_code_summary,
@@ -49,22 +64,37 @@ try:
         save_analysis_part,
     )
 except ImportError:
-    from utils.azure_client import AzureCredentialManager  # type: ignore
+    from utils.azure_client import AzureCredentialManager, get_project_manager  # type: ignore
     from utils.file_searcher import FileSearcher  # type: ignore
     from utils.response_parser import parse_analysis_and_code  # type: ignore
+    from utils.result_cache import USE_DOC_RESULT_CACHE, result_cache, is_cacheable_result  # type: ignore
+    from utils.code_structure import detect_language  # type: ignore
+    from utils.metrics import current_span, traced  # type: ignore
+    from utils.single_flight import USE_REQUEST_COALESCING, SingleFlight, flight_key  # type: ignore
+    from utils.incremental_docs import (  # type: ignore
+        USE_INCREMENTAL_DOCS,
+        record_store,
+        record_target,
+        redocument_incrementally,
+        save_documentation_record,
+    )
     from utils.code_documentation_helper import (  # type: ignore
         LargeFileStrategy,
         LARGE_FILE_THRESHOLD,
         LARGE_FILE_STRATEGY,
+        FALLBACK_ANALYSIS_PREFIX,
         ANALYSIS_INSTRUCTION,
         TYPESCRIPT_ANALYSIS_INSTRUCTION,
         CHUNK_INSTRUCTION,
         validate_environment,
         discover_dependencies,
+        collect_dependency_closure,
         find_repository_files_by_pattern,
         find_target_files,
         generate_multi_file_documentation,
         code_documenter_agent_with_chunking,
+        code_documenter_agent_hierarchical,
+        documentation_settings,
         process_large_file,
         split_code_intelligently,
         create_code_summary,
@@ -79,12 +109,14 @@ try:
     from .github_tools import (
         fetch_github_file_content,
         commit_to_github,
+        commit_files_to_github,
         extract_github_info_from_url,
     )
 except ImportError:
     from github_tools import (  # type: ignore
         fetch_github_file_content,
         commit_to_github,
+        commit_files_to_github,
         extract_github_info_from_url,
     )
 
@@ -157,7 +189,8 @@ logger = logging.getLogger(__name__)
 # Validate environment on import
 env_valid = validate_environment()
 
-def code_documenter_agent(prompt: str, include_analysis: bool = True) -> str:
+@traced("agent_call", failed=lambda result: result.startswith("Error"))
+def code_documenter_agent(prompt: str, include_analysis: bool = True, language: Optional[str] = None) -> str:
     """
     
     Forward a user's code snippet or request to the Code Documenter Agent for ENTERPRISE-LEVEL DOCUMENTATION.
@@ -226,6 +259,8 @@ def code_documenter_agent(prompt: str, include_analysis: bool = True) -> str:
                       - "Generate documentation for this Java class ..."
                       - "Add inline comments and Markdown docs for this code ..."
         include_analysis (bool): Whether to include comprehensive analysis sections (default: True)
+        language (str, optional): Source language; part of the result cache key when known.
+            Unchanged sources are served from utils/result_cache.py without an agent round-trip.
 
     Returns:
         str: The final response from the Code Documenter Agent, including both the 
@@ -237,16 +272,71 @@ def code_documenter_agent(prompt: str, include_analysis: bool = True) -> str:
     try:
         logger.info("Starting code documentation process (local-only)...")
         logger.info(f"Prompt length: {len(prompt)} characters")
+        current_span().add("chars_in", len(prompt))
+
+        cache_key = None
+        if USE_DOC_RESULT_CACHE:
+            cache_key = result_cache.make_key(prompt, ANALYSIS_INSTRUCTION, language or "", include_analysis,
+                                              documentation_settings())
+            cached_result = result_cache.get(cache_key)
+            if cached_result is not None:
+                logger.info(f"Result cache hit ({len(cached_result)} characters) - skipping agent call")
+                current_span().add("cache_hits")
+                return cached_result
+
         # Add analysis instruction
         prompt = ANALYSIS_INSTRUCTION + "\n" + prompt
-        result = code_documenter_agent_with_chunking(prompt, include_analysis=True)
+        result = code_documenter_agent_with_chunking(prompt, include_analysis=include_analysis, language=language)
         logger.info(f"Documentation generated successfully ({len(result)} characters)")
+
+        if cache_key and is_cacheable_result(result):
+            result_cache.set(cache_key, result)
         return result
     except Exception as e:
         error_msg = f"Error calling Code Documenter Agent (local-only): {str(e)}"
         logger.error(error_msg)
         return error_msg
 
+
+def code_documenter_agent_thread(prompts: List[str], on_response=None) -> List[str]:
+    """
+    Run several prompts as consecutive turns of one Code Documenter Agent thread.
+    
+    Used by the shared-thread chunking mode (CHUNK_SHARED_THREAD): the first prompt
+    carries the instructions, the following ones only their chunk.
+    
+    Args:
+        prompts: Prompts in the order they are sent
+        on_response: Optional callable receiving (index, response) after every turn
+    
+    Returns:
+        One response or error message per prompt
+    """
+    logger.info(f"Starting code documentation thread with {len(prompts)} turns")
+    return get_project_manager().run_agent_thread(
+        prompts,
+        agent_id=os.getenv("CODE_DOCUMENTER_AGENT_ID", ""),
+        on_response=on_response
+    )
+
+
+def run_documenter_prompt(prompt: str) -> str:
+    """
+    Send a prompt to the Code Documenter Agent exactly as given.
+    
+    Used for the prompts the pipeline builds itself (chunk, notes, merge, summary
+    and region prompts). Unlike code_documenter_agent() no ANALYSIS_INSTRUCTION is
+    prepended and nothing is chunked or cached: these prompts carry their own
+    instructions and were sized against PROMPT_TOKEN_BUDGET as they are.
+    
+    Args:
+        prompt: Complete prompt
+    
+    Returns:
+        The agent's response or an error message ("ERROR: ..." / "WARNING: ...")
+    """
+    return get_project_manager().run_agent(prompt, agent_id=os.getenv("CODE_DOCUMENTER_AGENT_ID", ""))
+
 # Utility functions moved to code_documentation_helper.py:
 # - save_documented_code
 # - save_analysis_part  
@@ -368,16 +458,28 @@ def chunked_documentation(prompt: str, chunk_size: int = 5000) -> str:
         logger.error(f"❌ Chunked documentation failed: {str(e)}")
         return f"❌ Chunked documentation failed: {str(e)}"
 
-def generate_documentation(prompt: str, original_path: Optional[str] = None, repo_info: Optional[Dict] = None, max_retries: int = 2) -> str:
+# Identical generate_documentation calls in flight at the same time share one run
+documentation_flights = SingleFlight("generate_documentation")
+
+
+def generate_documentation(prompt: str, original_path: Optional[str] = None, repo_info: Optional[Dict] = None, max_retries: int = 2,
+                           incremental: Optional[bool] = None) -> str:
     """
     Generate documentation with explicit GitHub vs Local handling.
     Ensures analysis is always present or fails.
     
+    Concurrent calls for the same (repository, path, content, operation) are coalesced:
+    one agent run and one save/commit, and every caller gets its result
+    (USE_REQUEST_COALESCING).
+    
     Args:
         prompt: The code or request to document
         original_path: Path for local saving (only used if repo_info is None)
         repo_info: GitHub repository info (if present, ONLY GitHub push, NO local save)
         max_retries: Maximum number of retries if analysis is missing (default: 2)
+        incremental: Re-document only the units changed since the last run of the same
+            file (default: USE_INCREMENTAL_DOCS); falls back to a full run when no
+            usable record exists
     
     Returns:
         Generated documentation result
@@ -385,6 +487,22 @@ def generate_documentation(prompt: str, original_path: Optional[str] = None, rep
     Raises:
         RuntimeError: If analysis cannot be generated after max_retries
     """
+    if not USE_REQUEST_COALESCING or not prompt:
+        return _generate_documentation(prompt, original_path, repo_info, max_retries, incremental)
+    info = repo_info or {}
+    key = flight_key(
+        f"generate_documentation:{info.get('operation_type', 'document')}",
+        "/".join(str(info.get(k, "")) for k in ("owner", "repo", "branch")),
+        str(original_path or info.get("path") or info.get("filename") or ""),
+        f"retries={max_retries},incremental={incremental}",
+        content=prompt
+    )
+    return documentation_flights.do(key, _generate_documentation, prompt, original_path, repo_info, max_retries, incremental)
+
+
+def _generate_documentation(prompt: str, original_path: Optional[str], repo_info: Optional[Dict], max_retries: int,
+                            incremental: Optional[bool]) -> str:
+    """Single run of generate_documentation (see there)."""
     logger.info("=== STARTING GENERATE_DOCUMENTATION ===")
     logger.info(f"Prompt length: {len(prompt)} characters")
     logger.info(f"Original path: {original_path}")
@@ -547,11 +665,33 @@ CRITICAL ENFORCEMENT:
     analysis = ""
     documented_code = ""
     result = ""
+    # Set when the output is padded with synthetic analysis or source fallbacks
+    fallback_output = False
+    # Share of the source changed since the recorded analysis was produced (0 after a full run)
+    analysis_changed_ratio = 0.0
+
+    # Incremental mode: only the units changed since the last recorded run go to the agent
+    source_code = github_code or original_prompt
+    doc_target = record_target(original_path, repo_info)
+    source_path = original_path or (repo_info or {}).get("path") or (repo_info or {}).get("filename")
+    doc_language = detect_language(str(source_path), code=source_code) if source_path else None
+    use_incremental = USE_INCREMENTAL_DOCS if incremental is None else incremental
+    if use_incremental and doc_target:
+        previous_record = record_store.get(doc_target)
+        if previous_record:
+            logger.info(f"Found documentation record for {doc_target} - trying incremental update")
+            incremental_result = redocument_incrementally(previous_record, source_code, doc_language)
+            if incremental_result:
+                result, analysis_changed_ratio = incremental_result
+                analysis, documented_code = parse_analysis_and_code(result)
+                analysis = analysis or previous_record.analysis
+                documented_code = documented_code or ""
+                retry_count = max_retries + 1  # skip the full generation loop
 
     while retry_count <= max_retries:
         try:
             logger.info(f"[LOCAL] Generating documentation (attempt {retry_count + 1}/{max_retries + 1})")
-            result = code_documenter_agent_with_chunking(prompt, include_analysis=True) or ""
+            result = code_documenter_agent_with_chunking(prompt, include_analysis=True, language=doc_language) or ""
             if not result:
                 raise ValueError("Empty result from code documenter agent")
             analysis, documented_code = parse_analysis_and_code(result)
@@ -617,6 +757,7 @@ CRITICAL ENFORCEMENT:
                 if not analysis or analysis_len < len(synthetic) * 0.5:
                     analysis = synthetic
                     analysis_len = len(analysis)
+                    fallback_output = True
                     logger.info(f"Injected synthetic analysis ({analysis_len} chars)")
             if analysis_len == 0 and retry_count < max_retries:
                 logger.warning(
@@ -631,6 +772,7 @@ CRITICAL ENFORCEMENT:
                 )
                 analysis = synthesize_minimal_analysis()
                 analysis_len = len(analysis)
+                fallback_output = True
             if code_len < min_code:
                 logger.warning(
                     f"Documented code below adaptive threshold (got {code_len}, need {min_code}). Accepting but flagged."
@@ -638,6 +780,7 @@ CRITICAL ENFORCEMENT:
                 if documented_code.strip() != original_prompt.strip() and len(original_prompt.strip()) > code_len:
                     documented_code = documented_code + "\n\n/* Original Source Fallback */\n" + original_prompt
                     code_len = len(documented_code)
+                    fallback_output = True
                     logger.info(
                         f"Augmented documented code with original prompt (now {code_len} chars)"
                     )
@@ -656,6 +799,12 @@ CRITICAL ENFORCEMENT:
                 prompt = f"""CRITICAL: Previous attempts failed due to missing analysis.\n\nYOU MUST INCLUDE BOTH:\n- A COMPREHENSIVE ANALYSIS section (minimum 500 characters)\n- A DOCUMENTED CODE section\n\nUSE THIS EXACT FORMAT:\n### PART 1: COMPREHENSIVE ANALYSIS\n[Your detailed analysis goes here]\n\n### PART 2: DOCUMENTED CODE\n[Your documented code goes here]\n\n{original_prompt}"""
             time.sleep(2)
 
+    # Only real agent output is recorded; fallbacks and partial chunked results would be reused
+    if (use_incremental and documented_code and analysis and not fallback_output and
+            not analysis.startswith(FALLBACK_ANALYSIS_PREFIX) and is_cacheable_result(result)):
+        save_documentation_record(doc_target, source_code, documented_code, analysis, doc_language,
+                                  analysis_changed_ratio)
+
     if is_github_mode and repo_info:
         logger.info("Executing GitHub-only mode - NO local files will be created")
         operation_type = repo_info.get("operation_type", "document")
@@ -675,24 +824,18 @@ CRITICAL ENFORCEMENT:
         logger.info(f"Generated filenames - Documented: {documented_filename}, Analysis: {analysis_filename}")
         commit_message_base = repo_info.get("commit_message", f"Add {operation_type} files for {original_filename}")
         try:
-            commit_result_1 = commit_to_github(
-                repo_info.get("owner", ""), 
-                repo_info.get("repo", ""), 
-                documented_filename, 
-                documented_code or "", 
-                f"{commit_message_base} - documented version",
-                repo_info.get("branch", "main")
-            )
-            logger.info(f"✅ Successfully pushed documented file to GitHub: {documented_filename}")
-            commit_result_2 = commit_to_github(
+            # Documented and analysis files land in one commit
+            commit_result = commit_files_to_github(
                 repo_info.get("owner", ""), 
                 repo_info.get("repo", ""), 
-                analysis_filename, 
-                analysis or "", 
-                f"{commit_message_base} - analysis",
+                [
+                    {"path": documented_filename, "content": documented_code or ""},
+                    {"path": analysis_filename, "content": analysis or ""}
+                ],
+                f"{commit_message_base} - documented version and analysis",
                 repo_info.get("branch", "main")
             )
-            logger.info(f"✅ Successfully pushed analysis file to GitHub: {analysis_filename}")
+            logger.info(f"✅ Successfully pushed documented and analysis files to GitHub in {commit_result['commit']['sha']}")
             logger.info(f"GitHub operation completed successfully:")
             logger.info(f"  - Repository: {repo_info.get('owner')}/{repo_info.get('repo')}")
             logger.info(f"  - Branch: {repo_info.get('branch', 'main')}")
@@ -755,7 +898,9 @@ CRITICAL ENFORCEMENT:
         repository_url: str,
         target_file: str = "Main.java",
         include_dependencies: bool = True,
-        branch: str = "main"
+        branch: str = "main",
+        depth: int = 1,
+        max_files: Optional[int] = None
     ) -> str:
         """
         Analyze and document a file and its dependencies from a GitHub repository.
@@ -765,6 +910,8 @@ CRITICAL ENFORCEMENT:
             target_file: The main file to analyze (e.g., "Main.java") 
             include_dependencies: Whether to find and analyze dependent files
             branch: Branch to analyze (default: "main")
+            depth: How many levels of imports to follow (default: 1 = direct imports only)
+            max_files: Maximum number of files to collect (default: DEPENDENCY_MAX_FILES)
         
         Returns:
             Comprehensive documentation of the target file and its dependencies
@@ -804,24 +951,13 @@ CRITICAL ENFORCEMENT:
             
             # Find dependencies if requested
             if include_dependencies:
-                logger.info("Discovering dependencies...")
-                # Detect language from file extension
-                file_extension = main_file_path.split('.')[-1].lower()
-                language_map = {
-                    'java': 'java',
-                    'py': 'python', 
-                    'ts': 'typescript',
-                    'js': 'javascript'
-                }
-                language = language_map.get(file_extension, 'java')  # default to java
-                
-                dependencies = discover_dependencies(main_content, owner, repo, branch, language)
-                
-                for dep_path in dependencies:
-                    dep_content = fetch_github_file_content(owner, repo, dep_path, branch)
-                    if not dep_content.startswith("Error"):
-                        files_to_document.append({"path": dep_path, "content": dep_content})
-                        logger.info(f"Added dependency: {dep_path}")
+                logger.info(f"Discovering dependencies (depth {depth})...")
+                # Breadth-first over the import graph; each level is fetched concurrently
+                files_to_document = collect_dependency_closure(
+                    owner, repo, branch, main_file_path, main_content,
+                    depth=max(1, depth),
+                    max_files=max_files
+                )
             
             logger.info(f"Total files to document: {len(files_to_document)}")
             
@@ -1262,7 +1398,7 @@ if __name__ == "__main__":
             continue
             
         print(f"\n--- Documenting: {file_path} ---\n")
-        result = code_documenter_agent(prompt=code, include_analysis=True)
+        result = code_documenter_agent(prompt=code, include_analysis=True, language=detect_language(file_path, code=code))
         # Parse and print analysis and documented code separately
         try:            
             analysis, documented_code = parse_analysis_and_code(result)
@@ -27,14 +27,19 @@ import json
 import time
 from enum import Enum
 from datetime import datetime
-from typing import Dict, Tuple, Optional
+from typing import Any, Callable, Dict, List, Tuple, Optional
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import re
 
 from .utils.response_parser import parse_analysis_and_code
+from .utils.code_structure import detect_language
 from .github_tools import (
     fetch_github_file_content,
     commit_to_github,
+    commit_files_to_github,
+    commit_tree_to_github,
+    create_blob,
     get_github_token,
     list_repository_contents,
     GitHubError,
@@ -46,13 +51,18 @@ from .code_documentation_tool import (
     generate_documentation,
     TypeScriptAnalysisHelper
 )
-from .code_review_tool import code_reviewer_agent
 from .utils.filename_generator import DEFAULT_DOCUMENTED_SUFFIX
+from .utils.metrics import span
 
 logger = logging.getLogger(__name__)
 
 TOOL_VERSION = "2025-09-11-**-exclusive-mode"  # Updated version
 
+# Worker pool sizes for the document_directory pipeline (fetch -> document -> commit)
+DIRECTORY_FETCH_CONCURRENCY = int(os.getenv("DIRECTORY_FETCH_CONCURRENCY", "8"))
+DIRECTORY_DOCUMENT_CONCURRENCY = int(os.getenv("DIRECTORY_DOCUMENT_CONCURRENCY", "4"))
+DIRECTORY_COMMIT_CONCURRENCY = int(os.getenv("DIRECTORY_COMMIT_CONCURRENCY", "4"))
+
 # --- Operation Enum ---
 class Operation(str, Enum):
     AUTO = "auto"
@@ -203,7 +213,8 @@ def map_exception(err_msg: str, file_path: str = "") -> str:
         return f"Error: {err_msg}"
 
 
-def analyze_directory_structure(owner: str, repo: str, directory_path: str, branch: str = "main") -> str:
+def analyze_directory_structure(owner: str, repo: str, directory_path: str, branch: str = "main",
+                                file_contents: Optional[Dict[str, str]] = None) -> str:
     """
     Analyze all files in a directory and create a comprehensive analysis showing relationships.
     
@@ -212,29 +223,34 @@ def analyze_directory_structure(owner: str, repo: str, directory_path: str, bran
         repo: Repository name
         directory_path: Path to the directory in the repository
         branch: Branch name (default: "main")
+        file_contents: Already fetched {path: content} of the directory files; when
+                       given, the directory is not listed or fetched again
     
     Returns:
         Comprehensive analysis of all files and their relationships
     """
     try:
-        # Get directory contents
-        contents = list_repository_contents(owner, repo, directory_path, branch)
-        files = [item for item in contents if item.get("type") == "file"]
+        if file_contents is not None:
+            files = [{"path": file_path} for file_path in file_contents]
+        else:
+            # Get directory contents
+            contents = list_repository_contents(owner, repo, directory_path, branch)
+            files = [item for item in contents if item.get("type") == "file"]
+            
+            # Fetch content for all files
+            file_contents = {}
+            for file_info in files:
+                file_path = str(file_info.get("path", ""))
+                if file_path:
+                    try:
+                        content = fetch_github_file_content(owner, repo, file_path, branch)
+                        file_contents[file_path] = content
+                    except Exception as e:
+                        logger.warning(f"Could not fetch {file_path}: {str(e)}")
         
         if not files:
             return f"No files found in directory '{directory_path}'"
         
-        # Fetch content for all files
-        file_contents = {}
-        for file_info in files:
-            file_path = str(file_info.get("path", ""))
-            if file_path:
-                try:
-                    content = fetch_github_file_content(owner, repo, file_path, branch)
-                    file_contents[file_path] = content
-                except Exception as e:
-                    logger.warning(f"Could not fetch {file_path}: {str(e)}")
-        
         # Create comprehensive analysis
         analysis_sections = []
         
@@ -285,6 +301,207 @@ def analyze_directory_structure(owner: str, repo: str, directory_path: str, bran
         return f"Error analyzing directory '{directory_path}': {str(e)}"
 
 
+def refresh_documentation_date(documented_code: str) -> str:
+    """Replace the dates in the documentation header with today's date."""
+    current_date = datetime.now().strftime('%d/%m/%Y')
+    date_patterns = [
+        (r'Date:\s*\d{2}/\d{2}/\d{4}', f'Date: {current_date}'),
+        (r'//\s*Date:\s*\d{2}/\d{2}/\d{4}', f'// Date: {current_date}'),  # For Java/C++ comments
+    ]
+    for pattern, replacement in date_patterns:
+        documented_code = re.sub(pattern, replacement, documented_code, flags=re.IGNORECASE)
+    return documented_code
+
+
+def select_directory_files(contents: List[Dict], file_extensions: str, documented_suffix: str) -> List[str]:
+    """
+    Pick the source files of a directory listing that should be documented.
+    
+    Files produced by earlier documentation runs (documented variants and analysis
+    files) are skipped so that re-running the operation does not document them again.
+    
+    Args:
+        contents: Directory listing from list_repository_contents
+        file_extensions: Comma-separated extensions to include (e.g. ".py,.java")
+        documented_suffix: Suffix used for documented files
+    
+    Returns:
+        Sorted list of file paths
+    """
+    extensions = tuple(ext.strip().lower() for ext in file_extensions.split(",") if ext.strip())
+    selected = []
+    for item in contents:
+        file_path = str(item.get("path", ""))
+        if item.get("type") != "file" or not file_path:
+            continue
+        file_name = os.path.basename(file_path)
+        if extensions and not file_name.lower().endswith(extensions):
+            continue
+        if (documented_suffix and documented_suffix in file_name) or "_analysis_" in file_name:
+            continue
+        selected.append(file_path)
+    return sorted(selected)
+
+
+def run_document_directory_pipeline(owner: str, repo: str, directory_path: str, branch: str = "main",
+                                    file_extensions: str = ".py,.js,.ts,.java,.cpp,.c,.h",
+                                    documented_suffix: str = DEFAULT_DOCUMENTED_SUFFIX,
+                                    docs_folder: Optional[str] = None,
+                                    commit_message: str = "",
+                                    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Document every source file of a directory and commit the results in one commit.
+    
+    Files flow through three stages, each with its own bounded worker pool:
+    fetch (DIRECTORY_FETCH_CONCURRENCY), document (DIRECTORY_DOCUMENT_CONCURRENCY)
+    and commit (DIRECTORY_COMMIT_CONCURRENCY, uploads the documented and analysis
+    files as blobs). A file moves to the next stage as soon as it leaves the previous
+    one, so fetching, agent runs and uploads overlap. Once all files are done the
+    uploaded blobs are committed as a single commit. A failing file is reported and
+    skipped; it does not stop the other files.
+    
+    Args:
+        owner: GitHub username or organization name
+        repo: Repository name
+        directory_path: Path to the directory in the repository
+        branch: Branch name (default: "main")
+        file_extensions: Comma-separated extensions to document
+        documented_suffix: Suffix for documented files
+        docs_folder: Optional folder for the generated files
+        commit_message: Commit message (a default message is used when empty)
+        progress_callback: Called with a progress event dict after every stage of every file
+    
+    Returns:
+        Summary dict with per-file results, commit SHA, package analysis and timings
+    """
+    start_time = time.time()
+    with span("discovery", path=directory_path) as discovery_span:
+        contents = list_repository_contents(owner, repo, directory_path, branch)
+        paths = select_directory_files(contents, file_extensions, documented_suffix)
+        discovery_span.add("files", len(paths))
+    results = {file_path: {"file": file_path, "status": "pending"} for file_path in paths}
+    progress = {"completed": 0}
+    
+    def report(file_path: str, stage: str, **details):
+        event = {
+            "event": "document_directory_progress",
+            "file": file_path,
+            "stage": stage,
+            "completed": progress["completed"],
+            "total": len(paths),
+            **details
+        }
+        logger.info(json.dumps(event))
+        if progress_callback:
+            try:
+                progress_callback(event)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {str(e)}")
+    
+    def document(file_path: str, content: str) -> Tuple[str, str]:
+        result = code_documenter_agent(content, include_analysis=True,
+                                       language=detect_language(file_path, code=content))
+        if not result or result.lstrip().startswith(("Error", "⚠️", "❌")):
+            raise RuntimeError((result or "Empty response from documentation agent").strip()[:200])
+        analysis, documented_code = parse_analysis_and_code(result)
+        if not documented_code or len(documented_code.strip()) < 10:
+            raise RuntimeError("Failed to extract valid documented code")
+        return analysis or "", refresh_documentation_date(documented_code)
+    
+    def upload(file_path: str, analysis: str, documented_code: str) -> List[Dict[str, str]]:
+        documented_filename, analysis_filename = build_documentation_paths(file_path, documented_suffix, docs_folder)
+        entries = [{"path": documented_filename, "sha": create_blob(owner, repo, documented_code, clean=True)}]
+        if analysis.strip():
+            entries.append({"path": analysis_filename, "sha": create_blob(owner, repo, analysis, clean=True)})
+        return entries
+    
+    file_contents: Dict[str, str] = {}
+    entries: List[Dict[str, str]] = []
+    with ThreadPoolExecutor(max_workers=max(1, DIRECTORY_FETCH_CONCURRENCY), thread_name_prefix="dir-fetch") as fetch_pool, \
+            ThreadPoolExecutor(max_workers=max(1, DIRECTORY_DOCUMENT_CONCURRENCY), thread_name_prefix="dir-document") as document_pool, \
+            ThreadPoolExecutor(max_workers=max(1, DIRECTORY_COMMIT_CONCURRENCY), thread_name_prefix="dir-commit") as commit_pool:
+        pending = {
+            fetch_pool.submit(fetch_github_file_content, owner, repo, file_path, branch): ("fetch", file_path)
+            for file_path in paths
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, file_path = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    progress["completed"] += 1
+                    results[file_path].update(status="failed", stage=stage, error=str(e))
+                    report(file_path, "failed", failed_stage=stage, error=str(e)[:200])
+                    continue
+                
+                if stage == "fetch":
+                    file_contents[file_path] = value
+                    report(file_path, "fetched", chars=len(value))
+                    pending[document_pool.submit(document, file_path, value)] = ("document", file_path)
+                elif stage == "document":
+                    report(file_path, "documented")
+                    pending[commit_pool.submit(upload, file_path, *value)] = ("commit", file_path)
+                else:
+                    progress["completed"] += 1
+                    entries.extend(value)
+                    results[file_path].update(status="documented", outputs=[entry["path"] for entry in value])
+                    report(file_path, "uploaded")
+    
+    documented_count = sum(1 for item in results.values() if item["status"] == "documented")
+    commit_info = None
+    if entries:
+        message = commit_message or f"Add documentation for {documented_count} files in {directory_path}"
+        commit_result = commit_tree_to_github(owner, repo, entries, message, branch)
+        commit_info = commit_result["commit"]
+    
+    # The package analysis reuses the fetched contents instead of fetching the directory again
+    package_analysis = analyze_directory_structure(owner, repo, directory_path, branch, file_contents=file_contents) if file_contents else ""
+    
+    summary = {
+        "event": "document_directory_complete",
+        "directory": directory_path,
+        "total": len(paths),
+        "documented": documented_count,
+        "failed": len(paths) - documented_count,
+        "commit": commit_info,
+        "elapsed_seconds": round(time.time() - start_time, 2),
+        "files": [results[file_path] for file_path in paths],
+        "package_analysis": package_analysis
+    }
+    logger.info(json.dumps({key: value for key, value in summary.items() if key not in ("files", "package_analysis")}))
+    return summary
+
+
+def format_directory_summary(repository: str, summary: Dict[str, Any], progress_log: List[Dict[str, Any]]) -> str:
+    """Render the result of run_document_directory_pipeline as a markdown report."""
+    lines = [
+        "# Directory Documentation Summary",
+        f"**Repository:** {repository}",
+        f"**Directory:** {summary['directory']}",
+        f"**Files:** {summary['documented']} documented, {summary['failed']} failed, {summary['total']} total",
+        f"**Commit:** {summary['commit']['sha'] if summary['commit'] else 'none (nothing to commit)'}",
+        f"**Elapsed:** {summary['elapsed_seconds']}s",
+        "",
+        "## Files"
+    ]
+    for item in summary["files"]:
+        if item["status"] == "documented":
+            lines.append(f"- ✅ {item['file']} -> {', '.join(item['outputs'])}")
+        else:
+            lines.append(f"- ❌ {item['file']} ({item.get('stage', 'unknown')} stage): {item.get('error', '')}")
+    
+    if progress_log:
+        lines.extend(["", "## Progress Log"])
+        for event in progress_log:
+            lines.append(f"[{event['completed']}/{event['total']}] {event['stage']}: {event['file']}")
+    
+    if summary["package_analysis"]:
+        lines.extend(["", "=" * 80, "", "# COMPREHENSIVE DIRECTORY ANALYSIS", "", summary["package_analysis"]])
+    return "\n".join(lines)
+
+
 def _analyze_file_purpose(file_name: str, content: str) -> str:
     """Analyze the purpose of a single file based on its name and content."""
     if not content:
@@ -539,7 +756,7 @@ def register_github_integration_tools(mcp):
         - review_commit: Commit the reviewed code to the repository with a suffix _reviewed (requires confirm='yes' or 'commit').
         - document: Analyze and document a file. Returns documented code and analysis.
         - document_commit: Commit the documented code to the repository with a suffix _documented (requires confirm='yes' or 'commit').
-        - document_directory: Analyze an entire directory and generate batch commands to document all files with comprehensive package analysis.
+        - document_directory: Analyze an entire directory and generate batch commands to document all files with comprehensive package analysis. With confirm='yes', documents all files server-side (concurrent fetch/document/commit pipeline) and commits them in one commit.
         - fetch_file: Fetch the raw contents of a file from the repository.
         - auto: Automatically classify intent based on request text.
         - update_file: (Not supported) Use review_commit or document_commit instead.
@@ -663,6 +880,8 @@ file_path='{file_list[0]}'
                 except Exception as e:
                     return f"Error: Could not fetch file '{file_path}' from {repository}: {str(e)}"
                 
+                # Imported on use: the review tool is optional for every other operation
+                from .code_review_tool import code_reviewer_agent
                 result = code_reviewer_agent(content)
                 return result
             
@@ -795,7 +1014,8 @@ file_path='{file_list[0]}'
                         if content:
                             logger.info("Successfully fetched file, generating documentation...")
                             # Call the agent directly since we need the formatted result
-                            result = code_documenter_agent(content, include_analysis=True)
+                            result = code_documenter_agent(content, include_analysis=True,
+                                                           language=detect_language(file_path, code=content))
                             if result:
                                 # Parse the result
                                 analysis, documented_code = parse_analysis_and_code(result)
@@ -889,14 +1109,7 @@ confirm='yes'
                 
                 # Fix the date in documented code
                 if documented_code:
-                    import re
-                    current_date = datetime.now().strftime('%d/%m/%Y')
-                    date_patterns = [
-                        (r'Date:\s*\d{2}/\d{2}/\d{4}', f'Date: {current_date}'),
-                        (r'//\s*Date:\s*\d{2}/\d{2}/\d{4}', f'// Date: {current_date}'),  # For Java/C++ comments
-                    ]
-                    for pattern, replacement in date_patterns:
-                        documented_code = re.sub(pattern, replacement, documented_code, flags=re.IGNORECASE)
+                    documented_code = refresh_documentation_date(documented_code)
                 
                 # Create the documented and analysis file paths using new naming function
                 logger.info(f"Original file_path: '{file_path}'")
@@ -932,30 +1145,28 @@ confirm='yes'
                     logger.warning("To create both files, ensure you copy the FULL response including analysis section")
                     logger.info(f"Prepared for commit: {len(files_to_commit)} files (doc: {documented_filename} only)")
                 
-                # Commit all files
+                # Commit all files in a single commit (blobs -> tree -> commit -> ref)
                 try:
-                    commit_shas = []
-                    for file_info in files_to_commit:
-                        commit_result = commit_to_github(
-                            owner=owner,
-                            repo=repo,
-                            path=file_info['path'],  # Correct parameter name
-                            content=file_info['content'],
-                            message=file_info['message'],  # Correct parameter name
-                            branch=branch
-                        )
-                        if not commit_result or 'sha' not in commit_result.get('commit', {}):
-                            logger.error(f"Failed to commit {file_info['path']}")
-                            return json.dumps({
-                                "event": "document_commit_failed",
-                                "error": f"Failed to commit {file_info['path']}",
-                                "file": file_info['path']
-                            })
-                        commit_shas.append({
-                            'file': file_info['path'],
-                            'sha': commit_result['commit']['sha']
+                    batch_message = commit_message or "; ".join(file_info['message'] for file_info in files_to_commit)
+                    commit_result = commit_files_to_github(
+                        owner=owner,
+                        repo=repo,
+                        files=files_to_commit,
+                        message=batch_message,
+                        branch=branch
+                    )
+                    if not commit_result or 'sha' not in commit_result.get('commit', {}):
+                        logger.error(f"Failed to commit {len(files_to_commit)} files")
+                        return json.dumps({
+                            "event": "document_commit_failed",
+                            "error": f"Failed to commit {', '.join(f['path'] for f in files_to_commit)}",
+                            "file": documented_filename
                         })
-                        logger.info(f"Committed: {file_info['path']} - SHA: {commit_result['commit']['sha']}")
+                    commit_shas = [
+                        {'file': file_info['path'], 'sha': commit_result['commit']['sha']}
+                        for file_info in files_to_commit
+                    ]
+                    logger.info(f"Committed: {len(files_to_commit)} files - SHA: {commit_result['commit']['sha']}")
                     result = {
                         "event": "document_commit_success",
                         "Documented_file": documented_filename,
@@ -982,6 +1193,21 @@ confirm='yes'
                     return "Error: file_path (directory path) is required for document_directory operation"
                 
                 try:
+                    if confirm.lower() in ("yes", "commit"):
+                        logger.info(f"Running documentation pipeline for directory: {file_path}")
+                        progress_log = []
+                        summary = run_document_directory_pipeline(
+                            owner, repo, file_path, branch,
+                            file_extensions=file_extensions,
+                            documented_suffix=documented_suffix,
+                            docs_folder=docs_folder if docs_folder.strip() else None,
+                            commit_message=commit_message,
+                            progress_callback=progress_log.append
+                        )
+                        if not summary["total"]:
+                            return f"Error: No files matching {file_extensions} found in directory '{file_path}'"
+                        return format_directory_summary(repository, summary, progress_log)
+                    
                     # First, create comprehensive analysis of the entire directory
                     logger.info(f"Creating comprehensive analysis for directory: {file_path}")
                     comprehensive_analysis = analyze_directory_structure(owner, repo, file_path, branch)
@@ -1038,7 +1264,8 @@ confirm='yes'
                     result_sections.append("")
                     result_sections.append("# BATCH DOCUMENTATION COMMANDS")
                     result_sections.append("")
-                    result_sections.append("Execute these commands in order to document all files:")
+                    result_sections.append("Execute these commands in order to document all files,")
+                    result_sections.append("or re-run document_directory with confirm='yes' to document and commit them all server-side in one commit:")
                     result_sections.append("")
                     result_sections.extend(commands)
                     
@@ -2,9 +2,17 @@
 
 import os
 import re
+import time
+import fnmatch
+import posixpath
+import threading
 import requests
+import json
 import base64
-from typing import Dict, Any, Optional, List, Union
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Union, Callable, Iterable, Iterator, Tuple
 import logging
 
 # Configure logging
@@ -32,6 +40,14 @@ except ImportError as e:
     CACHING_AVAILABLE = False
     logger.warning(f"GitHub caching system not available: {e}, falling back to direct access")
 
+# Conditional-request (ETag) cache for file contents and directory listings
+try:
+    from .utils.github_http_cache import USE_GITHUB_ETAG_CACHE, github_etag_cache
+    from .utils.metrics import current_span, span, traced
+except ImportError:
+    from utils.github_http_cache import USE_GITHUB_ETAG_CACHE, github_etag_cache  # type: ignore
+    from utils.metrics import current_span, span, traced  # type: ignore
+
 class GitHubError(Exception):
     pass
 
@@ -44,6 +60,29 @@ class GitHubPermissionError(GitHubError):
 class GitHubNotFoundError(GitHubError):
     pass
 
+class GitHubConflictError(GitHubError):
+    pass
+
+
+# HTTP session configuration loaded from environment (.env)
+GITHUB_HTTP_POOL_SIZE = int(os.getenv("GITHUB_HTTP_POOL_SIZE", "10"))
+GITHUB_HTTP_MAX_RETRIES = int(os.getenv("GITHUB_HTTP_MAX_RETRIES", "3"))
+GITHUB_HTTP_BACKOFF_FACTOR = float(os.getenv("GITHUB_HTTP_BACKOFF_FACTOR", "0.5"))
+GITHUB_HTTP_MAX_BACKOFF = float(os.getenv("GITHUB_HTTP_MAX_BACKOFF", "60"))
+GITHUB_HTTP_TIMEOUT = (
+    float(os.getenv("GITHUB_HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("GITHUB_HTTP_READ_TIMEOUT", "30"))
+)
+
+# Transient server errors worth retrying
+_RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Number of (repo, commit SHA) path indexes kept in memory
+REPOSITORY_INDEX_CACHE_SIZE = int(os.getenv("REPOSITORY_INDEX_CACHE_SIZE", "16"))
+
 
 def get_github_token() -> str:
     """Get GitHub token with caching support."""
@@ -64,17 +103,131 @@ def get_github_headers() -> Dict[str, str]:
     }
 
 
-def github_api_request(url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-    """Make a request to GitHub API with authentication and proper error handling."""
-    default_headers = get_github_headers()
-    if headers:
-        default_headers.update(headers)
+def get_github_session() -> requests.Session:
+    """
+    Get the shared keep-alive session for GitHub API calls.
+
+    The session keeps a connection pool of GITHUB_HTTP_POOL_SIZE connections to
+    api.github.com and carries the authentication headers, so neither the TLS
+    handshake nor the headers are rebuilt for every call.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=GITHUB_HTTP_POOL_SIZE,
+                    pool_maxsize=GITHUB_HTTP_POOL_SIZE,
+                    max_retries=0  # retries are handled in github_request()
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(get_github_headers())
+                _session = session
+                logger.info(f"Created pooled GitHub session (pool size {GITHUB_HTTP_POOL_SIZE})")
+    return _session
+
+
+def reset_github_session():
+    """Close the shared session; the next request re-reads the token and opens new connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _backoff_delay(attempt: int) -> float:
+    return min(GITHUB_HTTP_BACKOFF_FACTOR * (2 ** attempt), GITHUB_HTTP_MAX_BACKOFF)
+
+
+def _retry_delay(response: requests.Response, attempt: int) -> Optional[float]:
+    """
+    Decide whether a response should be retried.
+
+    Returns:
+        Seconds to wait before the next attempt, or None if the response is final
+    """
+    if response.status_code in _RETRY_STATUS_CODES:
+        return _backoff_delay(attempt)
+
+    if response.status_code in (403, 429):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+            return delay if delay <= GITHUB_HTTP_MAX_BACKOFF else None
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            # Primary rate limit: only wait if the window resets soon
+            reset_at = response.headers.get("X-RateLimit-Reset", "")
+            delay = float(reset_at) - time.time() if reset_at.isdigit() else GITHUB_HTTP_MAX_BACKOFF + 1
+            return max(1.0, delay) if delay <= GITHUB_HTTP_MAX_BACKOFF else None
+        if "secondary rate limit" in response.text.lower():
+            # GitHub asks clients to wait at least a minute when no Retry-After is given
+            return min(60.0, GITHUB_HTTP_MAX_BACKOFF)
+
+    return None
+
+
+def github_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send a request to the GitHub API through the shared pooled session.
+
+    Transient failures (5xx, secondary rate limits, connection errors) are retried
+    up to GITHUB_HTTP_MAX_RETRIES times with exponential backoff. A 401 refreshes
+    the cached token once in case it was rotated.
+
+    Args:
+        method: HTTP method
+        url: Full API URL
+        **kwargs: Passed to requests.Session.request (timeout defaults to GITHUB_HTTP_TIMEOUT)
+
+    Returns:
+        The final response (status is not checked)
+    """
+    session = get_github_session()
+    kwargs.setdefault("timeout", GITHUB_HTTP_TIMEOUT)
+    token_refreshed = False
+    attempt = 0
+
+    while True:
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # A write that timed out after being sent may already have been applied
+            if attempt >= GITHUB_HTTP_MAX_RETRIES or (
+                    method.upper() != "GET" and isinstance(e, requests.exceptions.ReadTimeout)):
+                raise
+            delay = _backoff_delay(attempt)
+            current_span().add("retries")
+            logger.warning(f"GitHub connection error for {url}: {e} - retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{GITHUB_HTTP_MAX_RETRIES})")
+        else:
+            if response.status_code == 401 and not token_refreshed:
+                token_refreshed = True
+                session.headers.update(get_github_headers())
+                logger.info("GitHub returned 401 - refreshed token headers and retrying")
+                continue
+
+            delay = _retry_delay(response, attempt) if attempt < GITHUB_HTTP_MAX_RETRIES else None
+            if delay is None:
+                current_span().add("bytes_in", len(response.content))
+                return response
+            current_span().add("retries")
+            logger.warning(f"GitHub API {response.status_code} for {url} - retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{GITHUB_HTTP_MAX_RETRIES})")
+
+        time.sleep(delay)
+        attempt += 1
+
 
+def _github_checked_request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a GitHub API request, mapping HTTP errors to GitHubError subclasses."""
     try:
-        logger.info(f"**** Making GitHub API request to {url}")
-        response = requests.get(url, headers=default_headers)
+        logger.info(f"**** Making GitHub API {method} request to {url}")
+        response = github_request(method, url, **kwargs)
         response.raise_for_status()
-        return response.json()
+        return response
     except requests.exceptions.HTTPError as e:
         if response.status_code == 401:
             raise GitHubAuthenticationError("#### GitHub Authentication Error: Invalid or expired token.")
@@ -82,11 +235,52 @@ def github_api_request(url: str, headers: Optional[Dict[str, str]] = None) -> Di
             raise GitHubPermissionError("#### GitHub Permission Error: Access denied.")
         elif response.status_code == 404:
             raise GitHubNotFoundError("#### GitHub Not Found Error: Repository or file not found.")
+        elif response.status_code in (409, 422):
+            raise GitHubConflictError(f"#### GitHub Conflict Error {response.status_code}: {response.text[:500]}")
         else:
             raise GitHubError(f"#### GitHub API Error {response.status_code}: {e}")
     except requests.exceptions.RequestException as e:
         raise GitHubError(f"#### GitHub Connection Error: {e}")
 
+
+def github_api_request(url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Make a request to GitHub API with authentication and proper error handling."""
+    return _github_checked_request("GET", url, headers=headers).json()
+
+
+def github_cached_request(url: str, decode: Callable[[Any], Any]) -> Any:
+    """
+    GET a GitHub API URL through the ETag cache.
+
+    A cached response is revalidated with If-None-Match; on 304 the cached value
+    is returned without downloading or decoding the body.
+
+    Args:
+        url: Full API URL (including the ref query parameter)
+        decode: Turns the JSON body into the value that is returned and cached
+
+    Returns:
+        The decoded value
+    """
+    if not USE_GITHUB_ETAG_CACHE:
+        return decode(github_api_request(url))
+
+    cached = github_etag_cache.lookup(url)
+    headers = {"If-None-Match": cached["etag"]} if cached else None
+    response = _github_checked_request("GET", url, headers=headers)
+
+    if response.status_code == 304 and cached:
+        github_etag_cache.record_not_modified()
+        current_span().add("cache_hits")
+        logger.info(f"**** Not modified, served from cache: {url}")
+        return cached["value"]
+
+    value = decode(response.json())
+    etag = response.headers.get("ETag")
+    if etag:
+        github_etag_cache.store(url, etag, value)
+    return value
+
 def extract_github_info_from_url(url: str):
     """
     Extract owner, repo, file path, and branch from various GitHub URL formats.
@@ -150,8 +344,14 @@ def fetch_github_file_content(owner: str, repo: str, path: str, branch: str = "m
     """
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}?ref={branch}"
     logger.info(f"**** Fetching file content from {url}")
-    data = github_api_request(url)
+    with span("github.fetch", path=path) as fetch_span:
+        content = github_cached_request(url, lambda data: _decode_file_content(path, data))
+        fetch_span.add("chars_out", len(content))
+        return content
+
 
+def _decode_file_content(path: str, data: Any) -> str:
+    """Validate a Contents API response for a file and return its decoded text."""
     # Check if the response is a list (directory) instead of a file
     if isinstance(data, list):
         logger.error(f"#### Path '{path}' is a directory, not a file")
@@ -196,8 +396,14 @@ def list_repository_contents(owner: str, repo: str, path: str = "", branch: str
     """
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}?ref={branch}"
     logger.info(f"**** Listing repository contents from {url}")
-    data = github_api_request(url)
+    with span("github.list", path=path) as list_span:
+        entries = github_cached_request(url, _decode_directory_listing)
+        list_span.add("entries", len(entries))
+        return entries
+
 
+def _decode_directory_listing(data: Any) -> List[Dict[str, Union[str, int]]]:
+    """Validate a Contents API response for a directory and return its entries."""
     if not isinstance(data, list):
         logger.error("#### Unexpected response format: Expected a list of items.")
         raise GitHubError("Unexpected response format from GitHub API.")
@@ -232,17 +438,200 @@ def get_repository_tree(owner: str, repo: str, branch: str = "main", recursive:
         List of all files in the repository
     """
     # First get the commit SHA for the branch
-    url = f"https://api.github.com/repos/{owner}/{repo}/branches/{branch}"
-    branch_data = github_api_request(url)
-    commit_sha = branch_data["commit"]["sha"]
+    commit_sha = get_branch_commit_sha(owner, repo, branch)
     
     # Get the tree
+    tree_data = _get_tree_data(owner, repo, commit_sha, recursive)
+    return tree_data.get("tree", [])
+
+
+def get_branch_commit_sha(owner: str, repo: str, branch: str = "main") -> str:
+    """
+    Resolve a branch (or tag/commit reference) to its commit SHA.
+    
+    The lookup goes through the ETag cache, so repeated calls for an unchanged
+    branch are answered with a 304.
+    """
+    url = f"https://api.github.com/repos/{owner}/{repo}/branches/{branch}"
+    try:
+        return github_cached_request(url, lambda data: data["commit"]["sha"])
+    except GitHubNotFoundError:
+        # Not a branch - let GitHub resolve it as a tag or commit reference
+        url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
+        return github_cached_request(url, lambda data: data["sha"])
+
+
+def _get_tree_data(owner: str, repo: str, commit_sha: str, recursive: bool = False) -> Dict[str, Any]:
     tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{commit_sha}"
     if recursive:
         tree_url += "?recursive=1"
+    return github_api_request(tree_url)
+
+
+class RepositoryIndex:
+    """
+    In-memory index of every path in a repository at one commit.
     
-    tree_data = github_api_request(tree_url)
-    return tree_data.get("tree", [])
+    Built from a single recursive tree call, it answers "does this path exist"
+    without downloading files. When GitHub truncated the tree, ``truncated`` is
+    set and a miss is not conclusive.
+    """
+    
+    def __init__(self, owner: str, repo: str, commit_sha: str, tree: List[Dict[str, Any]], truncated: bool = False):
+        self.owner = owner
+        self.repo = repo
+        self.commit_sha = commit_sha
+        self.truncated = truncated
+        self.files = {item["path"] for item in tree if item.get("type") == "blob" and item.get("path")}
+        self.directories = {item["path"] for item in tree if item.get("type") == "tree" and item.get("path")}
+    
+    @staticmethod
+    def normalize(path: str) -> str:
+        """Normalize a repository path ("./a/../b.py" -> "b.py")"""
+        path = posixpath.normpath(path.strip().lstrip("/"))
+        return "" if path == "." else path
+    
+    def exists(self, path: str) -> bool:
+        """Whether a file exists at path"""
+        return self.normalize(path) in self.files
+    
+    def resolve(self, candidates: Iterable[str]) -> Optional[str]:
+        """Return the first candidate path that exists as a file"""
+        for candidate in candidates:
+            path = self.normalize(candidate)
+            if path in self.files:
+                return path
+        return None
+    
+    def files_in(self, directory: str, extension: str = "") -> List[str]:
+        """Files directly inside a directory, optionally filtered by extension"""
+        directory = self.normalize(directory)
+        return sorted(
+            path for path in self.files
+            if posixpath.dirname(path) == directory and path.endswith(extension)
+        )
+    
+    def find(self, pattern: str) -> List[str]:
+        """
+        Find files matching a glob pattern.
+        
+        Patterns without "/" match the file name anywhere in the tree
+        ("Main.java", "*.py"); others match the full path.
+        """
+        if "/" in pattern:
+            pattern = self.normalize(pattern)
+            return sorted(path for path in self.files if fnmatch.fnmatchcase(path, pattern))
+        return sorted(path for path in self.files if fnmatch.fnmatchcase(posixpath.basename(path), pattern))
+
+
+_repository_indexes: "OrderedDict[Tuple[str, str, str], RepositoryIndex]" = OrderedDict()
+_repository_index_lock = threading.Lock()
+
+
+def get_repository_index(owner: str, repo: str, branch: str = "main") -> RepositoryIndex:
+    """
+    Get the path index of a repository at the current head of a branch.
+    
+    Indexes are cached per (owner, repo, commit SHA); a new commit on the branch
+    produces a new index, an unchanged branch costs one conditional request.
+    
+    Args:
+        owner: GitHub username or organization name
+        repo: Repository name
+        branch: Branch name or other commit reference (default: "main")
+    
+    Returns:
+        RepositoryIndex for the commit the branch points to
+    """
+    commit_sha = get_branch_commit_sha(owner, repo, branch)
+    key = (owner.lower(), repo.lower(), commit_sha)
+    
+    with _repository_index_lock:
+        index = _repository_indexes.get(key)
+        if index is not None:
+            _repository_indexes.move_to_end(key)
+            return index
+    
+    tree_data = _get_tree_data(owner, repo, commit_sha, recursive=True)
+    index = RepositoryIndex(owner, repo, commit_sha, tree_data.get("tree", []), bool(tree_data.get("truncated")))
+    if index.truncated:
+        logger.warning(f"#### Repository tree for {owner}/{repo}@{commit_sha[:7]} is truncated; index is partial")
+    logger.info(f"**** Indexed {len(index.files)} files of {owner}/{repo}@{commit_sha[:7]}")
+    
+    with _repository_index_lock:
+        _repository_indexes[key] = index
+        _repository_indexes.move_to_end(key)
+        while len(_repository_indexes) > REPOSITORY_INDEX_CACHE_SIZE:
+            _repository_indexes.popitem(last=False)
+    return index
+
+
+# Line breaks of the unescaped content: real newlines and escaped "\n" sequences.
+# Escapes never span a line break, so the content can be cleaned block by block.
+_CONTENT_LINE_BREAK = re.compile(r"\\n|\n")
+_ESCAPED_CHAR = re.compile(r"\\(.)")
+_JSON_OBJECT_START = re.compile(r"\s*\{")
+# Characters cleaned at a time (blocks end at the next line break after this size)
+CLEAN_BLOCK_CHARS = 64 * 1024
+
+
+def _extract_documented_content(content: str) -> str:
+    """Unwrap content that arrived inside a {"documented_content": ...} JSON object"""
+    if not _JSON_OBJECT_START.match(content) or '"documented_content"' not in content:
+        return content
+    try:
+        # Try to parse as JSON and extract documented_content
+        parsed = json.loads(content)
+        if isinstance(parsed, dict) and 'documented_content' in parsed:
+            content = parsed['documented_content']
+    except (json.JSONDecodeError, TypeError):
+        # If JSON parsing fails, try to extract content manually
+        match = re.search(r'"documented_content":\s*"([^"]*(?:\\.[^"]*)*)"', content, re.DOTALL)
+        if match:
+            content = match.group(1)
+    return content
+
+
+def _clean_content_block(block: str) -> str:
+    """Clean a block of whole lines"""
+    # Convert escaped newlines, quotes and backslashes
+    block = block.replace('\\n', '\n').replace('\\"', '"').replace('\\\\', '\\')
+    # Remove trailing whitespace, and lines that are just whitespace
+    cleaned = '\n'.join(line for line in map(str.rstrip, block.split('\n')) if line)
+    # Final cleanup - remove any remaining escape sequences that shouldn't be there
+    if '\\' in cleaned:
+        cleaned = _ESCAPED_CHAR.sub(r'\1', cleaned)
+    return cleaned
+
+
+def iter_clean_documented_content(content: str) -> Iterator[str]:
+    """
+    Clean documented content in a single streaming pass, yielding the output in pieces.
+    
+    The content is cleaned in blocks of about CLEAN_BLOCK_CHARS that end at a line
+    break, so only one block is ever copied and transformed at a time:
+    - Escaped newlines (\\n) become line breaks
+    - Escaped quotes and backslashes are unescaped
+    - Trailing whitespace and blank lines are removed
+    - Any remaining escape sequence is dropped to the escaped character
+    
+    Args:
+        content: Raw documented content string
+        
+    Yields:
+        Pieces of the cleaned content
+    """
+    content = _extract_documented_content(content)
+    separator = ""
+    start = 0
+    while start <= len(content):
+        line_break = _CONTENT_LINE_BREAK.search(content, start + CLEAN_BLOCK_CHARS)
+        end = line_break.start() if line_break else len(content)
+        cleaned = _clean_content_block(content[start:end])
+        start = line_break.end() if line_break else len(content) + 1
+        if cleaned:
+            yield separator + cleaned if separator else cleaned
+            separator = "\n"
 
 
 def clean_documented_content(content: str) -> str:
@@ -250,7 +639,7 @@ def clean_documented_content(content: str) -> str:
     Clean and normalize documented content for GitHub upload.
     
     Fixes common issues:
-    - Converts escaped newlines (\n) back to actual newlines
+    - Converts escaped newlines (\\n) back to actual newlines
     - Removes extra formatting and padding
     - Strips malformed JSON-like content
     - Handles Unicode escape sequences
@@ -261,54 +650,37 @@ def clean_documented_content(content: str) -> str:
     Returns:
         Cleaned content string ready for GitHub upload
     """
-    import re
-    import json
-    
-    # If the content looks like it's inside a JSON structure, extract just the content
-    if content.strip().startswith('{') and '"documented_content"' in content:
-        try:
-            # Try to parse as JSON and extract documented_content
-            parsed = json.loads(content)
-            if isinstance(parsed, dict) and 'documented_content' in parsed:
-                content = parsed['documented_content']
-        except (json.JSONDecodeError, TypeError):
-            # If JSON parsing fails, try to extract content manually
-            match = re.search(r'"documented_content":\s*"([^"]*(?:\\.[^"]*)*)"', content, re.DOTALL)
-            if match:
-                content = match.group(1)
-    
-    # Convert escaped newlines to actual newlines
-    content = content.replace('\\n', '\n')
-    
-    # Convert escaped quotes
-    content = content.replace('\\"', '"')
-    
-    # Convert escaped backslashes
-    content = content.replace('\\\\', '\\')
-    
-    # Remove extra whitespace and formatting artifacts
-    # Remove excessive trailing newlines and spaces
-    lines = content.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Skip lines that are just whitespace or formatting artifacts
-        if line.strip() and not line.strip().startswith('    \\n'):
-            cleaned_lines.append(line.rstrip())
-    
-    # Remove trailing empty lines but keep structure
-    while cleaned_lines and not cleaned_lines[-1].strip():
-        cleaned_lines.pop()
-    
-    # Rejoin the lines
-    cleaned_content = '\n'.join(cleaned_lines)
+    return "".join(iter_clean_documented_content(content))
+
+
+def encode_documented_content(content: str) -> Tuple[str, int]:
+    """
+    Clean documented content and base64 encode it for the GitHub API in one pass.
     
-    # Final cleanup - remove any remaining escape sequences that shouldn't be there
-    cleaned_content = re.sub(r'\\(.)', r'\1', cleaned_content)
+    The cleaned blocks are written straight into the encoder, so the cleaned text
+    and its UTF-8 bytes are never held in full next to the encoded payload.
     
-    return cleaned_content
+    Args:
+        content: Raw documented content string
+        
+    Returns:
+        Tuple of (base64 encoded cleaned content, size of the cleaned content in bytes)
+    """
+    encoded: List[str] = []
+    carry = b""
+    size = 0
+    for piece in iter_clean_documented_content(content):
+        data = carry + piece.encode('utf-8')
+        size += len(data) - len(carry)
+        # base64 works on groups of 3 bytes; the rest waits for the next piece
+        cut = len(data) - len(data) % 3
+        encoded.append(base64.b64encode(memoryview(data)[:cut]).decode('ascii'))
+        carry = data[cut:]
+    encoded.append(base64.b64encode(carry).decode('ascii'))
+    return "".join(encoded), size
 
 
+@traced("github.commit")
 def commit_to_github(owner: str, repo: str, path: str, content: str, message: str, branch: str = "main") -> Dict[str, Any]:
     """
     Update or create a file in a GitHub repository.
@@ -324,9 +696,9 @@ def commit_to_github(owner: str, repo: str, path: str, content: str, message: st
     Returns:
         GitHub API response with commit information
     """
-    # Clean the content before processing
-    content = clean_documented_content(content)
-    logger.info(f"Content length after cleaning: {len(content)}")
+    # Clean the content and base64 encode it (GitHub API expects base64 encoded content)
+    content_encoded, content_size = encode_documented_content(content)
+    logger.info(f"Content length after cleaning: {content_size} bytes")
     
     # First, try to get the current file to get its SHA (needed for updates)
     file_sha = None
@@ -341,8 +713,8 @@ def commit_to_github(owner: str, repo: str, path: str, content: str, message: st
         # Re-raise other errors (auth, permission, etc.)
         raise
     
-    # Prepare the content (GitHub API expects base64 encoded content)
-    content_encoded = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+    current_span().add("bytes_out", len(content_encoded))
+    current_span().add("files")
     
     # Prepare the update payload
     payload = {
@@ -357,10 +729,122 @@ def commit_to_github(owner: str, repo: str, path: str, content: str, message: st
     
     # Make the update request
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-    headers = get_github_headers()
-    headers["Content-Type"] = "application/json"
-    
-    response = requests.put(url, json=payload, headers=headers)
+    response = github_request("PUT", url, json=payload)
     response.raise_for_status()
     
     return response.json()
+
+
+def create_blob(owner: str, repo: str, content: str, clean: bool = False) -> str:
+    """
+    Upload file content as a Git blob and return its SHA.
+    
+    With clean=True the content is passed through clean_documented_content
+    while it is encoded (see encode_documented_content).
+    """
+    url = f"https://api.github.com/repos/{owner}/{repo}/git/blobs"
+    if clean:
+        content_encoded, _ = encode_documented_content(content)
+    else:
+        content_encoded = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+    payload = {
+        "content": content_encoded,
+        "encoding": "base64"
+    }
+    with span("github.blob") as blob_span:
+        blob_span.add("bytes_out", len(payload["content"]))
+        return _github_checked_request("POST", url, json=payload).json()["sha"]
+
+
+def commit_files_to_github(owner: str, repo: str, files: List[Dict[str, str]], message: str,
+                           branch: str = "main", max_attempts: int = 3) -> Dict[str, Any]:
+    """
+    Create or update any number of files in a single commit using the Git Data API.
+    
+    Blobs are uploaded concurrently, then one tree, one commit and one ref update
+    are created. If the branch moves while the commit is being built, the tree and
+    commit are rebuilt on top of the new head (the blobs are reused).
+    
+    Args:
+        owner: GitHub username or organization name
+        repo: Repository name
+        files: List of {"path", "content"} dicts
+        message: Commit message
+        branch: Branch name (default: "main")
+        max_attempts: Attempts when the branch is updated concurrently
+    
+    Returns:
+        Dict with "commit" ({"sha", "url"}), "tree_sha" and the committed "files"
+    """
+    if not files:
+        raise GitHubError("No files to commit")
+    
+    # The content is cleaned while it is encoded, exactly as commit_to_github does
+    contents = [file_info["content"] for file_info in files]
+    paths = [file_info["path"].lstrip("/") for file_info in files]
+    
+    workers = max(1, min(GITHUB_HTTP_POOL_SIZE, len(contents)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="github-blob") as executor:
+        blob_shas = list(executor.map(lambda content: create_blob(owner, repo, content, clean=True), contents))
+    logger.info(f"**** Uploaded {len(blob_shas)} blobs to {owner}/{repo}")
+    
+    entries = [{"path": path, "sha": blob_sha} for path, blob_sha in zip(paths, blob_shas)]
+    return commit_tree_to_github(owner, repo, entries, message, branch, max_attempts)
+
+
+@traced("github.commit")
+def commit_tree_to_github(owner: str, repo: str, entries: List[Dict[str, str]], message: str,
+                          branch: str = "main", max_attempts: int = 3) -> Dict[str, Any]:
+    """
+    Commit already uploaded blobs (see create_blob) as a single commit on a branch.
+    
+    Args:
+        owner: GitHub username or organization name
+        repo: Repository name
+        entries: List of {"path", "sha"} dicts, one per file
+        message: Commit message
+        branch: Branch name (default: "main")
+        max_attempts: Attempts when the branch is updated concurrently
+    
+    Returns:
+        Dict with "commit" ({"sha", "url"}), "tree_sha" and the committed "files"
+    """
+    if not entries:
+        raise GitHubError("No files to commit")
+    
+    paths = [entry["path"].lstrip("/") for entry in entries]
+    tree_entries = [
+        {"path": path, "mode": "100644", "type": "blob", "sha": entry["sha"]}
+        for path, entry in zip(paths, entries)
+    ]
+    
+    base_url = f"https://api.github.com/repos/{owner}/{repo}/git"
+    for attempt in range(1, max_attempts + 1):
+        head_sha = github_api_request(f"{base_url}/ref/heads/{branch}")["object"]["sha"]
+        base_tree_sha = github_api_request(f"{base_url}/commits/{head_sha}")["tree"]["sha"]
+        
+        tree_sha = _github_checked_request(
+            "POST", f"{base_url}/trees", json={"base_tree": base_tree_sha, "tree": tree_entries}
+        ).json()["sha"]
+        commit_data = _github_checked_request(
+            "POST", f"{base_url}/commits", json={"message": message, "tree": tree_sha, "parents": [head_sha]}
+        ).json()
+        
+        try:
+            _github_checked_request(
+                "PATCH", f"{base_url}/refs/heads/{branch}", json={"sha": commit_data["sha"], "force": False}
+            )
+        except GitHubConflictError:
+            if attempt == max_attempts:
+                raise
+            current_span().add("retries")
+            logger.warning(f"#### Branch {branch} moved during commit, rebuilding (attempt {attempt}/{max_attempts})")
+            continue
+        
+        current_span().add("files", len(paths))
+        logger.info(f"**** Committed {len(paths)} files to {owner}/{repo}@{branch} in {commit_data['sha'][:7]}")
+        return {
+            "commit": {"sha": commit_data["sha"], "url": commit_data.get("html_url", commit_data.get("url", ""))},
+            "tree_sha": tree_sha,
+            "files": paths
+        }
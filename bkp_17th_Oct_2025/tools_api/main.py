@@ -1,16 +1,21 @@
 
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
 from typing import Dict, Any, Optional, List
 import inspect
 import re
 import logging
 
 try:
-    from code_documentation_tool import generate_documentation, code_documenter_agent
+    from code_documentation_tool import generate_documentation, code_documenter_agent, documentation_flights
     from github_tools import fetch_github_file_content, commit_to_github
     from utils.code_documentation_helper import generate_multi_file_documentation
+    from utils.github_http_cache import get_github_etag_cache_stats
+    from utils.result_cache import get_result_cache_stats
+    from utils.metrics import get_metrics_snapshot, render_prometheus_metrics
+    from utils.job_queue import job_queue, Job, JobQueueFullError
 except ImportError as e:
     print(f"Failed to import required modules: {e}")
     raise
@@ -240,6 +245,69 @@ class ToolResponse(BaseModel):
     result: Any = None
     error: str = None
 
+class JobRequest(BaseModel):
+    operation: str  # One of JOB_OPERATIONS
+    params: Dict[str, Any] = {}  # Body of the matching synchronous endpoint
+
+
+# Blocking work behind the endpoints. Every operation runs on a job queue worker
+# thread, never on the event loop, whether it is called synchronously through its
+# own endpoint or submitted to /jobs.
+def _fetch_github_file(request: GitHubFileRequest) -> Any:
+    return tools["CodeDocumenterTool"].fetch_github_file(request.repository_url, request.file_path, request.branch)
+
+def _document_code(request: ToolRequest) -> Any:
+    tool = tools["CodeDocumenterTool"]
+    return {
+        "documentation": tool.document_code(request.prompt, request.path),
+        "language": tool.detect_language(request.path),
+        "mode": "PRODUCTION"
+    }
+
+def _analyze_code(request: ToolRequest) -> Any:
+    tool = tools["CodeDocumenterTool"]
+    return {
+        "analysis": tool.analyze_code(request.prompt, request.path),
+        "language": tool.detect_language(request.path),
+        "mode": "PRODUCTION"
+    }
+
+def _commit_github_file(request: GitHubCommitRequest) -> Any:
+    return tools["CodeDocumenterTool"].commit_github_file(
+        request.repository_url, request.file_path, request.content, request.commit_message, request.branch
+    )
+
+def _document_multiple_files(request: MultiFileDocumentationRequest) -> Any:
+    return tools["CodeDocumenterTool"].document_multiple_files(request.files_to_document, request.repository_url, request.branch)
+
+def _analyze_multiple_files(request: MultiFileAnalysisRequest) -> Any:
+    return tools["CodeDocumenterTool"].analyze_multiple_files(request.files_to_analyze, request.repository_url, request.branch)
+
+def _search_workspace_files(request: WorkspaceSearchRequest) -> Any:
+    return tools["CodeDocumenterTool"].search_workspace_files(request.root_dir, request.filename, request.pattern, request.debug)
+
+def _chunked_documentation(request: ChunkedDocumentationRequest) -> Any:
+    return tools["CodeDocumenterTool"].chunked_documentation(request.prompt, request.include_analysis)
+
+# operation -> (request model, blocking function)
+JOB_OPERATIONS = {
+    "github/fetch_file": (GitHubFileRequest, _fetch_github_file),
+    "document_code": (ToolRequest, _document_code),
+    "analyze_code": (ToolRequest, _analyze_code),
+    "github/commit_file": (GitHubCommitRequest, _commit_github_file),
+    "document_multiple_files": (MultiFileDocumentationRequest, _document_multiple_files),
+    "analyze_multiple_files": (MultiFileAnalysisRequest, _analyze_multiple_files),
+    "search_workspace_files": (WorkspaceSearchRequest, _search_workspace_files),
+    "chunked_documentation": (ChunkedDocumentationRequest, _chunked_documentation),
+}
+
+def submit_job(operation: str, request: BaseModel) -> Job:
+    """Queue an operation; answers 429 (with Retry-After) when the queue is full."""
+    try:
+        return job_queue.submit(operation, JOB_OPERATIONS[operation][1], request)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 @app.get("/", summary="API Root", description="Welcome to the Encora AIVA Code Documenter API. Use /tools to list available tools.")
 async def root():
     return {"message": "Encora AIVA Code Documenter API", "tools": list(tools.keys())}
@@ -267,6 +335,62 @@ async def list_tools():
 async def health():    
     return {"status": "healthy", "mode": "PRODUCTION"}
 
+@app.get("/cache/stats", summary="Cache statistics", description="Hit ratios and sizes of the GitHub HTTP (ETag) cache and the documentation result cache, and how many in-flight documentation requests were coalesced.")
+async def cache_stats():
+    return {
+        "github_http": get_github_etag_cache_stats(),
+        "documentation_results": get_result_cache_stats(),
+        "documentation_in_flight": documentation_flights.stats()
+    }
+
+@app.get("/metrics", summary="Pipeline metrics", description="Durations and counters (bytes, tokens, retries, cache hits) of every pipeline stage: fetch, discovery, chunking, agent calls, parsing and commit. Prometheus text format; ?format=json returns JSON including the most recent spans.")
+async def metrics(format: str = "prometheus"):
+    if format == "json":
+        return get_metrics_snapshot()
+    return PlainTextResponse(render_prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/jobs", summary="Job queue statistics", description="Workers, running and queued jobs, and submitted/rejected/succeeded/failed counters of the job queue.")
+async def job_stats():
+    return {"operations": list(JOB_OPERATIONS.keys()), "queue": job_queue.stats()}
+
+@app.post(
+    "/jobs",
+    status_code=202,
+    summary="Submit a job",
+    description="Queues an operation (e.g. document_multiple_files) with the body of its synchronous endpoint as params and returns the job id at once. Answers 429 when the queue is full."
+)
+async def submit_job_endpoint(request: JobRequest):
+    if request.operation not in JOB_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown operation '{request.operation}', expected one of {list(JOB_OPERATIONS.keys())}")
+    try:
+        params = JOB_OPERATIONS[request.operation][0](**request.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    return submit_job(request.operation, params).to_dict()
+
+@app.get("/jobs/{job_id}", summary="Job status", description="Status and timings of a submitted job.")
+async def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job '{job_id}'")
+    return job.to_dict()
+
+@app.get(
+    "/jobs/{job_id}/result",
+    response_model=ToolResponse,
+    summary="Job result",
+    description="Result of a finished job. Answers 202 with the job status while it is still queued or running."
+)
+async def job_result(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job '{job_id}'")
+    if not job.done:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    if job.error is not None:
+        return ToolResponse(success=False, error=job.error)
+    return ToolResponse(success=True, result=job.result)
+
 @app.post(
     "/github/fetch_file",
     response_model=ToolResponse,
@@ -274,9 +398,9 @@ async def health():
     description="Retrieves a file from a GitHub repository."
 )
 async def execute_fetch_github_file(request: GitHubFileRequest) -> ToolResponse:
+    job = submit_job("github/fetch_file", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.fetch_github_file(request.repository_url, request.file_path, request.branch)
+        result = await job_queue.wait(job)
         return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch GitHub file: {e}")
@@ -288,14 +412,10 @@ async def execute_fetch_github_file(request: GitHubFileRequest) -> ToolResponse:
     description="Generates comprehensive documentation for provided code."
 )
 async def execute_document_code(request: ToolRequest) -> ToolResponse:
+    job = submit_job("document_code", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.document_code(request.prompt, request.path)
-        return ToolResponse(success=True, result={
-            "documentation": result,
-            "language": tool.detect_language(request.path),
-            "mode": "PRODUCTION"
-        })
+        result = await job_queue.wait(job)
+        return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate documentation: {e}")
 
@@ -306,14 +426,10 @@ async def execute_document_code(request: ToolRequest) -> ToolResponse:
     description="Performs comprehensive code analysis including security and performance review."
 )
 async def execute_analyze_code(request: ToolRequest) -> ToolResponse:
+    job = submit_job("analyze_code", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.analyze_code(request.prompt, request.path)
-        return ToolResponse(success=True, result={
-            "analysis": result,
-            "language": tool.detect_language(request.path),
-            "mode": "PRODUCTION"
-        })
+        result = await job_queue.wait(job)
+        return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze code: {e}")
 
@@ -324,9 +440,9 @@ async def execute_analyze_code(request: ToolRequest) -> ToolResponse:
     description="Commits a file to a GitHub repository."
 )
 async def execute_commit_github_file(request: GitHubCommitRequest) -> ToolResponse:
+    job = submit_job("github/commit_file", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.commit_github_file(request.repository_url, request.file_path, request.content, request.commit_message, request.branch)
+        result = await job_queue.wait(job)
         return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to commit to GitHub: {e}")
@@ -338,9 +454,9 @@ async def execute_commit_github_file(request: GitHubCommitRequest) -> ToolRespon
     description="Generates comprehensive documentation for multiple files in a repository."
 )
 async def execute_document_multiple_files(request: MultiFileDocumentationRequest) -> ToolResponse:
+    job = submit_job("document_multiple_files", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.document_multiple_files(request.files_to_document, request.repository_url, request.branch)
+        result = await job_queue.wait(job)
         return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to document multiple files: {e}")
@@ -352,9 +468,9 @@ async def execute_document_multiple_files(request: MultiFileDocumentationRequest
     description="Performs comprehensive analysis for multiple files in a repository."
 )
 async def execute_analyze_multiple_files(request: MultiFileAnalysisRequest) -> ToolResponse:
+    job = submit_job("analyze_multiple_files", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.analyze_multiple_files(request.files_to_analyze, request.repository_url, request.branch)
+        result = await job_queue.wait(job)
         return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze multiple files: {e}")
@@ -366,9 +482,9 @@ async def execute_analyze_multiple_files(request: MultiFileAnalysisRequest) -> T
     description="Searches for files in the workspace by filename or pattern."
 )
 async def execute_search_workspace_files(request: WorkspaceSearchRequest) -> ToolResponse:
+    job = submit_job("search_workspace_files", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.search_workspace_files(request.root_dir, request.filename, request.pattern, request.debug)
+        result = await job_queue.wait(job)
         return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search workspace files: {e}")
@@ -380,13 +496,17 @@ async def execute_search_workspace_files(request: WorkspaceSearchRequest) -> Too
     description="Generates documentation for large files using chunking strategy."
 )
 async def execute_chunked_documentation(request: ChunkedDocumentationRequest) -> ToolResponse:
+    job = submit_job("chunked_documentation", request)
     try:
-        tool = tools["CodeDocumenterTool"]
-        result = tool.chunked_documentation(request.prompt, request.include_analysis)
+        result = await job_queue.wait(job)
         return ToolResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate chunked documentation: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_job_queue():
+    job_queue.shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
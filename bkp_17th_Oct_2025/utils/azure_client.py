@@ -4,19 +4,50 @@ Azure Authentication and Client Management for AIVA MCP Server
 This module provides centralized Azure authentication and client management
 for all Azure services used in the AIVA MCP Server with advanced caching.
 
-Version: 1.1.0
-Date: 05/09/2025
+Version: 1.2.0
+Date: 18/10/2026
 """
 
 import os
 import time
+import asyncio
 import logging
-from typing import Optional
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
 from azure.ai.projects import AIProjectClient
+from azure.ai.projects.aio import AIProjectClient as AsyncAIProjectClient
+
+from .metrics import current_span, span, traced
 
 logger = logging.getLogger(__name__)
 
+# Agent run polling configuration loaded from environment (.env)
+AGENT_RUN_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "180"))  # seconds
+AGENT_POLL_INITIAL_INTERVAL = float(os.getenv("AGENT_POLL_INITIAL_INTERVAL", "0.25"))  # seconds
+AGENT_POLL_MAX_INTERVAL = float(os.getenv("AGENT_POLL_MAX_INTERVAL", "4"))  # seconds
+AGENT_POLL_BACKOFF_FACTOR = float(os.getenv("AGENT_POLL_BACKOFF_FACTOR", "1.5"))
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action")
+
+
+def _is_error_response(response: str) -> bool:
+    """Whether a run_agent* return value is an error message."""
+    return response.startswith(("ERROR:", "WARNING:"))
+
+
+def poll_intervals(initial: float = AGENT_POLL_INITIAL_INTERVAL,
+                   maximum: float = AGENT_POLL_MAX_INTERVAL,
+                   factor: float = AGENT_POLL_BACKOFF_FACTOR) -> Iterator[float]:
+    """
+    Yield delays between run status polls: short at first so quick runs return
+    quickly, growing by ``factor`` up to ``maximum`` for long runs.
+    """
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
 # Import caching system
 try:
     import sys
@@ -92,6 +123,10 @@ class AzureCredentialManager:
 class AzureAIProjectManager:
     """
     Manages Azure AI Project client connections and operations.
+    
+    One client per process is reused for every run (a sync client for run_agent
+    and an async client for run_agent_async), so runs share connections and the
+    credential's token instead of re-authenticating per call.
     """
     
     def __init__(self):
@@ -99,16 +134,20 @@ class AzureAIProjectManager:
         self.project_endpoint = os.getenv("PROJECT_ENDPOINT_STRING", "")
         if not self.project_endpoint:
             logger.warning("PROJECT_ENDPOINT_STRING not set in environment")
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        self._async_credential = None
+        self._async_loop = None
+        self._usage_lock = threading.Lock()
+        self._usage = {"threads": 0, "runs": 0, "prompt_tokens": 0, "completion_tokens": 0}
     
-    def get_client(self) -> AIProjectClient:
+    def _client_kwargs(self) -> dict:
         """
-        Get an Azure AI Project client instance.
+        Build the AIProjectClient constructor arguments (except the credential).
         
-        Returns:
-            AIProjectClient: Configured Azure AI Project client
-            
         Raises:
-            ValueError: If project endpoint is not configured
+            ValueError: If project endpoint or Azure parameters are not configured
         """
         if not self.project_endpoint:
             raise ValueError("PROJECT_ENDPOINT_STRING not configured")
@@ -121,15 +160,141 @@ class AzureAIProjectManager:
         if not subscription_id or not resource_group_name or not project_name:
             raise ValueError("Missing required Azure parameters: AZURE_SUBSCRIPTION_ID, AZURE_RESOURCE_GROUP_NAME, AZURE_PROJECT_NAME")
         
-        return AIProjectClient(
-            endpoint=self.project_endpoint,
-            credential=self.credential_manager.get_credential(),
-            subscription_id=subscription_id,
-            resource_group_name=resource_group_name,
-            project_name=project_name
+        return {
+            "endpoint": self.project_endpoint,
+            "subscription_id": subscription_id,
+            "resource_group_name": resource_group_name,
+            "project_name": project_name
+        }
+    
+    def get_client(self) -> AIProjectClient:
+        """
+        Get the shared Azure AI Project client instance (created on first use).
+        
+        Returns:
+            AIProjectClient: Configured Azure AI Project client
+            
+        Raises:
+            ValueError: If project endpoint is not configured
+        """
+        with self._client_lock:
+            if self._client is None:
+                self._client = AIProjectClient(
+                    credential=self.credential_manager.get_credential(),
+                    **self._client_kwargs()
+                )
+                logger.info("Created shared Azure AI Project client")
+            return self._client
+    
+    async def get_async_client(self) -> AsyncAIProjectClient:
+        """
+        Get the shared async Azure AI Project client for the running event loop.
+        
+        Async clients are bound to the loop they were created on, so a new client
+        is created if the manager is used from a different loop.
+        
+        Returns:
+            AsyncAIProjectClient: Configured async Azure AI Project client
+            
+        Raises:
+            ValueError: If project endpoint is not configured
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            client_kwargs = self._client_kwargs()
+            self._async_credential = AsyncDefaultAzureCredential()
+            self._async_client = AsyncAIProjectClient(credential=self._async_credential, **client_kwargs)
+            self._async_loop = loop
+            logger.info("Created shared async Azure AI Project client")
+        return self._async_client
+    
+    async def aclose(self):
+        """Close the shared async client and its credential."""
+        client, credential = self._async_client, self._async_credential
+        self._async_client = self._async_credential = self._async_loop = None
+        if client is not None:
+            await client.close()
+        if credential is not None:
+            await credential.close()
+    
+    def close(self):
+        """Close the shared sync client."""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+    
+    def _resolve_agent_id(self, agent_id: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Return (agent id, configuration error message or None)."""
+        if not self.project_endpoint:
+            return "", "ERROR: PROJECT_ENDPOINT_STRING not configured"
+        target_agent_id = agent_id or os.getenv("AGENT_ID", "")
+        if not target_agent_id:
+            return "", "ERROR: No agent ID provided and AGENT_ID not set in environment"
+        return target_agent_id, None
+    
+    def _record_run(self, run, new_thread: bool):
+        """Add a finished run (and the thread it created, if any) to the usage counters."""
+        usage = getattr(run, "usage", None)
+        current_span().add("tokens_in", getattr(usage, "prompt_tokens", 0) or 0)
+        current_span().add("tokens_out", getattr(usage, "completion_tokens", 0) or 0)
+        with self._usage_lock:
+            self._usage["runs"] += 1
+            self._usage["threads"] += int(new_thread)
+            self._usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self._usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+    
+    def get_usage_stats(self) -> Dict[str, int]:
+        """Get the number of threads, runs and tokens used by this manager."""
+        with self._usage_lock:
+            return dict(self._usage)
+    
+    @staticmethod
+    def _wait_for_run(ai_client: AIProjectClient, thread_id: str, run, timeout: float):
+        """
+        Poll a run until it leaves the active statuses.
+        
+        Returns:
+            The finished run, or None if it did not finish within ``timeout`` seconds
+        """
+        start_time = time.monotonic()
+        delays = poll_intervals()
+        while run.status in ACTIVE_RUN_STATUSES:
+            remaining = timeout - (time.monotonic() - start_time)
+            if remaining <= 0:
+                return None
+            time.sleep(min(next(delays), remaining))
+            current_span().add("polls")
+            run = ai_client.agents.runs.get(
+                thread_id=thread_id, 
+                run_id=run.id
+            )
+        return run
+    
+    @staticmethod
+    def _latest_message(ai_client: AIProjectClient, thread_id: str):
+        """Get the newest message of a thread (None if there is none)."""
+        messages = ai_client.agents.messages.list(
+            thread_id=thread_id, 
+            order="desc", 
+            limit=1
         )
+        return next(iter(messages), None)
+    
+    @staticmethod
+    def _run_result(run, msg) -> str:
+        """Turn a finished run and its latest message into the run_agent return value."""
+        if run.status == "failed":
+            error_msg = f"ERROR: Agent run failed: {run.last_error}"
+            logger.error(error_msg)
+            return error_msg
+        if msg and msg.text_messages:
+            return msg.text_messages[-1].text.value
+        logger.warning("No response message found")
+        return "WARNING: Agent completed but no response message found"
     
-    def run_agent(self, prompt: str, agent_id: Optional[str] = None) -> str:
+    @traced("agent_call", failed=_is_error_response)
+    def run_agent(self, prompt: str, agent_id: Optional[str] = None, timeout: float = AGENT_RUN_TIMEOUT) -> str:
         """
         Execute an Azure AI Agent with the given prompt.
         
@@ -137,62 +302,178 @@ class AzureAIProjectManager:
             prompt (str): The input prompt for the agent
             agent_id (str, optional): Specific agent ID to use. If not provided,
                                      uses AGENT_ID from environment
+            timeout (float): Max seconds to wait for the run to finish
                                      
         Returns:
             str: The agent's response or error message
         """
         try:
-            if not self.project_endpoint:
-                return "ERROR: PROJECT_ENDPOINT_STRING not configured"
-            
-            target_agent_id = agent_id or os.getenv("AGENT_ID", "")
-            if not target_agent_id:
-                return "ERROR: No agent ID provided and AGENT_ID not set in environment"
+            target_agent_id, error_msg = self._resolve_agent_id(agent_id)
+            if error_msg:
+                return error_msg
             
             ai_client = self.get_client()
+            current_span().add("chars_in", len(prompt))
+            
+            # Create thread and message
+            thread = ai_client.agents.threads.create()
+            ai_client.agents.messages.create(
+                thread_id=thread.id, 
+                role="user", 
+                content=prompt
+            )
+            
+            # Start the run
+            run = ai_client.agents.runs.create(
+                thread_id=thread.id, 
+                agent_id=target_agent_id
+            )
 
-            with ai_client:
-                # Create thread and message
-                thread = ai_client.agents.threads.create()
-                ai_client.agents.messages.create(
-                    thread_id=thread.id, 
-                    role="user", 
-                    content=prompt
-                )
-                
-                # Start the run
-                run = ai_client.agents.runs.create_and_process(
-                    thread_id=thread.id, 
-                    agent_id=target_agent_id
-                )
+            # Wait for completion, polling quickly at first and backing off for long runs
+            run = self._wait_for_run(ai_client, thread.id, run, timeout)
+            if run is None:
+                error_msg = f"ERROR: Agent run timed out after {int(timeout)}s"
+                logger.error(error_msg)
+                return error_msg
+            self._record_run(run, new_thread=True)
 
-                # Wait for completion
-                while run.status in ["queued", "in_progress", "requires_action"]:
-                    time.sleep(1)
-                    run = ai_client.agents.runs.get(
-                        thread_id=run.thread_id, 
-                        run_id=run.id
-                    )
+            msg = self._latest_message(ai_client, thread.id) if run.status != "failed" else None
+            return self._run_result(run, msg)
 
-                if run.status == "failed":
-                    error_msg = f"ERROR: Agent run failed: {run.last_error}"
+        except Exception as e:
+            error_msg = f"WARNING: Error calling Azure AI Agent: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+    
+    def run_agent_thread(self, prompts: List[str], agent_id: Optional[str] = None,
+                         timeout: float = AGENT_RUN_TIMEOUT,
+                         on_response: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """
+        Execute several prompts as consecutive turns of one agent thread.
+        
+        The thread keeps the earlier messages, so instructions sent with the first
+        prompt apply to the later turns without being sent again. Each turn is its
+        own run and must finish before the next prompt is added. If a turn fails,
+        the remaining turns are not run and get an error message.
+        
+        Args:
+            prompts (List[str]): Prompts in the order they are sent
+            agent_id (str, optional): Specific agent ID to use. If not provided,
+                                     uses AGENT_ID from environment
+            timeout (float): Max seconds to wait for each turn
+            on_response (callable, optional): Called with (index, response) after every turn
+        
+        Returns:
+            List[str]: One response or error message per prompt
+        """
+        target_agent_id, error_msg = self._resolve_agent_id(agent_id)
+        if error_msg:
+            return [error_msg] * len(prompts)
+        
+        responses: List[str] = []
+        error_msg = "ERROR: Skipped because an earlier turn of the agent thread failed"
+        try:
+            ai_client = self.get_client()
+            thread = ai_client.agents.threads.create()
+            for i, prompt in enumerate(prompts):
+                with span("agent_call", turn=i + 1, turns=len(prompts)) as turn_span:
+                    turn_span.add("chars_in", len(prompt))
+                    ai_client.agents.messages.create(thread_id=thread.id, role="user", content=prompt)
+                    run = ai_client.agents.runs.create(thread_id=thread.id, agent_id=target_agent_id)
+                    run = self._wait_for_run(ai_client, thread.id, run, timeout)
+                    if run is None:
+                        response = f"ERROR: Agent run timed out after {int(timeout)}s"
+                        logger.error(response)
+                    else:
+                        self._record_run(run, new_thread=(i == 0))
+                        msg = self._latest_message(ai_client, thread.id) if run.status != "failed" else None
+                        response = self._run_result(run, msg)
+                    turn_span.add("chars_out", len(response))
+                    turn_span.error = _is_error_response(response)
+                responses.append(response)
+                if on_response:
+                    on_response(i, response)
+                if response.startswith(("ERROR:", "WARNING:")):
+                    break
+        except Exception as e:
+            error_msg = f"WARNING: Error calling Azure AI Agent: {str(e)}"
+            logger.error(error_msg)
+        
+        responses.extend([error_msg] * (len(prompts) - len(responses)))
+        return responses
+    
+    @traced("agent_call", failed=_is_error_response)
+    async def run_agent_async(self, prompt: str, agent_id: Optional[str] = None, timeout: float = AGENT_RUN_TIMEOUT,
+                              poll_interval: float = AGENT_POLL_INITIAL_INTERVAL,
+                              max_poll_interval: float = AGENT_POLL_MAX_INTERVAL) -> str:
+        """
+        Execute an Azure AI Agent without blocking the event loop.
+        
+        Many runs can be awaited concurrently (e.g. with asyncio.gather); they share
+        one async client and wait with asyncio.sleep while polling. A run that does
+        not finish within ``timeout`` is cancelled.
+        
+        Args:
+            prompt (str): The input prompt for the agent
+            agent_id (str, optional): Specific agent ID to use. If not provided,
+                                     uses AGENT_ID from environment
+            timeout (float): Max seconds to wait for the run to finish
+            poll_interval (float): First delay between status polls
+            max_poll_interval (float): Upper bound for the delay between status polls
+                                     
+        Returns:
+            str: The agent's response or error message
+        """
+        try:
+            target_agent_id, error_msg = self._resolve_agent_id(agent_id)
+            if error_msg:
+                return error_msg
+            
+            ai_client = await self.get_async_client()
+            start_time = time.monotonic()
+            current_span().add("chars_in", len(prompt))
+            
+            thread = await ai_client.agents.threads.create()
+            await ai_client.agents.messages.create(thread_id=thread.id, role="user", content=prompt)
+            run = await ai_client.agents.runs.create(thread_id=thread.id, agent_id=target_agent_id)
+            
+            delays = poll_intervals(poll_interval, max_poll_interval)
+            while run.status in ACTIVE_RUN_STATUSES:
+                remaining = timeout - (time.monotonic() - start_time)
+                if remaining <= 0:
+                    try:
+                        await ai_client.agents.runs.cancel(thread_id=thread.id, run_id=run.id)
+                    except Exception:
+                        pass  # The timeout is reported either way
+                    error_msg = f"ERROR: Agent run timed out after {int(timeout)}s"
                     logger.error(error_msg)
                     return error_msg
-                else:
-                    # Get the latest message
-                    messages = ai_client.agents.messages.list(
-                        thread_id=thread.id, 
-                        order="desc", 
-                        limit=1
-                    )
-                    msg = next(iter(messages), None)
-                    if msg and msg.text_messages:
-                        return msg.text_messages[-1].text.value
-                    else:
-                        logger.warning("No response message found")
-                        return "WARNING: Agent completed but no response message found"
-
+                await asyncio.sleep(min(next(delays), remaining))
+                current_span().add("polls")
+                run = await ai_client.agents.runs.get(thread_id=thread.id, run_id=run.id)
+            self._record_run(run, new_thread=True)
+            
+            msg = None
+            if run.status != "failed":
+                async for msg in ai_client.agents.messages.list(thread_id=thread.id, order="desc", limit=1):
+                    break
+            return self._run_result(run, msg)
+        
         except Exception as e:
             error_msg = f"WARNING: Error calling Azure AI Agent: {str(e)}"
             logger.error(error_msg)
             return error_msg
+
+
+# Process-wide manager so every caller shares the same clients
+_project_manager: Optional[AzureAIProjectManager] = None
+_project_manager_lock = threading.Lock()
+
+
+def get_project_manager() -> AzureAIProjectManager:
+    """Get the process-wide AzureAIProjectManager (created on first use)."""
+    global _project_manager
+    with _project_manager_lock:
+        if _project_manager is None:
+            _project_manager = AzureAIProjectManager()
+        return _project_manager
@@ -11,12 +11,42 @@ Author: Refactored for better modularity
 
 import os
 import re
+import math
+import itertools
 import logging
-from typing import Set, List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Set, List, Dict, Any, Optional, Tuple, Callable, Iterator
 from pathlib import Path
 
+from .code_structure import INDENT_LANGUAGES, detect_language, index_code_units
+from .token_counter import get_token_counter
+from .metrics import span
+from .result_cache import PARTIAL_RESULT_MARKER
+
 logger = logging.getLogger(__name__)
 
+def documentation_settings() -> Dict[str, Any]:
+    """
+    Settings that change what the documentation pipeline returns for the same source.
+    
+    They are part of the result cache key (see code_documenter_agent), so results
+    produced under other settings are not served after a configuration change.
+    """
+    return {
+        "chunk_instruction": CHUNK_INSTRUCTION,
+        "chunk_map_instruction": CHUNK_MAP_INSTRUCTION,
+        "reduce_instruction": REDUCE_ANALYSIS_INSTRUCTION,
+        "chunk_analysis_mode": CHUNK_ANALYSIS_MODE,
+        "chunk_shared_thread": CHUNK_SHARED_THREAD,
+        "chunk_notes_max_tokens": CHUNK_NOTES_MAX_TOKENS,
+        "chunk_skeleton_max_tokens": CHUNK_SKELETON_MAX_TOKENS,
+        "prompt_token_budget": PROMPT_TOKEN_BUDGET,
+        "large_file_strategy": LARGE_FILE_STRATEGY,
+        "large_file_threshold_tokens": LARGE_FILE_THRESHOLD_TOKENS,
+        "hierarchy": [HIERARCHY_REGION_MAX_TOKENS, HIERARCHY_SUMMARY_MAX_TOKENS, HIERARCHY_FANOUT,
+                      HIERARCHY_CONTEXT_MAX_TOKENS, HIERARCHY_MAX_CALLS],
+    }
+
 def validate_environment():
     """Validate that critical environment variables are loaded"""
     required_vars = [
@@ -51,10 +81,50 @@ class LargeFileStrategy:
     SUMMARIZE = "summarize"   # Create summary for analysis
     TRUNCATE = "truncate"     # Simple truncation
     REJECT = "reject"         # Reject large files
+    HIERARCHICAL = "hierarchical"  # Summarize regions bottom-up, document each with its ancestor summaries
 
 # Configuration loaded from environment (.env)
 LARGE_FILE_THRESHOLD = int(os.getenv("LARGE_FILE_THRESHOLD", "250000"))
 LARGE_FILE_STRATEGY = os.getenv("LARGE_FILE_STRATEGY", LargeFileStrategy.CHUNK)
+# Maximum number of chunks documented concurrently (1 = sequential)
+CHUNK_MAX_CONCURRENCY = int(os.getenv("CHUNK_MAX_CONCURRENCY", "4"))
+# Document all chunks of a file as turns of one agent thread (instruction sent once, chunks run sequentially)
+CHUNK_SHARED_THREAD = os.getenv("CHUNK_SHARED_THREAD", "false").lower() in ("true", "1", "yes", "y")
+# How PART 1 of a chunked file is produced: "map_reduce" (every chunk returns compact notes that one
+# final call merges into the full report) or "first" (the first chunk's analysis is used as is)
+CHUNK_ANALYSIS_MODE = os.getenv("CHUNK_ANALYSIS_MODE", "map_reduce").lower()
+# Upper bound for the analysis notes of one chunk in map_reduce mode
+CHUNK_NOTES_MAX_TOKENS = int(os.getenv("CHUNK_NOTES_MAX_TOKENS", "800"))
+# Token budget for the shared file skeleton prepended to every chunk prompt (0 = disabled)
+CHUNK_SKELETON_MAX_TOKENS = int(os.getenv("CHUNK_SKELETON_MAX_TOKENS", "2000"))
+# Token budget for the code summary of the SUMMARIZE strategy
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "12500"))
+# HIERARCHICAL strategy: code per leaf region, size of one region summary, summaries merged
+# into each parent summary, and the ancestor summaries sent along with a region
+HIERARCHY_REGION_MAX_TOKENS = int(os.getenv("HIERARCHY_REGION_MAX_TOKENS", "24000"))
+HIERARCHY_SUMMARY_MAX_TOKENS = int(os.getenv("HIERARCHY_SUMMARY_MAX_TOKENS", "400"))
+HIERARCHY_FANOUT = int(os.getenv("HIERARCHY_FANOUT", "4"))
+HIERARCHY_CONTEXT_MAX_TOKENS = int(os.getenv("HIERARCHY_CONTEXT_MAX_TOKENS", "4000"))
+# Agent calls allowed for one file (0 = unlimited). A tighter budget first widens the tree
+# (fewer merge calls, fewer and coarser ancestor summaries), then grows the regions
+HIERARCHY_MAX_CALLS = int(os.getenv("HIERARCHY_MAX_CALLS", "0"))
+# Token budgets (measured with utils/token_counter.py). The model context holds the
+# prompt AND the response, so the response size is reserved before budgeting prompts
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "128000"))
+RESPONSE_RESERVED_TOKENS = int(os.getenv("RESPONSE_RESERVED_TOKENS", "16384"))
+PROMPT_SAFETY_TOKENS = int(os.getenv("PROMPT_SAFETY_TOKENS", "1000"))
+PROMPT_TOKEN_BUDGET = MODEL_CONTEXT_TOKENS - RESPONSE_RESERVED_TOKENS - PROMPT_SAFETY_TOKENS
+LARGE_FILE_THRESHOLD_TOKENS = int(os.getenv("LARGE_FILE_THRESHOLD_TOKENS", "62500"))
+# The agent service also caps a single message at 256,000 characters
+AGENT_MESSAGE_MAX_CHARS = 256000
+AGENT_MESSAGE_SAFETY_CHARS = 5000
+# Budgets and parallelism for transitive dependency collection
+DEPENDENCY_MAX_FILES = int(os.getenv("DEPENDENCY_MAX_FILES", "50"))
+DEPENDENCY_MAX_BYTES = int(os.getenv("DEPENDENCY_MAX_BYTES", "2000000"))
+DEPENDENCY_FETCH_CONCURRENCY = int(os.getenv("DEPENDENCY_FETCH_CONCURRENCY", "8"))
+
+# PART 1 of a chunked result when no part produced any analysis (not worth keeping)
+FALLBACK_ANALYSIS_PREFIX = "Analysis completed for "
 
 # Analysis instruction templates
 ANALYSIS_INSTRUCTION = """
@@ -246,10 +316,113 @@ IMPORTANT: Structure your response in TWO clear sections:
 ## Code to Analyze:
 """
 
+CHUNK_MAP_INSTRUCTION = """
+Document the following code chunk (part {part} of {total} of a larger file) with proper comments and formatting.
+
+IMPORTANT: Structure your response in TWO clear sections:
+1. First section: Start with "### PART 1: CHUNK ANALYSIS" followed by compact notes about THIS chunk only,
+   using exactly these headings with short bullet points (at most {max_words} words in total;
+   write "None" under a heading that does not apply):
+   - Purpose:
+   - Components: (classes/functions and their responsibilities)
+   - Dependencies & Integrations:
+   - Design & Patterns:
+   - Code Quality Issues: (with line references)
+   - Security Risks (OWASP Top 10):
+   - Performance & Scalability:
+   - Technical Debt & Refactoring:
+2. Second section: Start with "### PART 2: DOCUMENTED CODE" followed by the documented code
+
+## Code to Analyze:
+"""
+
+REDUCE_ANALYSIS_INSTRUCTION = """
+You are given compact analysis notes for the {total} parts of ONE source file, in file order.
+Merge them into a single comprehensive analysis of the whole file: combine findings that span
+several parts, remove duplicates and keep line references. Do NOT output any code.
+
+Respond with "### PART 1: COMPREHENSIVE ANALYSIS" followed by the report, using this format
+(ignore anything it says about documented code):
+
+{report_format}
+{file_context}
+## Chunk Analyses:
+"""
+
+MERGE_ANALYSIS_INSTRUCTION = """
+You are given compact analysis notes for consecutive parts of ONE source file.
+Merge them into one set of notes with the same headings, removing duplicates
+(at most {max_words} words in total). Do NOT output any code.
+
+Respond with "### PART 1: CHUNK ANALYSIS" followed by the merged notes.
+
+## Chunk Analyses:
+"""
+
+THREAD_CHUNK_INSTRUCTION = """
+This is part {part} of {total} of the same file. Document it following the instructions and the file
+context given in the first message of this conversation.
+
+IMPORTANT: Structure your response in TWO clear sections:
+1. First section: Start with "### PART 1: CHUNK ANALYSIS" followed by brief analysis
+2. Second section: Start with "### PART 2: DOCUMENTED CODE" followed by the documented code
+
+## Code to Analyze:
+"""
+
+REGION_SUMMARY_INSTRUCTION = """
+Summarize the following code region (part {part} of {total} of a larger file). The summary is used
+as context when the rest of the file is documented. Do NOT output any code.
+
+Respond with "### PART 1: CHUNK ANALYSIS" followed by compact notes about THIS region only,
+using exactly these headings with short bullet points (at most {max_words} words in total;
+write "None" under a heading that does not apply):
+   - Purpose:
+   - Components: (classes/functions and their responsibilities)
+   - Dependencies & Integrations:
+   - Design & Patterns:
+   - Code Quality Issues: (with line references)
+   - Security Risks (OWASP Top 10):
+   - Performance & Scalability:
+   - Technical Debt & Refactoring:
+
+## Code to Analyze:
+"""
+
+HIERARCHY_REGION_INSTRUCTION = """
+Document the following code region (part {part} of {total} of a larger file) with proper comments and formatting.
+The analysis of the whole file is written separately, so do not repeat it.
+
+IMPORTANT: Start your response with "### PART 2: DOCUMENTED CODE" followed by the documented code.
+
+## Code to Analyze:
+"""
+
+HIERARCHY_CONTEXT_INSTRUCTION = """
+## File Context (enclosing sections of this region, from the whole file down):
+Use these summaries to keep names, cross-references and terminology consistent,
+but only document the code under "Code to Analyze".
+
+{summaries}
+"""
+
+FILE_SKELETON_INSTRUCTION = """
+## File Context (shared by all {total_chunks} parts of this file):
+The outline below lists the imports and declarations of the WHOLE file. Use it to keep names,
+cross-references and terminology consistent, but only document the code under "Code to Analyze".
+
+```
+{skeleton}
+```
+"""
+
 def discover_dependencies(source_code: str, owner: str, repo: str, branch: str = "main", language: str = "java") -> Set[str]:
     """
     Discover dependencies by parsing import/include statements and finding corresponding files in the repository.
     
+    Imports are resolved in memory against the repository path index (one tree
+    call per commit); no file content is downloaded.
+    
     Args:
         source_code: The source code to analyze
         owner: GitHub repository owner
@@ -274,6 +447,42 @@ def discover_dependencies(source_code: str, owner: str, repo: str, branch: str =
     logger.info(f"Discovered {len(dependencies)} dependencies for {language}")
     return dependencies
 
+def _get_repository_index(owner: str, repo: str, branch: str = "main"):
+    """Path index of the repository, or None when the tree cannot be fetched."""
+    import github_tools
+    
+    try:
+        return github_tools.get_repository_index(owner, repo, branch)
+    except Exception as e:
+        logger.warning(f"Repository index unavailable for {owner}/{repo}@{branch}, probing paths instead: {e}")
+        return None
+
+def _probe_repository_path(owner: str, repo: str, branch: str, candidates: List[str]) -> Optional[str]:
+    """Find the first candidate path that can be fetched (fallback when no index is available)."""
+    import github_tools
+    
+    for path in candidates:
+        try:
+            content = github_tools.fetch_github_file_content(owner, repo, path, branch)
+            if not content.startswith("Error"):
+                return path
+        except Exception as e:
+            logger.debug(f"Could not fetch {path}: {e}")
+    return None
+
+def _resolve_repository_path(owner: str, repo: str, branch: str, candidates: List[str], index) -> Optional[str]:
+    """
+    Resolve candidate paths against the repository index.
+    
+    Falls back to probing with real fetches only when there is no index, or when
+    the index is truncated and did not contain any candidate.
+    """
+    if index is not None:
+        path = index.resolve(candidates)
+        if path or not index.truncated:
+            return path
+    return _probe_repository_path(owner, repo, branch, candidates)
+
 def _discover_java_dependencies(java_code: str, owner: str, repo: str, branch: str = "main") -> Set[str]:
     """
     Discover Java dependencies by parsing import statements and finding corresponding files in the repository.
@@ -287,8 +496,6 @@ def _discover_java_dependencies(java_code: str, owner: str, repo: str, branch: s
     Returns:
         Set of file paths that are dependencies of the given Java code
     """
-    import github_tools
-    
     dependencies = set()
     
     # Extract package name from the current file
@@ -302,6 +509,8 @@ def _discover_java_dependencies(java_code: str, owner: str, repo: str, branch: s
     
     logger.info(f"Found {len(imports)} import statements in Java code")
     
+    index = _get_repository_index(owner, repo, branch)
+    
     for is_static, import_path, is_wildcard in imports:
         # Skip standard Java library imports
         if (import_path.startswith('java.') or 
@@ -311,37 +520,37 @@ def _discover_java_dependencies(java_code: str, owner: str, repo: str, branch: s
             
         # Convert package name to potential file path
         if is_wildcard:
-            # For wildcard imports, we need to find all files in that package
+            # For wildcard imports, every file of that package is a dependency
             package_path = import_path.replace('.', '/')
-            # Try to find files in this package directory
-            potential_paths = [
-                f"{package_path}/*.java",
-                f"src/main/java/{package_path}/*.java",
-                f"src/{package_path}/*.java"
-            ]
-        else:
-            # For specific class imports
-            class_name = import_path.split('.')[-1]
-            package_path = '/'.join(import_path.split('.')[:-1])
-            
-            potential_paths = [
-                f"{package_path}/{class_name}.java",
-                f"src/main/java/{package_path}/{class_name}.java", 
-                f"src/{package_path}/{class_name}.java",
-                f"{import_path.replace('.', '/')}.java"
+            package_dirs = [
+                package_path,
+                f"src/main/java/{package_path}",
+                f"src/{package_path}"
             ]
+            if index is not None:
+                for package_dir in package_dirs:
+                    package_files = index.files_in(package_dir, ".java")
+                    if package_files:
+                        dependencies.update(package_files)
+                        logger.info(f"Found {len(package_files)} dependencies in package: {package_dir}")
+                        break
+            continue
         
-        # Try to fetch each potential path
-        for path in potential_paths:
-            try:
-                content = github_tools.fetch_github_file_content(owner, repo, path, branch)
-                if not content.startswith("Error"):
-                    dependencies.add(path)
-                    logger.info(f"Found dependency: {path}")
-                    break
-            except Exception as e:
-                logger.debug(f"Could not fetch {path}: {e}")
-                continue
+        # For specific class imports
+        class_name = import_path.split('.')[-1]
+        package_path = '/'.join(import_path.split('.')[:-1])
+        
+        potential_paths = [
+            f"{package_path}/{class_name}.java",
+            f"src/main/java/{package_path}/{class_name}.java", 
+            f"src/{package_path}/{class_name}.java",
+            f"{import_path.replace('.', '/')}.java"
+        ]
+        
+        path = _resolve_repository_path(owner, repo, branch, potential_paths, index)
+        if path:
+            dependencies.add(path)
+            logger.info(f"Found dependency: {path}")
     
     # Also look for files in the same package
     if current_package:
@@ -362,8 +571,6 @@ def _discover_python_dependencies(python_code: str, owner: str, repo: str, branc
     """
     Discover Python dependencies by parsing import statements.
     """
-    import github_tools
-    
     dependencies = set()
     
     # Extract import statements
@@ -372,6 +579,8 @@ def _discover_python_dependencies(python_code: str, owner: str, repo: str, branc
         r'^\s*from\s+([\w\.]+)\s+import'
     ]
     
+    index = _get_repository_index(owner, repo, branch)
+    
     for pattern in import_patterns:
         imports = re.findall(pattern, python_code, re.MULTILINE)
         for import_path in imports:
@@ -386,16 +595,10 @@ def _discover_python_dependencies(python_code: str, owner: str, repo: str, branc
                 f"{import_path.replace('.', '/')}/__init__.py"
             ]
             
-            for path in potential_paths:
-                try:
-                    content = github_tools.fetch_github_file_content(owner, repo, path, branch)
-                    if not content.startswith("Error"):
-                        dependencies.add(path)
-                        logger.info(f"Found Python dependency: {path}")
-                        break
-                except Exception as e:
-                    logger.debug(f"Could not fetch {path}: {e}")
-                    continue
+            path = _resolve_repository_path(owner, repo, branch, potential_paths, index)
+            if path:
+                dependencies.add(path)
+                logger.info(f"Found Python dependency: {path}")
     
     return dependencies
 
@@ -403,8 +606,6 @@ def _discover_typescript_dependencies(ts_code: str, owner: str, repo: str, branc
     """
     Discover TypeScript/JavaScript dependencies by parsing import statements.
     """
-    import github_tools
-    
     dependencies = set()
     
     # Extract import statements
@@ -413,6 +614,8 @@ def _discover_typescript_dependencies(ts_code: str, owner: str, repo: str, branc
         r'^\s*import\s+[\'"]([^\'"]+)[\'"]'
     ]
     
+    index = _get_repository_index(owner, repo, branch)
+    
     for pattern in import_patterns:
         imports = re.findall(pattern, ts_code, re.MULTILINE)
         for import_path in imports:
@@ -430,19 +633,115 @@ def _discover_typescript_dependencies(ts_code: str, owner: str, repo: str, branc
                 f"src/{import_path}.js"
             ]
             
-            for path in potential_paths:
-                try:
-                    content = github_tools.fetch_github_file_content(owner, repo, path, branch)
-                    if not content.startswith("Error"):
-                        dependencies.add(path)
-                        logger.info(f"Found TypeScript dependency: {path}")
-                        break
-                except Exception as e:
-                    logger.debug(f"Could not fetch {path}: {e}")
-                    continue
+            path = _resolve_repository_path(owner, repo, branch, potential_paths, index)
+            if path:
+                dependencies.add(path)
+                logger.info(f"Found TypeScript dependency: {path}")
     
     return dependencies
 
+# File extensions with dependency discovery support
+DEPENDENCY_LANGUAGES = {
+    'java': 'java',
+    'py': 'python',
+    'ts': 'typescript',
+    'tsx': 'typescript',
+    'js': 'javascript',
+    'jsx': 'javascript'
+}
+
+def _fetch_dependency(owner: str, repo: str, branch: str, path: str) -> Optional[str]:
+    """Fetch one dependency file, returning None if it cannot be read."""
+    import github_tools
+    
+    try:
+        content = github_tools.fetch_github_file_content(owner, repo, path, branch)
+    except Exception as e:
+        logger.warning(f"Could not fetch dependency {path}: {e}")
+        return None
+    if content.startswith("Error"):
+        logger.warning(f"Could not fetch dependency {path}: {content[:200]}")
+        return None
+    return content
+
+def collect_dependency_closure(
+    owner: str,
+    repo: str,
+    branch: str,
+    root_path: str,
+    root_content: str,
+    depth: int = 1,
+    max_files: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    max_concurrency: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """
+    Collect a file and its dependencies by breadth-first search over the import graph.
+    
+    Each level's new dependencies are fetched concurrently; files are deduplicated
+    by path and collection stops at the file-count or byte budget.
+    
+    Args:
+        owner: GitHub repository owner
+        repo: GitHub repository name
+        branch: Branch to search in
+        root_path: Repository path of the starting file
+        root_content: Content of the starting file
+        depth: Number of import levels to follow (1 = direct imports only)
+        max_files: Maximum number of files including the root (default DEPENDENCY_MAX_FILES)
+        max_bytes: Maximum total content size in characters (default DEPENDENCY_MAX_BYTES)
+        max_concurrency: Maximum parallel fetches (default DEPENDENCY_FETCH_CONCURRENCY)
+    
+    Returns:
+        List of {"path", "content"} dicts, root first, then by level and path
+    """
+    max_files = max_files or DEPENDENCY_MAX_FILES
+    max_bytes = max_bytes or DEPENDENCY_MAX_BYTES
+    workers = max(1, max_concurrency or DEPENDENCY_FETCH_CONCURRENCY)
+    
+    files = [{"path": root_path, "content": root_content}]
+    seen = {root_path}
+    total_bytes = len(root_content)
+    frontier = files[:]
+    
+    for level in range(1, depth + 1):
+        # Discovery runs in memory against the repository index
+        candidates = set()
+        for file_info in frontier:
+            language = DEPENDENCY_LANGUAGES.get(file_info["path"].rsplit('.', 1)[-1].lower())
+            if not language:
+                continue
+            candidates.update(discover_dependencies(file_info["content"], owner, repo, branch, language))
+        new_paths = sorted(candidates - seen)[:max_files - len(files)]
+        if not new_paths:
+            break
+        seen.update(new_paths)
+        
+        logger.info(f"Dependency level {level}: fetching {len(new_paths)} files with max {workers} in flight")
+        with ThreadPoolExecutor(max_workers=min(workers, len(new_paths)), thread_name_prefix="dep-fetch") as executor:
+            contents = list(executor.map(lambda path: _fetch_dependency(owner, repo, branch, path), new_paths))
+        
+        frontier = []
+        budget_reached = False
+        for path, content in zip(new_paths, contents):
+            if content is None:
+                continue
+            if total_bytes + len(content) > max_bytes:
+                logger.warning(f"Dependency byte budget ({max_bytes}) reached at {path}")
+                budget_reached = True
+                break
+            total_bytes += len(content)
+            file_info = {"path": path, "content": content}
+            files.append(file_info)
+            frontier.append(file_info)
+        
+        if budget_reached or len(files) >= max_files:
+            logger.info(f"Dependency budget reached at level {level}: {len(files)} files, {total_bytes} chars")
+            break
+    
+    logger.info(f"Collected {len(files)} files ({total_bytes} chars) up to depth {depth}")
+    return files
+
 def find_repository_files_by_pattern(owner: str, repo: str, patterns: List[str], branch: str = "main") -> Set[str]:
     """
     Find files in a GitHub repository matching specific patterns.
@@ -456,13 +755,18 @@ def find_repository_files_by_pattern(owner: str, repo: str, patterns: List[str],
     Returns:
         Set of matching file paths
     """
-    import github_tools
+    found_files = set()
     
-    # This is a simplified implementation
-    # In practice, you'd use GitHub's tree API to get all files
-    # For now, we'll try common patterns
+    index = _get_repository_index(owner, repo, branch)
+    if index is not None:
+        for pattern in patterns:
+            matches = index.find(pattern)
+            found_files.update(matches)
+            logger.info(f"Found {len(matches)} files matching {pattern}")
+        if found_files or not index.truncated:
+            return found_files
     
-    found_files = set()
+    # Without a (complete) index, try common locations
     common_paths = [
         "src/main/java/",
         "src/",
@@ -472,13 +776,9 @@ def find_repository_files_by_pattern(owner: str, repo: str, patterns: List[str],
     for pattern in patterns:
         for base_path in common_paths:
             test_path = f"{base_path}{pattern}" if base_path else pattern
-            try:
-                content = github_tools.fetch_github_file_content(owner, repo, test_path, branch)
-                if not content.startswith("Error"):
-                    found_files.add(test_path)
-                    logger.info(f"Found file: {test_path}")
-            except Exception:
-                continue
+            if _probe_repository_path(owner, repo, branch, [test_path]):
+                found_files.add(test_path)
+                logger.info(f"Found file: {test_path}")
     
     return found_files
 
@@ -563,171 +863,455 @@ def find_target_files(root_dir: str, filename: Optional[str] = None, pattern: Op
     
     return matches
 
-def code_documenter_agent_with_chunking(prompt: str, include_analysis: bool = True) -> str:
+def _extract_chunk_code(result: str) -> str:
+    """Extract the documented code section from a single chunk result."""
+    if "### PART 2: DOCUMENTED CODE" in result:
+        return result.split("### PART 2: DOCUMENTED CODE")[1].strip()
+    if "=== DOCUMENTED CODE ===" in result:
+        return result.split("=== DOCUMENTED CODE ===")[1].strip()
+    return result
+
+def _process_chunk(i: int, chunk: str, total_chunks: int, instruction_part: str,
+                   file_context: str = "", map_reduce: bool = False) -> Tuple[str, Optional[str]]:
+    """
+    Document a single chunk.
+    
+    Args:
+        file_context: Shared file skeleton block prepended to the chunk prompt
+        map_reduce: Ask for compact structured analysis notes (CHUNK_MAP_INSTRUCTION)
+    
+    Returns:
+        Tuple of (documented code or error placeholder, analysis candidate or None)
+    """
+    logger.info(f"Processing chunk {i+1}/{total_chunks} ({len(chunk)} chars)")
+    
+    # Validate chunk is not empty
+    if not chunk or not chunk.strip():
+        logger.warning(f"Chunk {i+1} is empty, skipping...")
+        return f"// Chunk {i+1} was empty", None
+    
+    chunk_prompt = _build_chunk_prompt(i, chunk, total_chunks, instruction_part, file_context, map_reduce)
+    
+    # Validate chunk prompt is not empty
+    if not chunk_prompt or not chunk_prompt.strip():
+        logger.error(f"Chunk {i+1} prompt is empty, skipping...")
+        return f"// Error: Chunk {i+1} prompt was empty", None
+    
+    # Validate chunk prompt size before sending
+    if not prompt_fits(chunk_prompt):
+        logger.error(f"Chunk {i+1} prompt still too large ({len(chunk_prompt)} chars, "
+                     f"{get_token_counter().count(chunk_prompt)} tokens), skipping")
+        return f"// Error: Chunk {i+1} too large to process", None
+    
+    try:
+        # Import the agent function to avoid circular dependency
+        import code_documentation_tool
+        
+        with span("chunk", part=i + 1, total=total_chunks) as chunk_span:
+            chunk_span.add("chars_in", len(chunk_prompt))
+            result = code_documentation_tool.run_documenter_prompt(chunk_prompt)
+            chunk_span.add("chars_out", len(result or ""))
+            chunk_span.error = not result or result.strip().startswith(("Error:", "ERROR:", "WARNING:"))
+        return _chunk_result(i, result)
+    
+    except Exception as e:
+        logger.error(f"Error processing chunk {i+1}: {e}")
+        return f"// Exception in chunk {i+1}: {e}", None
+
+
+def _is_failed_part(documented: str) -> bool:
+    """Whether a chunk or region result is a failure placeholder instead of documented code."""
+    return documented.startswith(("// Error", "// Exception in chunk"))
+
+
+def _partial_result_note(documented: List[str], kind: str) -> str:
+    """
+    Name the chunks (or regions) whose code is missing from a combined result.
+    
+    Failed parts are left out of PART 2, so the note is what marks the result as
+    partial (such results are never cached, see utils/result_cache.py).
+    
+    Returns:
+        The note starting with PARTIAL_RESULT_MARKER, or "" if no part failed
+    """
+    failed = [str(i + 1) for i, doc in enumerate(documented) if _is_failed_part(doc)]
+    if not failed:
+        return ""
+    logger.warning(f"{len(failed)} of {len(documented)} {kind} failed: {', '.join(failed)}")
+    return (f"\n\n{PARTIAL_RESULT_MARKER}{len(failed)} of {len(documented)} {kind} failed "
+            f"({', '.join(failed)}); their code is missing from PART 2.")
+
+
+def prompt_fits(prompt: str) -> bool:
+    """Check a prompt against the token budget (response reserved) and the agent message size limit."""
+    if len(prompt) > AGENT_MESSAGE_MAX_CHARS - AGENT_MESSAGE_SAFETY_CHARS:
+        return False
+    return get_token_counter().count(prompt) <= PROMPT_TOKEN_BUDGET
+
+
+def _budget_measure(token_budget: int, char_budget: int) -> Callable[[str], int]:
+    """
+    Build a size function in token units that also enforces a character budget.
+    
+    Characters are scaled so that ``char_budget`` characters weigh ``token_budget``;
+    a text fits the token budget only if it fits both limits.
+    """
+    counter = get_token_counter()
+    chars_weight = token_budget / max(1, char_budget)
+    return lambda text: max(counter.count(text), math.ceil(len(text) * chars_weight))
+
+
+def _build_chunk_prompt(i: int, chunk: str, total_chunks: int, instruction_part: str, file_context: str = "",
+                        map_reduce: bool = False) -> str:
+    """
+    Build the standalone prompt for one chunk (full instruction for the first chunk, short one after).
+    
+    In map_reduce mode every chunk gets the same compact notes instruction instead.
+    """
+    # Use different instruction templates for first vs subsequent chunks
+    if map_reduce:
+        chunk_prompt = _chunk_map_instruction(i, total_chunks) + chunk
+    elif i == 0:
+        chunk_prompt = f"""{instruction_part}\n{chunk}\n\nNote: This is part {i+1} of {total_chunks} of a larger file. Please provide comprehensive analysis for this first part."""
+    else:
+        chunk_prompt = f"""{CHUNK_INSTRUCTION}\n{chunk}\n\nNote: This is part {i+1} of {total_chunks} of a larger file. Focus on documenting this code section."""
+    
+    if file_context:
+        chunk_prompt = f"{file_context}\n{chunk_prompt}"
+    return chunk_prompt
+
+
+def _build_thread_prompts(chunks: List[str], instruction_part: str, file_context: str = "",
+                          map_reduce: bool = False) -> List[str]:
+    """
+    Build the messages for documenting all chunks in one agent thread.
+    
+    Only the first message carries the instruction block and the file skeleton;
+    later messages refer back to it and carry just their chunk (in map_reduce mode
+    they repeat the short notes instruction so every turn returns notes).
+    """
+    prompts = [_build_chunk_prompt(0, chunks[0], len(chunks), instruction_part, file_context, map_reduce)]
+    for i, chunk in enumerate(chunks[1:], start=1):
+        if map_reduce:
+            prompts.append(_chunk_map_instruction(i, len(chunks)) + chunk)
+        else:
+            prompts.append(THREAD_CHUNK_INSTRUCTION.format(part=i + 1, total=len(chunks)) + chunk)
+    return prompts
+
+
+def _chunk_map_instruction(i: int, total_chunks: int) -> str:
+    """Instruction asking for chunk ``i`` to be documented with compact analysis notes."""
+    # Roughly 0.75 words per token
+    return CHUNK_MAP_INSTRUCTION.format(part=i + 1, total=total_chunks, max_words=CHUNK_NOTES_MAX_TOKENS * 3 // 4)
+
+
+def _extract_chunk_analysis(result: str) -> str:
+    """Get the PART 1 text of an agent response (empty if it has none)."""
+    if "### PART 1: COMPREHENSIVE ANALYSIS" in result:
+        return result.split("### PART 2: DOCUMENTED CODE")[0].replace("### PART 1: COMPREHENSIVE ANALYSIS", "").strip()
+    elif "### PART 1: CHUNK ANALYSIS" in result:
+        return result.split("### PART 2: DOCUMENTED CODE")[0].replace("### PART 1: CHUNK ANALYSIS", "").strip()
+    elif "=== ANALYSIS ===" in result:
+        return result.split("=== DOCUMENTED CODE ===")[0].replace("=== ANALYSIS ===", "").strip()
+    return ""
+
+
+def _format_chunk_notes(notes: List[Tuple[str, str]]) -> str:
+    """Render (label, notes) pairs as the body of a reduce prompt."""
+    return "\n".join(f"#### {label}\n{text}\n" for label, text in notes)
+
+
+def synthesize_chunk_analyses(notes: List[str], instruction_part: str = ANALYSIS_INSTRUCTION,
+                              file_context: str = "", max_concurrency: Optional[int] = None) -> str:
+    """
+    Reduce step of map_reduce analysis: merge per-chunk notes into one full report.
+    
+    If all notes fit one prompt a single agent call writes the report. Otherwise
+    consecutive notes are first merged group by group (groups run concurrently)
+    until they fit, so every call stays within PROMPT_TOKEN_BUDGET.
+    
+    Args:
+        notes: Analysis notes of each chunk, in file order ("" for chunks without notes)
+        instruction_part: Instruction defining the report format (its PART 2 section is ignored)
+        file_context: Optional shared file skeleton block
+        max_concurrency: Max merge calls in flight (default CHUNK_MAX_CONCURRENCY)
+    
+    Returns:
+        The merged analysis without its "### PART 1" heading, or "" if synthesis failed
+    """
+    import code_documentation_tool
+    
+    counter = get_token_counter()
+    total = len(notes)
+    labelled = [
+        (f"Part {i + 1} of {total}", counter.truncate(text, CHUNK_NOTES_MAX_TOKENS))
+        for i, text in enumerate(notes) if text.strip()
+    ]
+    if not labelled:
+        return ""
+    
+    report_format = instruction_part.split("### PART 2")[0].replace("## Code to Analyze:", "").strip()
+    reduce_header = REDUCE_ANALYSIS_INSTRUCTION.format(total=total, report_format=report_format, file_context=file_context)
+    merge_header = MERGE_ANALYSIS_INSTRUCTION.format(max_words=CHUNK_NOTES_MAX_TOKENS * 3 // 4)
+    
+    def merge(group: List[Tuple[str, str]]) -> Tuple[str, str]:
+        label = f"{group[0][0].split(' of ')[0]} to {group[-1][0]}"
+        result = code_documentation_tool.run_documenter_prompt(merge_header + _format_chunk_notes(group))
+        merged = _extract_chunk_analysis(result or "") or (result or "").strip()
+        if not merged or merged.startswith(("Error", "ERROR", "WARNING")):
+            # Keep the original notes (trimmed) rather than losing this part of the file
+            merged = counter.truncate(_format_chunk_notes(group), CHUNK_NOTES_MAX_TOKENS)
+        return label, counter.truncate(merged, CHUNK_NOTES_MAX_TOKENS)
+    
+    # Merge consecutive notes until they fit the final reduce prompt
+    available = PROMPT_TOKEN_BUDGET - max(counter.count(reduce_header), counter.count(merge_header))
+    while counter.count(_format_chunk_notes(labelled)) > available and len(labelled) > 1:
+        groups, current, current_tokens = [], [], 0
+        for item in labelled:
+            item_tokens = counter.count(_format_chunk_notes([item]))
+            if current and current_tokens + item_tokens > available:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += item_tokens
+        groups.append(current)
+        if len(groups) == len(labelled):
+            # Every note fills a prompt on its own; pair them up so the loop makes progress
+            groups = [labelled[j:j + 2] for j in range(0, len(labelled), 2)]
+        logger.info(f"Merging {len(labelled)} chunk analyses in {len(groups)} groups")
+        workers = max(1, min(max_concurrency or CHUNK_MAX_CONCURRENCY, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-merge") as executor:
+            labelled = list(executor.map(merge, groups))
+    
+    logger.info(f"Synthesizing file analysis from {len(labelled)} chunk analyses")
+    result = code_documentation_tool.run_documenter_prompt(reduce_header + _format_chunk_notes(labelled))
+    if not result or result.strip().startswith(("Error", "ERROR", "WARNING")):
+        logger.error(f"Analysis synthesis failed: {(result or 'empty result')[:200]}")
+        return ""
+    return _extract_chunk_analysis(result) or result.strip()
+
+
+def _split_instruction(prompt: str) -> Tuple[str, str]:
+    """Split a prompt into its instruction part (up to "## Code to Analyze:") and its code part."""
+    code_start = prompt.find("## Code to Analyze:")
+    if code_start != -1:
+        instruction_part = prompt[:code_start + len("## Code to Analyze:\n")]
+        code_part = prompt[code_start + len("## Code to Analyze:\n"):]
+        logger.info(f"Found code section marker. Instruction part: {len(instruction_part)} chars, Code part: {len(code_part)} chars")
+    else:
+        instruction_part = ANALYSIS_INSTRUCTION
+        code_part = prompt
+        logger.info(f"No code section marker found. Using full prompt as code part: {len(code_part)} chars")
+    return instruction_part, code_part
+
+
+def _chunk_result(i: int, result: str) -> Tuple[str, Optional[str]]:
+    """
+    Turn the agent response for chunk ``i`` into (documented code or error placeholder, analysis candidate or None).
+    """
+    if not result:
+        logger.error(f"Chunk {i+1} failed: Empty result")
+        return f"// Error processing chunk {i+1}: Empty result", None
+    
+    # Check if result is an actual error message (starts with "Error:", or an agent client error)
+    if result.strip().startswith(("Error:", "ERROR:", "WARNING:")):
+        logger.error(f"Chunk {i+1} failed: {result}")
+        return f"// Error processing chunk {i+1}: {result}", None
+    
+    # First chunk should contain analysis; later chunks are a fallback in case it failed
+    analysis = None
+    if i == 0 or "ANALYSIS" in result.upper() or "### PART 1:" in result:
+        analysis = result
+    
+    return _extract_chunk_code(result), analysis
+
+def code_documenter_agent_with_chunking(prompt: str, include_analysis: bool = True, max_concurrency: Optional[int] = None,
+                                        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                        shared_thread: Optional[bool] = None,
+                                        analysis_mode: Optional[str] = None,
+                                        strategy: Optional[str] = None,
+                                        language: Optional[str] = None) -> str:
     """
     Enhanced version that handles long content by chunking.
+    
+    With ``strategy`` (default LARGE_FILE_STRATEGY) HIERARCHICAL, prompts above
+    LARGE_FILE_THRESHOLD_TOKENS are documented by code_documenter_agent_hierarchical()
+    instead of flat chunks; smaller prompts take the CHUNK path.
+    
+    Chunks are documented concurrently (at most ``max_concurrency`` in flight,
+    default CHUNK_MAX_CONCURRENCY) and recombined in their original order.
+    
+    With ``shared_thread`` (default CHUNK_SHARED_THREAD) all chunks are sent as
+    consecutive messages of one agent thread instead: the instruction block and
+    skeleton are sent once, but chunks run one after another and every run also
+    reads the earlier chunks and answers kept in the thread.
+    
+    With ``analysis_mode`` "map_reduce" (default CHUNK_ANALYSIS_MODE) every chunk
+    returns compact structured notes and synthesize_chunk_analyses() merges them
+    into the full report; with "first" the first chunk's analysis is used as is.
+    
+    Args:
+        progress_callback: Called with a "chunk_documented" event (chunk, completed,
+                           total, documented code) as each chunk finishes, so callers
+                           can stream partial results before the whole file is done
+        language: Source language for the hierarchical split; guessed when omitted
     """
-    # Azure OpenAI API limit is 256,000 characters
-    API_LIMIT = 256000
-    # Buffer for additional prompt text and safety margin
-    SAFETY_BUFFER = 5000
-    
-    if len(prompt) > API_LIMIT - SAFETY_BUFFER:
-        logger.warning(f"Content too long ({len(prompt)} chars), implementing chunking strategy...")
-        logger.info(f"API limit: {API_LIMIT}, Safety buffer: {SAFETY_BUFFER}, Threshold: {API_LIMIT - SAFETY_BUFFER}")
+    # Room for the "Note: This is part i of n" line appended to every chunk prompt
+    CHUNK_NOTE_TOKENS = 64
+    CHUNK_NOTE_CHARS = 200
+    
+    if ((strategy or LARGE_FILE_STRATEGY) == LargeFileStrategy.HIERARCHICAL
+            and get_token_counter().count(prompt) > LARGE_FILE_THRESHOLD_TOKENS):
+        logger.info(f"Prompt above {LARGE_FILE_THRESHOLD_TOKENS} tokens, using the hierarchical strategy")
+        return code_documenter_agent_hierarchical(prompt, language=language, max_concurrency=max_concurrency)
+    
+    if not prompt_fits(prompt):
+        counter = get_token_counter()
+        prompt_tokens = counter.count(prompt)
+        logger.warning(f"Content too long ({len(prompt)} chars, {prompt_tokens} tokens), implementing chunking strategy...")
+        logger.info(f"Prompt budget: {PROMPT_TOKEN_BUDGET} tokens ({RESPONSE_RESERVED_TOKENS} reserved for the response "
+                    f"of a {MODEL_CONTEXT_TOKENS} token context), message limit: {AGENT_MESSAGE_MAX_CHARS} chars")
         
         # Extract instruction and code parts
-        code_start = prompt.find("## Code to Analyze:")
-        if code_start != -1:
-            instruction_part = prompt[:code_start + len("## Code to Analyze:\n")]
-            code_part = prompt[code_start + len("## Code to Analyze:\n"):]
-            logger.info(f"Found code section marker. Instruction part: {len(instruction_part)} chars, Code part: {len(code_part)} chars")
-        else:
-            instruction_part = ANALYSIS_INSTRUCTION
-            code_part = prompt
-            logger.info(f"No code section marker found. Using full prompt as code part: {len(code_part)} chars")
+        instruction_part, code_part = _split_instruction(prompt)
+        
+        map_reduce = (analysis_mode or CHUNK_ANALYSIS_MODE) == "map_reduce"
+        
+        # Build the shared file skeleton once; every chunk prompt carries it
+        skeleton = create_file_skeleton(code_part)
+        file_context = ""
+        if skeleton:
+            file_context = FILE_SKELETON_INSTRUCTION.format(total_chunks="all", skeleton=skeleton)
+            logger.info(f"Shared file skeleton: {len(skeleton)} chars")
         
-        # Calculate max chunk size accounting for instruction templates
+        # Calculate the code budget of each chunk accounting for instruction templates and the skeleton
         # First chunk uses full analysis instruction, subsequent chunks use shorter instruction
-        first_chunk_instruction_size = len(instruction_part)
-        subsequent_chunk_instruction_size = len(CHUNK_INSTRUCTION)
+        context_tokens = counter.count(file_context) + CHUNK_NOTE_TOKENS
+        context_chars = len(file_context) + CHUNK_NOTE_CHARS
+        message_chars = AGENT_MESSAGE_MAX_CHARS - AGENT_MESSAGE_SAFETY_CHARS
+        first_instruction = _chunk_map_instruction(0, 999) if map_reduce else instruction_part
+        subsequent_instruction = _chunk_map_instruction(0, 999) if map_reduce else CHUNK_INSTRUCTION
+        first_chunk_max_tokens = PROMPT_TOKEN_BUDGET - counter.count(first_instruction) - context_tokens
+        subsequent_chunk_max_tokens = PROMPT_TOKEN_BUDGET - counter.count(subsequent_instruction) - context_tokens
+        first_chunk_max_chars = message_chars - len(first_instruction) - context_chars
+        subsequent_chunk_max_chars = message_chars - len(subsequent_instruction) - context_chars
         
-        # Calculate chunk sizes with proper overhead accounting
-        first_chunk_max_size = API_LIMIT - first_chunk_instruction_size - SAFETY_BUFFER
-        subsequent_chunk_max_size = API_LIMIT - subsequent_chunk_instruction_size - SAFETY_BUFFER
+        # Chunks are measured in tokens; the character limit is folded into the same measure
+        measure = _budget_measure(subsequent_chunk_max_tokens, subsequent_chunk_max_chars)
+        first_chunk_budget = min(
+            first_chunk_max_tokens,
+            int(first_chunk_max_chars * subsequent_chunk_max_tokens / max(1, subsequent_chunk_max_chars))
+        )
         
-        logger.info(f"First chunk max size: {first_chunk_max_size}, Subsequent chunks max size: {subsequent_chunk_max_size}")
+        logger.info(f"First chunk max size: {first_chunk_max_tokens} tokens / {first_chunk_max_chars} chars, "
+                    f"Subsequent chunks max size: {subsequent_chunk_max_tokens} tokens / {subsequent_chunk_max_chars} chars")
         
-        # Split the code into chunks
-        chunks = []
-        if len(code_part) <= first_chunk_max_size:
-            chunks = [code_part]
-        else:
-            # Create first chunk
-            first_chunk = code_part[:first_chunk_max_size]
-            # Find a good breaking point for the first chunk
-            last_newline = first_chunk.rfind('\n')
-            if last_newline > first_chunk_max_size * 0.8:  # If newline is in last 20%, use it
-                first_chunk = first_chunk[:last_newline]
-                remaining_code = code_part[last_newline + 1:]
-            else:
-                remaining_code = code_part[first_chunk_max_size:]
-            
-            chunks.append(first_chunk)
-            
-            # Split remaining code for subsequent chunks
-            remaining_chunks = split_code_intelligently(remaining_code, subsequent_chunk_max_size)
-            chunks.extend(remaining_chunks)
+        # Split the code into chunks on class/function/method boundaries
+        with span("chunking") as chunking_span:
+            chunks = split_code_intelligently(
+                code_part,
+                subsequent_chunk_max_tokens,
+                first_chunk_size=first_chunk_budget,
+                measure=measure
+            )
+            chunking_span.add("chars_in", len(code_part))
+            chunking_span.add("tokens_in", prompt_tokens)
+            chunking_span.add("chunks", len(chunks))
         
         logger.info(f"Split into {len(chunks)} chunks")
+        if skeleton:
+            file_context = FILE_SKELETON_INSTRUCTION.format(total_chunks=len(chunks), skeleton=skeleton)
         
-        all_analyses = []
-        all_documented_code = []
+        # Dispatch chunks with bounded concurrency; results are stitched back by index
+        use_shared_thread = (CHUNK_SHARED_THREAD if shared_thread is None else shared_thread) and len(chunks) > 1
+        workers = 1 if use_shared_thread else max(1, min(max_concurrency or CHUNK_MAX_CONCURRENCY, len(chunks)))
+        logger.info(f"Dispatching {len(chunks)} chunks with max {workers} in flight"
+                    f"{' in one agent thread' if use_shared_thread else ''}")
         
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-            
-            # Validate chunk is not empty
-            if not chunk or not chunk.strip():
-                logger.warning(f"Chunk {i+1} is empty, skipping...")
-                all_documented_code.append(f"// Chunk {i+1} was empty")
-                continue
-            
-            # Use different instruction templates for first vs subsequent chunks
-            if i == 0:
-                chunk_prompt = f"""{instruction_part}\n{chunk}\n\nNote: This is part {i+1} of {len(chunks)} of a larger file. Please provide comprehensive analysis for this first part."""
-            else:
-                chunk_prompt = f"""{CHUNK_INSTRUCTION}\n{chunk}\n\nNote: This is part {i+1} of {len(chunks)} of a larger file. Focus on documenting this code section."""
-            
-            # Validate chunk prompt is not empty
-            if not chunk_prompt or not chunk_prompt.strip():
-                logger.error(f"Chunk {i+1} prompt is empty, skipping...")
-                all_documented_code.append(f"// Error: Chunk {i+1} prompt was empty")
-                continue
-            
-            # Validate chunk prompt size before sending
-            if len(chunk_prompt) > API_LIMIT - 1000:  # Small buffer for response
-                logger.error(f"Chunk {i+1} prompt still too large ({len(chunk_prompt)} chars), skipping")
-                all_documented_code.append(f"// Error: Chunk {i+1} too large to process")
-                continue
-            
+        chunk_results: List[Tuple[str, Optional[str]]] = [("", None)] * len(chunks)
+        completed_chunks = 0
+        
+        def report_chunk(i: int):
+            if not progress_callback:
+                return
             try:
-                # Import the agent function to avoid circular dependency
-                import code_documentation_tool
-                
-                result = code_documentation_tool.code_documenter_agent(chunk_prompt, include_analysis=(i == 0))
-                if not result:
-                    logger.error(f"Chunk {i+1} failed: Empty result")
-                    all_documented_code.append(f"// Error processing chunk {i+1}: Empty result")
-                    continue
-                
-                # Check if result is an actual error message (starts with "Error:")
-                if result.strip().startswith("Error:"):
-                    logger.error(f"Chunk {i+1} failed: {result}")
-                    all_documented_code.append(f"// Error processing chunk {i+1}: {result}")
-                    continue
-                
-                # Parse result for first chunk to get analysis, but also handle subsequent chunks
-                if i == 0:
-                    # First chunk should contain analysis
-                    all_analyses.append(result)
-                    # Extract documented code from first chunk
-                    if "### PART 2: DOCUMENTED CODE" in result:
-                        doc_code = result.split("### PART 2: DOCUMENTED CODE")[1].strip()
-                        all_documented_code.append(doc_code)
-                    else:
-                        # Fallback parsing
-                        if "=== DOCUMENTED CODE ===" in result:
-                            doc_code = result.split("=== DOCUMENTED CODE ===")[1].strip()
-                            all_documented_code.append(doc_code)
-                        else:
-                            all_documented_code.append(result)
-                else:
-                    # For subsequent chunks, check if they contain analysis (in case first chunk failed)
-                    if not all_analyses and ("ANALYSIS" in result.upper() or "### PART 1:" in result):
-                        logger.info(f"Found analysis in chunk {i+1} (first chunk may have failed)")
-                        all_analyses.append(result)
-                    
-                    # Extract documented code from subsequent chunks
-                    if "### PART 2: DOCUMENTED CODE" in result:
-                        doc_code = result.split("### PART 2: DOCUMENTED CODE")[1].strip()
-                        all_documented_code.append(doc_code)
-                    elif "=== DOCUMENTED CODE ===" in result:
-                        doc_code = result.split("=== DOCUMENTED CODE ===")[1].strip()
-                        all_documented_code.append(doc_code)
-                    else:
-                        all_documented_code.append(result)
-                        
+                progress_callback({
+                    "event": "chunk_documented",
+                    "chunk": i + 1,
+                    "completed": completed_chunks,
+                    "total": len(chunks),
+                    "documented_code": chunk_results[i][0]
+                })
             except Exception as e:
-                logger.error(f"Error processing chunk {i+1}: {e}")
-                all_documented_code.append(f"// Exception in chunk {i+1}: {e}")
-                continue
+                logger.warning(f"Chunk progress callback failed: {e}")
+        
+        if use_shared_thread:
+            import code_documentation_tool
+            
+            def on_response(i: int, result: str):
+                nonlocal completed_chunks
+                chunk_results[i] = _chunk_result(i, result)
+                completed_chunks += 1
+                report_chunk(i)
+            
+            prompts = _build_thread_prompts(chunks, instruction_part, file_context, map_reduce)
+            responses = code_documentation_tool.code_documenter_agent_thread(prompts, on_response=on_response)
+            # Turns skipped after a failed turn never reached on_response
+            for i in range(completed_chunks, len(chunks)):
+                chunk_results[i] = _chunk_result(i, responses[i])
+        elif workers == 1:
+            for i, chunk in enumerate(chunks):
+                chunk_results[i] = _process_chunk(i, chunk, len(chunks), instruction_part, file_context, map_reduce)
+                completed_chunks += 1
+                report_chunk(i)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-chunk") as executor:
+                futures = {
+                    executor.submit(_process_chunk, i, chunk, len(chunks), instruction_part, file_context, map_reduce): i
+                    for i, chunk in enumerate(chunks)
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        chunk_results[i] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error processing chunk {i+1}: {e}")
+                        chunk_results[i] = (f"// Exception in chunk {i+1}: {e}", None)
+                    completed_chunks += 1
+                    report_chunk(i)
+        
+        # Keep the original chunk order; the first chunk that produced analysis wins
+        all_documented_code = [doc_code for doc_code, _ in chunk_results]
+        all_analyses = [analysis for _, analysis in chunk_results if analysis][:1]
         
         # Combine results
-        if all_documented_code and any(doc.strip() and not doc.startswith("// Error") for doc in all_documented_code):
+        if all_documented_code and any(doc.strip() and not _is_failed_part(doc) for doc in all_documented_code):
             # Extract analysis if available
             analysis = ""
-            if all_analyses:
-                first_result = all_analyses[0]
-                if "### PART 1: COMPREHENSIVE ANALYSIS" in first_result:
-                    analysis = first_result.split("### PART 2: DOCUMENTED CODE")[0].replace("### PART 1: COMPREHENSIVE ANALYSIS", "").strip()
-                elif "### PART 1: CHUNK ANALYSIS" in first_result:
-                    analysis = first_result.split("### PART 2: DOCUMENTED CODE")[0].replace("### PART 1: CHUNK ANALYSIS", "").strip()
-                elif "=== ANALYSIS ===" in first_result:
-                    analysis = first_result.split("=== DOCUMENTED CODE ===")[0].replace("=== ANALYSIS ===", "").strip()
+            if map_reduce:
+                notes = [_extract_chunk_analysis(result) if result else "" for _, result in chunk_results]
+                analysis = synthesize_chunk_analyses(notes, instruction_part, file_context, max_concurrency)
+                if not analysis and any(notes):
+                    # Synthesis failed: keep the per-chunk notes instead of dropping them
+                    analysis = _format_chunk_notes(
+                        [(f"Part {i + 1} of {len(notes)}", text) for i, text in enumerate(notes) if text]
+                    )
+            elif all_analyses:
+                analysis = _extract_chunk_analysis(all_analyses[0])
             
             if not analysis:
-                analysis = f"Analysis completed for {len(chunks)} chunks."
+                analysis = f"{FALLBACK_ANALYSIS_PREFIX}{len(chunks)} chunks."
             
             # Combine all documented code parts
-            valid_code_parts = [doc for doc in all_documented_code if doc.strip() and not doc.startswith("// Error")]
+            valid_code_parts = [doc for doc in all_documented_code if doc.strip() and not _is_failed_part(doc)]
             combined_documented_code = '\n\n'.join(valid_code_parts)
+            partial_note = _partial_result_note(all_documented_code, "chunks")
             
             combined_result = f"""### PART 1: COMPREHENSIVE ANALYSIS
 
 {analysis}
 
-Note: This file was processed in {len(chunks)} chunks due to size constraints.
+Note: This file was processed in {len(chunks)} chunks due to size constraints.{partial_note}
 
 ### PART 2: DOCUMENTED CODE
 
@@ -743,7 +1327,208 @@ Note: This file was processed in {len(chunks)} chunks due to size constraints.
         logger.info(f"Prompt size ({len(prompt)} chars) is within limits, using standard agent")
         # Import the agent function to avoid circular dependency
         import code_documentation_tool
-        return code_documentation_tool.code_documenter_agent(prompt, include_analysis)
+        # Sent as is: the prompt already carries its instructions (code_documenter_agent would add them again)
+        return code_documentation_tool.run_documenter_prompt(prompt)
+
+def _hierarchy_calls(regions: int, fanout: int) -> int:
+    """Agent calls of a hierarchical run: region summaries, merges, region documentation and the report."""
+    calls, nodes = 2 * regions + 1, regions
+    while nodes > 1:
+        nodes = math.ceil(nodes / fanout)
+        calls += nodes
+    return calls
+
+
+def _hierarchy_fanout(regions: int, max_fanout: int, max_calls: int = HIERARCHY_MAX_CALLS) -> int:
+    """
+    Pick the fanout of the summary tree.
+    
+    HIERARCHY_FANOUT is used unless it exceeds ``max_calls``; the fanout then grows
+    (fewer merge calls, shallower tree) until the run fits or the tree is one level deep.
+    """
+    fanout = max(2, min(HIERARCHY_FANOUT, max_fanout))
+    if max_calls:
+        while fanout < min(regions, max_fanout) and _hierarchy_calls(regions, fanout) > max_calls:
+            fanout += 1
+    return fanout
+
+
+def _hierarchy_context(chain: List[Tuple[str, str]], max_tokens: int = HIERARCHY_CONTEXT_MAX_TOKENS) -> str:
+    """
+    Render the ancestor summaries of a region, whole file first.
+    
+    If the chain is longer than ``max_tokens``, the whole-file summary and the nearest
+    ancestors are kept and the levels in between are dropped.
+    """
+    if not chain:
+        return ""
+    counter = get_token_counter()
+    kept = [chain[0]]
+    budget = max_tokens - counter.count(_format_chunk_notes(kept))
+    for node in reversed(chain[1:]):
+        node_tokens = counter.count(_format_chunk_notes([node]))
+        if node_tokens > budget:
+            break
+        kept.insert(1, node)
+        budget -= node_tokens
+    return HIERARCHY_CONTEXT_INSTRUCTION.format(summaries=_format_chunk_notes(kept))
+
+
+def code_documenter_agent_hierarchical(prompt: str, language: Optional[str] = None,
+                                       max_concurrency: Optional[int] = None,
+                                       max_calls: Optional[int] = None) -> str:
+    """
+    Document a large file with the HIERARCHICAL strategy.
+    
+    1. The code is split into regions of at most HIERARCHY_REGION_MAX_TOKENS on
+       class/function boundaries.
+    2. Every region is summarized into compact notes (short answers, run concurrently),
+       then summaries are merged HIERARCHY_FANOUT at a time, level by level, up to one
+       summary of the whole file.
+    3. Every region is documented with the summaries of its ancestors as context, and
+       one reduce call turns the top level of the tree into the full analysis.
+    
+    Region prompts hold one region plus at most HIERARCHY_CONTEXT_MAX_TOKENS of summaries,
+    so their size does not grow with the file; only the depth of the tree does.
+    
+    Args:
+        prompt: Instruction and code (split at "## Code to Analyze:" like chunking)
+        language: Source language for splitting and fallback summaries; guessed when omitted
+        max_concurrency: Max agent calls in flight (default CHUNK_MAX_CONCURRENCY)
+        max_calls: Agent call budget (default HIERARCHY_MAX_CALLS, 0 = unlimited)
+    
+    Returns:
+        Combined result with "### PART 1: COMPREHENSIVE ANALYSIS" and "### PART 2: DOCUMENTED CODE",
+        or an error message
+    """
+    import code_documentation_tool
+    
+    # Room for the "Note: This is part i of n" line and the context heading
+    REGION_NOTE_TOKENS = 64
+    REGION_NOTE_CHARS = 200
+    
+    counter = get_token_counter()
+    instruction_part, code_part = _split_instruction(prompt)
+    max_calls = HIERARCHY_MAX_CALLS if max_calls is None else max_calls
+    summary_words = HIERARCHY_SUMMARY_MAX_TOKENS * 3 // 4
+    merge_header = MERGE_ANALYSIS_INSTRUCTION.format(max_words=summary_words)
+    
+    # Region budget: one region plus the capped ancestor context must fit a prompt
+    # (the context is reserved at about 4 characters per token)
+    region_instruction = HIERARCHY_REGION_INSTRUCTION.format(part=999, total=999)
+    context_tokens = counter.count(HIERARCHY_CONTEXT_INSTRUCTION) + HIERARCHY_CONTEXT_MAX_TOKENS + REGION_NOTE_TOKENS
+    context_chars = len(HIERARCHY_CONTEXT_INSTRUCTION) + HIERARCHY_CONTEXT_MAX_TOKENS * 4 + REGION_NOTE_CHARS
+    max_region_tokens = PROMPT_TOKEN_BUDGET - counter.count(region_instruction) - context_tokens
+    max_region_chars = AGENT_MESSAGE_MAX_CHARS - AGENT_MESSAGE_SAFETY_CHARS - len(region_instruction) - context_chars
+    measure = _budget_measure(max_region_tokens, max_region_chars)
+    max_fanout = max(2, (PROMPT_TOKEN_BUDGET - counter.count(merge_header)) // (HIERARCHY_SUMMARY_MAX_TOKENS + 16))
+    
+    # Split into regions; if the call budget is still exceeded with the widest tree, grow the regions
+    region_tokens = min(HIERARCHY_REGION_MAX_TOKENS, max_region_tokens)
+    with span("chunking") as chunking_span:
+        while True:
+            regions = split_code_intelligently(code_part, region_tokens, language, measure=measure)
+            fanout = _hierarchy_fanout(len(regions), max_fanout, max_calls)
+            calls = _hierarchy_calls(len(regions), fanout)
+            if not max_calls or calls <= max_calls or region_tokens >= max_region_tokens:
+                break
+            region_tokens = min(max_region_tokens, region_tokens * 2)
+        chunking_span.add("chars_in", len(code_part))
+        chunking_span.add("chunks", len(regions))
+    
+    total = len(regions)
+    if total == 1:
+        logger.info("File fits one region, documenting it directly")
+        return code_documenter_agent_with_chunking(prompt, include_analysis=True, max_concurrency=max_concurrency,
+                                                   strategy=LargeFileStrategy.CHUNK)
+    if max_calls and calls > max_calls:
+        logger.warning(f"Hierarchical documentation needs {calls} agent calls, more than the budget of {max_calls}")
+    logger.info(f"Hierarchical documentation: {total} regions of up to {region_tokens} tokens, fanout {fanout}, "
+                f"{calls} agent calls")
+    
+    workers = max(1, min(max_concurrency or CHUNK_MAX_CONCURRENCY, total))
+    
+    def failed(result: Optional[str]) -> bool:
+        return not result or result.strip().startswith(("Error", "ERROR", "WARNING"))
+    
+    def summarize(i: int) -> str:
+        summary_prompt = REGION_SUMMARY_INSTRUCTION.format(part=i + 1, total=total, max_words=summary_words) + regions[i]
+        result = code_documentation_tool.run_documenter_prompt(summary_prompt)
+        summary = "" if failed(result) else _extract_chunk_analysis(result) or result.strip()
+        if not summary:
+            # Keep a structural outline of the region rather than an empty node
+            logger.warning(f"Summary of region {i+1} failed, using its outline")
+            summary = create_code_summary(regions[i], language=language, max_tokens=HIERARCHY_SUMMARY_MAX_TOKENS)
+        return counter.truncate(summary, HIERARCHY_SUMMARY_MAX_TOKENS)
+    
+    def merge(group: List[Tuple[str, str]]) -> str:
+        result = code_documentation_tool.run_documenter_prompt(merge_header + _format_chunk_notes(group))
+        merged = "" if failed(result) else _extract_chunk_analysis(result) or result.strip()
+        if not merged:
+            merged = _format_chunk_notes(group)
+        return counter.truncate(merged, HIERARCHY_SUMMARY_MAX_TOKENS)
+    
+    def label(level: int, j: int) -> str:
+        first, last = j * fanout ** level + 1, min(total, (j + 1) * fanout ** level)
+        return f"Part {first} of {total}" if first == last else f"Parts {first}-{last} of {total}"
+    
+    with span("hierarchy", regions=total, fanout=fanout) as hierarchy_span:
+        # Summary tree, bottom-up: levels[k][j] covers regions j * fanout**k onwards
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-summary") as executor:
+            levels = [[(label(0, i), text) for i, text in enumerate(executor.map(summarize, range(total)))]]
+            while len(levels[-1]) > 1:
+                groups = [levels[-1][j:j + fanout] for j in range(0, len(levels[-1]), fanout)]
+                level = len(levels)
+                levels.append([(label(level, j), text) for j, text in enumerate(executor.map(merge, groups))])
+        levels[-1] = [("Whole file", levels[-1][0][1])]
+        logger.info(f"Built summary tree: {len(levels)} levels over {total} regions")
+        hierarchy_span.add("levels", len(levels))
+        
+        def document(i: int) -> str:
+            chain = [levels[k][i // fanout ** k] for k in range(len(levels) - 1, 0, -1)]
+            region_prompt = (f"{_hierarchy_context(chain)}\n"
+                             f"{HIERARCHY_REGION_INSTRUCTION.format(part=i + 1, total=total)}{regions[i]}"
+                             f"\n\nNote: This is part {i+1} of {total} of a larger file.")
+            if not prompt_fits(region_prompt):
+                logger.error(f"Region {i+1} prompt too large ({len(region_prompt)} chars), skipping")
+                return f"// Error: Region {i+1} too large to process"
+            with span("chunk", part=i + 1, total=total) as chunk_span:
+                chunk_span.add("chars_in", len(region_prompt))
+                result = code_documentation_tool.run_documenter_prompt(region_prompt)
+                chunk_span.add("chars_out", len(result or ""))
+                chunk_span.error = failed(result)
+            return _chunk_result(i, result)[0]
+        
+        # Region documentation and the report run side by side; the report reads the level below the root
+        with ThreadPoolExecutor(max_workers=workers + 1, thread_name_prefix="doc-region") as executor:
+            report = executor.submit(
+                synthesize_chunk_analyses, [text for _, text in levels[-2]], instruction_part, "", max_concurrency
+            )
+            documented = list(executor.map(document, range(total)))
+            analysis = report.result()
+    
+    valid_code_parts = [doc for doc in documented if doc.strip() and not _is_failed_part(doc)]
+    if not valid_code_parts:
+        error_msg = f"Failed to process large file - no valid documented code generated from {total} regions"
+        logger.error(error_msg)
+        return f"Error: {error_msg}"
+    
+    if not analysis:
+        # Synthesis failed: the whole-file summary is the best analysis left
+        analysis = levels[-1][0][1] or f"{FALLBACK_ANALYSIS_PREFIX}{total} regions."
+    
+    combined_documented_code = '\n\n'.join(valid_code_parts)
+    partial_note = _partial_result_note(documented, "regions")
+    logger.info(f"Successfully combined results from {len(valid_code_parts)} regions")
+    return f"""### PART 1: COMPREHENSIVE ANALYSIS
+
+{analysis}
+
+Note: This file was processed in {total} regions ({len(levels)} summary levels) due to size constraints.{partial_note}
+
+### PART 2: DOCUMENTED CODE
+
+{combined_documented_code}"""
 
 def process_large_file(prompt: str, original_path: Optional[str] = None) -> Tuple[str, str]:
     """
@@ -751,12 +1536,14 @@ def process_large_file(prompt: str, original_path: Optional[str] = None) -> Tupl
     Returns tuple of (analysis, documented_code)
     """
     operation = detect_operation_type(prompt)
+    language = detect_language(original_path) if original_path else None
     
-    if operation == "chunk_processing":
-        result = code_documenter_agent_with_chunking(prompt, include_analysis=True)
+    if operation == "chunk_processing" or LARGE_FILE_STRATEGY == LargeFileStrategy.HIERARCHICAL:
+        # The chunker documents HIERARCHICAL files above the threshold itself
+        result = code_documenter_agent_with_chunking(prompt, include_analysis=True, language=language)
     else:
         # For very large files, handle based on strategy
-        result = handle_large_content(prompt, LARGE_FILE_STRATEGY)
+        result = handle_large_content(prompt, LARGE_FILE_STRATEGY, language)
     
     # Parse result into analysis and code parts
     try:
@@ -876,39 +1663,88 @@ def generate_multi_file_documentation(
         logger.error(f"Multi-file documentation failed: {e}", exc_info=True)
         return f"❌ Error generating multi-file documentation: {str(e)}"
 
-def split_code_intelligently(code: str, max_chunk_size: int = LARGE_FILE_THRESHOLD) -> List[str]:
+def _split_lines(code: str, max_chunk_size: int, measure: Callable[[str], int] = len) -> List[str]:
+    """Split code on line boundaries only (fallback for oversized units)."""
+    chunks = []
+    current_chunk = []
+    current_size = 0
+    
+    for line in code.split('\n'):
+        line_size = measure(line) + 1  # +1 for newline
+        
+        # If adding this line would exceed the chunk size
+        if current_size + line_size > max_chunk_size and current_chunk:
+            chunks.append('\n'.join(current_chunk))
+            current_chunk = []
+            current_size = 0
+        
+        current_chunk.append(line)
+        current_size += line_size
+    
+    # Add the last chunk if it has content
+    if current_chunk:
+        chunks.append('\n'.join(current_chunk))
+    
+    return chunks
+
+def split_code_intelligently(
+    code: str,
+    max_chunk_size: int = LARGE_FILE_THRESHOLD,
+    language: Optional[str] = None,
+    first_chunk_size: Optional[int] = None,
+    measure: Callable[[str], int] = len
+) -> List[str]:
     """
     Split code intelligently by preserving class and method boundaries.
     
+    Class, function and method spans are indexed in one pass (see code_structure.py)
+    and whole units are packed into chunks up to the budget. Only a single unit
+    that is itself larger than the budget falls back to line splitting.
+    
     Args:
         code: Source code to split
         max_chunk_size: Maximum size per chunk
+        language: Source language (see constants.ext_to_lang); guessed when omitted
+        first_chunk_size: Optional smaller budget for the first chunk
+        measure: Size function the budgets are expressed in (default: characters;
+                 pass a token counter to budget in tokens)
         
     Returns:
         List of code chunks
     """
-    if len(code) <= max_chunk_size:
+    first_budget = min(first_chunk_size or max_chunk_size, max_chunk_size)
+    if measure(code) <= first_budget:
         return [code]
     
+    units = index_code_units(code, language)
+    logger.info(f"Indexed {len(units)} code units for boundary-aware splitting")
+    
     chunks = []
-    lines = code.split('\n')
     current_chunk = []
     current_size = 0
     
-    # Try to split at class boundaries for Java
-    class_pattern = r'^\s*(public|private|protected)?\s*(static\s+)?(class|interface|enum)\s+\w+'
-    
-    for line in lines:
-        line_size = len(line) + 1  # +1 for newline
+    for unit in units:
+        budget = first_budget if not chunks else max_chunk_size
+        unit_size = measure(unit.text) + 1  # +1 for joining newline
         
-        # If adding this line would exceed the chunk size
-        if current_size + line_size > max_chunk_size and current_chunk:
+        # If adding this unit would exceed the chunk size, close the current chunk
+        if current_size + unit_size > budget and current_chunk:
             chunks.append('\n'.join(current_chunk))
             current_chunk = []
             current_size = 0
+            budget = max_chunk_size
         
-        current_chunk.append(line)
-        current_size += line_size
+        if unit_size > budget:
+            # Oversized single unit: fall back to line splitting
+            logger.info(f"Unit '{unit.name or unit.kind}' (size {unit_size}) exceeds chunk budget, splitting by lines")
+            pieces = _split_lines(unit.text, budget, measure)
+            chunks.extend(pieces[:-1])
+            current_chunk = [pieces[-1]]
+            current_size = measure(pieces[-1]) + 1
+            continue
+        
+        current_chunk.append(unit.text)
+        current_size += unit_size
     
     # Add the last chunk if it has content
     if current_chunk:
@@ -917,87 +1753,258 @@ def split_code_intelligently(code: str, max_chunk_size: int = LARGE_FILE_THRESHO
     logger.info(f"Split code into {len(chunks)} chunks")
     return chunks
 
-def create_code_summary(code: str, max_length: int = 50000) -> str:
+# Lines at the top of a file searched for imports, package statements and header comments
+SUMMARY_HEADER_LINES = 50
+_SUMMARY_HEADER_PREFIXES = {
+    "java": ("import ", "package ", "/*", "*", "//"),
+    "python": ("import ", "from ", "#"),
+    "javascript": ("import ", "'use strict'", '"use strict"', "/*", "*", "//"),
+    "typescript": ("import ", "/// <reference", "/*", "*", "//"),
+    "c": ("#include", "/*", "*", "//"),
+    "cpp": ("#include", "using namespace", "/*", "*", "//"),
+    "csharp": ("using ", "/*", "*", "//"),
+    "go": ("package ", "import ", "/*", "*", "//"),
+}
+_SUMMARY_DEFAULT_HEADER_PREFIXES = ("import ", "package ", "/*", "*", "//")
+
+# Per-language declaration extractors, matched right after a line's indentation.
+# Each language is (block comment or docstring pattern, declaration pattern); a
+# declaration inside a comment is ignored. Every declaration pattern is a single
+# expression (shared modifiers first) so that a line that is no declaration fails fast.
+_C_COMMENT = r'/\*[\s\S]*?(?:\*/|\Z)'
+_CONTROL_WORDS = r'(?:if|for|while|switch|catch|return|else|do|try|with|await|new|typeof|sizeof|delete|throw|case|goto|super|this|function)\b'
+_SUMMARY_DECLARATION_PATTERNS = {
+    "java": (
+        _C_COMMENT,
+        r'(?:@\w+(?:\([^)\n]*\))?[ \t]+)*'
+        r'(?:(?P<modifier>public|protected|private|static|final|abstract|sealed|non-sealed|synchronized|native|default|strictfp)[ \t]+)*'
+        r'(?:(?:class|interface|enum|record|@interface)[ \t]+\w'
+        r'|(?(modifier)(?:<[^>\n]*>[ \t]+)?[\w<>\[\],.? ]*?\w+[ \t]*\(|(?!)))'
+    ),
+    "python": (
+        r'"""[\s\S]*?(?:"""|\Z)|\'\'\'[\s\S]*?(?:\'\'\'|\Z)',
+        r'(?:async[ \t]+)?def[ \t]+\w|class[ \t]+\w'
+    ),
+    "typescript": (
+        _C_COMMENT,
+        r'(?:(?P<modifier>export|default|declare|abstract|async|public|private|protected|static|readonly|override|get|set)[ \t]+)*'
+        r'(?:(?:class|interface|enum|namespace|module|function)\b'
+        r'|type[ \t]+\w+[^\n=]*='
+        r'|(?:const|let|var)[ \t]+[\w$]+[ \t]*(?::[^=\n]+)?=[ \t]*(?:async[ \t]+)?(?:\([^)\n]*\)|[\w$]+)[ \t]*(?::[^=\n]+)?=>'
+        r'|(?!' + _CONTROL_WORDS + r')[\w$]+[ \t]*(?:<[^>\n]*>)?[ \t]*\((?(modifier)|[^\n]*\)[^\n;]*\{[ \t]*$))'
+    ),
+    "c": (
+        _C_COMMENT,
+        r'(?:template[ \t]*<[^\n]*>[ \t]*)?(?:typedef[ \t]+)?(?:class|struct|union|enum(?:[ \t]+class)?|namespace)[ \t]+\w+[^;\n]*$'
+        r'|(?!' + _CONTROL_WORDS + r')[\w:<>,*&~ \t]*?[\w>*&][ \t*&]+~?[\w:]+[ \t]*\([^;\n]*$'
+        r'|\w+::~?\w+[ \t]*\([^;\n]*$'
+    ),
+    "csharp": (
+        _C_COMMENT,
+        r'(?:\[[^\n]*\][ \t]*)*'
+        r'(?:(?P<modifier>public|private|protected|internal|static|virtual|override|abstract|async|sealed|extern|unsafe|new|partial|readonly)[ \t]+)*'
+        r'(?:(?:class|interface|struct|enum|record|namespace)[ \t]+\w'
+        r'|(?(modifier)[\w<>\[\],.? ]*?\w+[ \t]*(?:<[^>\n]*>)?[ \t]*\(|(?!)))'
+    ),
+    "go": (
+        _C_COMMENT,
+        r'(?:func|type)[ \t]|\w+[ \t]+(?:struct|interface)[ \t]*\{'
+    ),
+}
+_SUMMARY_DECLARATION_PATTERNS["javascript"] = _SUMMARY_DECLARATION_PATTERNS["typescript"]
+_SUMMARY_DECLARATION_PATTERNS["cpp"] = _SUMMARY_DECLARATION_PATTERNS["c"]
+# Ruby, PHP, Swift and unknown languages
+_SUMMARY_GENERIC_DECLARATIONS = (
+    _C_COMMENT,
+    r'(?:(?:public|private|protected|internal|open|static|final|abstract|override)[ \t]+)*'
+    r'(?:class|interface|struct|enum|protocol|extension|module|trait|def|func|function)[ \t]+\w'
+)
+_summary_patterns: Dict[str, Tuple["re.Pattern", "re.Pattern", "re.Pattern"]] = {}
+
+
+def _summary_declaration_patterns(language: str) -> Tuple["re.Pattern", "re.Pattern", "re.Pattern"]:
+    """Compiled (comment, declaration line, first line) patterns of a language (cached)"""
+    patterns = _summary_patterns.get(language)
+    if patterns is None:
+        comment, declaration = _SUMMARY_DECLARATION_PATTERNS.get(language, _SUMMARY_GENERIC_DECLARATIONS)
+        # Anchored on the newline before the line: a literal prefix lets the regex engine
+        # skip from line to line instead of trying every position
+        patterns = _summary_patterns[language] = (
+            re.compile(comment),
+            re.compile(rf"\n[ \t]*+(?:{declaration})", re.MULTILINE),
+            re.compile(rf"[ \t]*+(?:{declaration})", re.MULTILINE),
+        )
+    return patterns
+
+
+def _iter_declaration_lines(code: str, language: str) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) of every declaration line of the code outside block comments"""
+    comment_pattern, line_pattern, first_line_pattern = _summary_declaration_patterns(language)
+    comments = comment_pattern.finditer(code)
+    comment = next(comments, None)
+    starts = (match.start() + 1 for match in line_pattern.finditer(code))
+    if first_line_pattern.match(code):
+        starts = itertools.chain((0,), starts)
+    for start in starts:
+        while comment is not None and comment.end() <= start:
+            comment = next(comments, None)
+        if comment is not None and comment.start() <= start:
+            continue
+        end = code.find('\n', start)
+        yield start, end if end != -1 else len(code)
+
+
+def create_code_summary(code: str, max_length: int = 50000, language: Optional[str] = None,
+                        max_tokens: Optional[int] = None) -> str:
     """
     Create a summary of code for analysis when the full code is too large.
     
+    The summary holds the file header (imports, package statements, header comments)
+    followed by every class/interface/type declaration and function or method signature,
+    found with the declaration extractor of the file's language in one scan. Sizes are
+    kept as running totals, so the summary is built in linear time.
+    
     Args:
         code: Source code to summarize
-        max_length: Maximum length of summary
+        max_length: Maximum length of summary in characters
+        language: Source language (see constants.ext_to_lang); guessed when omitted
+        max_tokens: Optional token budget for the summary (see token_counter.py)
         
     Returns:
         Code summary with key components
     """
-    if len(code) <= max_length:
+    counter = get_token_counter() if max_tokens is not None else None
+    if len(code) <= max_length and (counter is None or counter.count(code) <= max_tokens):
         return code
     
-    lines = code.split('\n')
-    summary_lines = []
-    
-    # Always include imports and package declarations
-    for line in lines[:50]:  # First 50 lines usually contain imports
-        if (line.strip().startswith('import ') or 
-            line.strip().startswith('package ') or
-            line.strip().startswith('/*') or
-            line.strip().startswith('*') or
-            line.strip().startswith('//')):
-            summary_lines.append(line)
+    language = (language or detect_language(code=code)).lower()
+    comment = "#" if language in INDENT_LANGUAGES else "//"
+    summary_lines: List[str] = []
+    # Running size of '\n'.join(summary_lines) and its token count
+    summary_size = 0
+    summary_tokens = 0
+    
+    def add(line: str) -> bool:
+        nonlocal summary_size, summary_tokens
+        line_size = len(line) + (1 if summary_lines else 0)
+        line_tokens = counter.count(line) + 1 if counter else 0
+        if summary_size + line_size > max_length or (counter and summary_tokens + line_tokens > max_tokens):
+            return False
+        summary_lines.append(line)
+        summary_size += line_size
+        summary_tokens += line_tokens
+        return True
+    
+    # Always include imports and package declarations from the top of the file
+    header_end = -1
+    for _ in range(SUMMARY_HEADER_LINES):
+        header_end = code.find('\n', header_end + 1)
+        if header_end == -1:
+            break
+    header_prefixes = _SUMMARY_HEADER_PREFIXES.get(language, _SUMMARY_DEFAULT_HEADER_PREFIXES)
+    for line in code[:header_end if header_end != -1 else len(code)].split('\n'):
+        if line.strip().startswith(header_prefixes):
+            add(line)
     
-    summary_lines.append("\n// ... [CODE SUMMARY - showing key components] ...\n")
+    add(f"\n{comment} ... [CODE SUMMARY - showing key components] ...\n")
     
     # Include class/interface declarations and method signatures
-    in_comment = False
-    for line in lines:
-        stripped = line.strip()
-        
-        # Track multi-line comments
-        if '/*' in stripped:
-            in_comment = True
-        if '*/' in stripped:
-            in_comment = False
-            continue
-            
-        if in_comment:
-            continue
-        
-        # Include important declarations
-        if (stripped.startswith('public class ') or
-            stripped.startswith('private class ') or
-            stripped.startswith('public interface ') or
-            stripped.startswith('public enum ') or
-            (stripped.startswith('public ') and '(' in stripped and '{' in stripped) or
-            (stripped.startswith('private ') and '(' in stripped and '{' in stripped)):
-            summary_lines.append(line)
-            
+    declarations = 0
+    for start, end in _iter_declaration_lines(code, language):
         # Stop if we're getting too long
-        if len('\n'.join(summary_lines)) > max_length:
+        if not add(code[start:end]):
             break
+        declarations += 1
     
     summary = '\n'.join(summary_lines)
-    logger.info(f"Created code summary: {len(summary)} chars from {len(code)} chars")
+    logger.info(f"Created {language} code summary: {len(summary)} chars, {declarations} declarations from {len(code)} chars")
     return summary
 
-def handle_large_content(content: str, strategy: str = LARGE_FILE_STRATEGY) -> str:
+# Statements kept verbatim at the top of a file skeleton
+_SKELETON_IMPORT_PREFIXES = ("import ", "from ", "package ", "#include", "using ", "require ", "use ")
+
+def create_file_skeleton(code: str, language: Optional[str] = None, max_tokens: int = CHUNK_SKELETON_MAX_TOKENS) -> str:
+    """
+    Build a compact outline of a file: imports followed by class/function/method signatures.
+    
+    The skeleton is computed once per file and shared by every chunk prompt so each
+    chunk sees the surrounding structure. Languages the structural index cannot
+    outline fall back to create_code_summary().
+    
+    Args:
+        code: Full source code of the file
+        language: Language name (detected from the code when omitted)
+        max_tokens: Budget for the skeleton (0 disables it)
+        
+    Returns:
+        Skeleton text, or "" when disabled or nothing useful was found
+    """
+    if max_tokens <= 0 or not code.strip():
+        return ""
+    counter = get_token_counter()
+    
+    imports = []
+    outline = []
+    for unit in index_code_units(code, language):
+        if unit.kind == "other":
+            for line in unit.text.split('\n'):
+                stripped = line.strip()
+                if stripped.startswith(_SKELETON_IMPORT_PREFIXES):
+                    imports.append(stripped)
+        elif unit.signature:
+            outline.append("    " * unit.depth + unit.signature)
+    
+    if not outline:
+        return create_code_summary(code, len(code), language, max_tokens)
+    
+    # Declarations matter more than imports when the budget is tight
+    budget = max_tokens - 16  # room for the truncation note
+    kept_outline = []
+    for line in outline:
+        line_tokens = counter.count(line) + 1
+        if line_tokens > budget:
+            break
+        kept_outline.append(line)
+        budget -= line_tokens
+    if len(kept_outline) < len(outline):
+        kept_outline.append(f"// ... {len(outline) - len(kept_outline)} more declarations")
+    
+    kept_imports = []
+    for line in imports:
+        line_tokens = counter.count(line) + 1
+        if line_tokens > budget:
+            break
+        kept_imports.append(line)
+        budget -= line_tokens
+    
+    skeleton = '\n'.join(kept_imports + ([""] if kept_imports else []) + kept_outline)
+    logger.info(f"Created file skeleton: {len(skeleton)} chars, {len(kept_outline)} declarations")
+    return skeleton
+
+def handle_large_content(content: str, strategy: str = LARGE_FILE_STRATEGY, language: Optional[str] = None) -> str:
     """
     Handle large content based on the configured strategy.
     
     Args:
         content: Content to process
         strategy: Strategy to use (chunk, summarize, truncate, reject)
+        language: Source language for the summarize strategy; guessed when omitted
         
     Returns:
         Processed content
     """
-    if len(content) <= LARGE_FILE_THRESHOLD:
+    counter = get_token_counter()
+    content_tokens = counter.count(content)
+    if content_tokens <= LARGE_FILE_THRESHOLD_TOKENS:
         return content
     
     if strategy == LargeFileStrategy.SUMMARIZE:
-        return create_code_summary(content)
+        return create_code_summary(content, language=language, max_tokens=SUMMARY_MAX_TOKENS)
     elif strategy == LargeFileStrategy.TRUNCATE:
-        return content[:LARGE_FILE_THRESHOLD] + "\n\n[... Content truncated ...]"
+        return counter.truncate(content, LARGE_FILE_THRESHOLD_TOKENS) + "\n\n[... Content truncated ...]"
     elif strategy == LargeFileStrategy.REJECT:
-        raise ValueError(f"Content too large ({len(content)} chars) and strategy is REJECT")
-    else:  # Default to CHUNK strategy
+        raise ValueError(f"Content too large ({content_tokens} tokens) and strategy is REJECT")
+    else:  # Default to CHUNK strategy (HIERARCHICAL is routed by process_large_file)
         # For chunk strategy, return the content as-is and let the caller handle chunking
         return content
 
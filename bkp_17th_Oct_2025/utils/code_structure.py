@@ -0,0 +1,301 @@
+"""
+Code structure indexing utilities for AIVA MCP Server
+
+Lightweight, dependency-free scanners that index class, function and method
+spans in a single pass so large files can be split on syntactic boundaries.
+
+- Brace languages (Java, C/C++, C#, JS/TS, Go, PHP, Swift): brace-depth scanner
+  that skips strings and comments
+- Indentation languages (Python, Ruby): indent scanner with bracket and
+  multi-line string tracking
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    from .constants import ext_to_lang
+except ImportError:
+    from constants import ext_to_lang  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+INDENT_LANGUAGES = {"python", "ruby"}
+# Brace languages where statements are commonly not terminated by ';'
+OPTIONAL_SEMICOLON_LANGUAGES = {"go", "swift", "javascript", "typescript"}
+_CONTINUATION_ENDINGS = (",", "(", "[", "=", "+", "-", "*", "/", "&", "|", ".", "?", ":", "<", ">", "\\")
+
+# One combined alternation per language family: comments, strings, brackets and newlines
+_BRACE_TOKEN_PATTERN = re.compile(
+    r'//[^\n]*'
+    r'|/\*[\s\S]*?(?:\*/|\Z)'
+    r'|"(?:\\.|[^"\\\n])*"'
+    r"|'(?:\\.|[^'\\\n])*'"
+    r'|`(?:\\[\s\S]|[^`\\])*(?:`|\Z)'
+    r'|[{};]'
+    r'|\n'
+)
+_PYTHON_TOKEN_PATTERN = re.compile(
+    r'"""[\s\S]*?(?:"""|\Z)'
+    r"|'''[\s\S]*?(?:'''|\Z)"
+    r'|#[^\n]*'
+    r'|"(?:\\.|[^"\\\n])*"'
+    r"|'(?:\\.|[^'\\\n])*'"
+    r'|[(\[{]|[)\]}]'
+    r'|\n'
+)
+_RUBY_TOKEN_PATTERN = re.compile(
+    r'^=begin[\s\S]*?(?:^=end|\Z)'
+    r'|#[^\n]*'
+    r'|"(?:\\.|[^"\\\n])*"'
+    r"|'(?:\\.|[^'\\\n])*'"
+    r'|[(\[{]|[)\]}]'
+    r'|\n',
+    re.MULTILINE
+)
+
+# Declaration extractors used to label units
+_CLASS_PATTERN = re.compile(r'\b(?:class|interface|enum|struct|record|trait|protocol|extension|module|namespace)\s+(\w+)')
+_GO_FUNC_PATTERN = re.compile(r'^\s*func\s+(?:\([^)]*\)\s*)?(\w+)')
+_GO_TYPE_PATTERN = re.compile(r'^\s*type\s+(\w+)\s+(?:struct|interface)\b')
+_PYTHON_DEF_PATTERN = re.compile(r'^\s*(?:async\s+)?def\s+(\w+)')
+_RUBY_DEF_PATTERN = re.compile(r'^\s*def\s+(?:self\.)?([\w?!=]+)')
+_JS_FUNCTION_PATTERN = re.compile(r'\bfunction\s*\*?\s*(\w+)')
+_JS_ARROW_PATTERN = re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:\([^)]*\)|\w+)\s*(?::[^=]+)?=>')
+_METHOD_PATTERN = re.compile(r'^\s*(?:[\w<>\[\],.?@*&:~]+\s+)*?(~?\w+)\s*(?:<[^>()]*>)?\s*\(')
+_CONTROL_KEYWORDS = {"if", "for", "while", "switch", "catch", "return", "new", "else", "do", "try", "throw", "synchronized", "using", "foreach", "lock", "sizeof", "typeof", "await"}
+_PYTHON_CONTINUATION_KEYWORDS = ("else", "elif", "except", "finally")
+_RUBY_CONTINUATION_KEYWORDS = ("end", "else", "elsif", "rescue", "ensure", "when", "in ")
+
+
+@dataclass
+class CodeUnit:
+    """A contiguous span of source lines forming one syntactic unit"""
+    start_line: int  # 0-based, inclusive (includes leading comments/annotations)
+    end_line: int    # 0-based, exclusive
+    kind: str        # "class", "function", "method" or "other"
+    name: str
+    depth: int       # nesting depth of the declaration (0 = top level)
+    text: str
+    signature: str = ""  # declaration line, stripped
+
+
+def detect_language(path: Optional[str] = None, code: str = "") -> str:
+    """
+    Detect the language of a file from its extension, falling back to a cheap
+    content heuristic (indentation-style vs brace-style) when no path is known.
+    """
+    if path:
+        for ext, lang in ext_to_lang.items():
+            if path.lower().endswith(ext):
+                return lang
+        if path.lower().endswith((".tsx", ".jsx")):
+            return "typescript" if path.lower().endswith(".tsx") else "javascript"
+        if path.lower().endswith((".h", ".hpp", ".cc")):
+            return "cpp"
+    sample = code[:20000]
+    python_hits = len(re.findall(r'^\s*(?:def|class)\s+\w+.*:\s*$', sample, re.MULTILINE))
+    brace_hits = sample.count("{")
+    return "python" if python_hits and python_hits * 4 >= brace_hits else "java"
+
+
+def _is_comment_line(stripped: str, language: str) -> bool:
+    """Lines that belong to the following declaration (comments, annotations, decorators)"""
+    if language in INDENT_LANGUAGES:
+        return stripped.startswith(("#", "@"))
+    return stripped.startswith(("//", "/*", "*", "@", "#[", "[")) or stripped.endswith("*/")
+
+
+def _scan_line_state(code: str, language: str):
+    """
+    Single pass over the code recording, for every line:
+
+    - the bracket depth at the start of the line
+    - the "body depth": how many non-container blocks (function bodies, control
+      blocks, object literals) are open; class/namespace bodies do not count
+    - whether the line starts inside a multi-line string/comment
+    """
+    if language == "python":
+        pattern = _PYTHON_TOKEN_PATTERN
+    elif language == "ruby":
+        pattern = _RUBY_TOKEN_PATTERN
+    else:
+        pattern = _BRACE_TOKEN_PATTERN
+
+    depth_at_start = [0]
+    body_depth_at_start = [0]
+    inside_token = [False]
+    block_stack: List[bool] = []  # True for container blocks (class, namespace, ...)
+    body_depth = 0
+    statement_start = 0
+    for match in pattern.finditer(code):
+        token = match.group(0)
+        if token == "\n":
+            depth_at_start.append(len(block_stack))
+            body_depth_at_start.append(body_depth)
+            inside_token.append(False)
+        elif token in ("{", "(", "["):
+            is_container = token == "{" and bool(_CLASS_PATTERN.search(code, statement_start, match.start()))
+            block_stack.append(is_container)
+            if not is_container:
+                body_depth += 1
+            statement_start = match.end()
+        elif token in ("}", ")", "]"):
+            if block_stack and not block_stack.pop():
+                body_depth -= 1
+            statement_start = match.end()
+        elif token == ";":
+            statement_start = match.end()
+        elif "\n" in token:
+            # Multi-line comment or string: the lines it spans are not split points
+            for _ in range(token.count("\n")):
+                depth_at_start.append(len(block_stack))
+                body_depth_at_start.append(body_depth)
+                inside_token.append(True)
+            statement_start = match.end()
+        elif token[0] in "/#":
+            statement_start = match.end()
+    return depth_at_start, body_depth_at_start, inside_token
+
+
+def _is_boundary(line: str, prev_code: str, body_depth: int, inside: bool,
+                 language: str, enclosing: List[bool]) -> bool:
+    """Decide whether ``line`` may start a new unit"""
+    stripped = line.strip()
+    if inside or not stripped or body_depth > 0:
+        return False
+    # Comments, annotations and decorators stay with the declaration that follows them
+    if prev_code and _is_comment_line(prev_code, language):
+        return False
+
+    if language in INDENT_LANGUAGES:
+        if prev_code.endswith("\\"):
+            return False
+        indent = len(line) - len(line.lstrip())
+        continuation = _PYTHON_CONTINUATION_KEYWORDS if language == "python" else _RUBY_CONTINUATION_KEYWORDS
+        if stripped.startswith(continuation) or stripped.startswith((")", "]", "}")):
+            return False
+        if indent == 0:
+            return True
+        declaration = ("def ", "async def ", "class ", "@") if language == "python" else ("def ", "class ", "module ")
+        # Members may only be split off when every enclosing block is a class
+        return stripped.startswith(declaration) and all(enclosing)
+
+    # Brace languages: outside of function bodies, after a complete statement/block
+    if not prev_code or prev_code.endswith((";", "}", "{")) or prev_code.startswith("#"):
+        return True
+    return language in OPTIONAL_SEMICOLON_LANGUAGES and not prev_code.endswith(_CONTINUATION_ENDINGS)
+
+
+def _classify(decl: str, depth: int, language: str):
+    """Return (kind, name) for a unit's declaration line"""
+    class_match = _CLASS_PATTERN.search(decl)
+    if class_match and not decl.strip().startswith(("//", "#", "*")):
+        return "class", class_match.group(1)
+
+    function_kind = "method" if depth > 0 else "function"
+    if language == "python":
+        match = _PYTHON_DEF_PATTERN.match(decl)
+        if match:
+            indent = len(decl) - len(decl.lstrip())
+            return ("method" if indent > 0 else "function"), match.group(1)
+        return "other", ""
+    if language == "ruby":
+        match = _RUBY_DEF_PATTERN.match(decl)
+        return (function_kind, match.group(1)) if match else ("other", "")
+    if language == "go":
+        type_match = _GO_TYPE_PATTERN.match(decl)
+        if type_match:
+            return "class", type_match.group(1)
+        match = _GO_FUNC_PATTERN.match(decl)
+        if match:
+            return ("method" if decl.lstrip().startswith("func (") else "function"), match.group(1)
+    if language in ("javascript", "typescript"):
+        match = _JS_FUNCTION_PATTERN.search(decl) or _JS_ARROW_PATTERN.match(decl)
+        if match:
+            return function_kind, match.group(1)
+
+    match = _METHOD_PATTERN.match(decl)
+    if match and match.group(1) not in _CONTROL_KEYWORDS and not decl.rstrip().endswith(";"):
+        return function_kind, match.group(1)
+    return "other", ""
+
+
+def index_code_units(code: str, language: Optional[str] = None) -> List[CodeUnit]:
+    """
+    Index the class, function and method spans of a source file in one pass.
+
+    The returned units are contiguous, non-overlapping and cover every line, so
+    ``"\\n".join(u.text for u in units) == code``. Leading comments, annotations
+    and decorators are kept with the declaration they precede; method bodies are
+    never split.
+
+    Args:
+        code: Source code to index
+        language: Language name (see constants.ext_to_lang); guessed when omitted
+
+    Returns:
+        Ordered list of CodeUnit spans
+    """
+    if not code:
+        return []
+    language = (language or detect_language(code=code)).lower()
+    lines = code.split("\n")
+    depth_at_start, body_depth_at_start, inside_token = _scan_line_state(code, language)
+
+    # Candidate split points
+    starts = [0]
+    prev_code = ""
+    enclosing: List[Tuple[int, bool]] = []  # (indent, is_class) for indentation languages
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        enclosing_classes = []
+        if language in INDENT_LANGUAGES and stripped and not inside_token[i] and depth_at_start[i] == 0:
+            indent = len(line) - len(line.lstrip())
+            # Comments may sit at any indentation; decorators are indented like their declaration
+            if not stripped.startswith("#"):
+                while enclosing and enclosing[-1][0] >= indent:
+                    enclosing.pop()
+            enclosing_classes = [is_class for _, is_class in enclosing]
+            if stripped.startswith(("def ", "async def ", "class ", "module ")):
+                enclosing.append((indent, stripped.startswith(("class ", "module "))))
+        if i > 0 and _is_boundary(line, prev_code, body_depth_at_start[i], inside_token[i],
+                                  language, enclosing_classes):
+            # Pull leading comments/annotations/decorators into the unit they describe
+            start = i
+            while (start - 1 > starts[-1] and lines[start - 1].strip() and
+                   (inside_token[start - 1] or _is_comment_line(lines[start - 1].strip(), language))):
+                start -= 1
+            if start > starts[-1]:
+                starts.append(start)
+        if stripped:
+            prev_code = stripped
+
+    units = []
+    for n, start in enumerate(starts):
+        end = starts[n + 1] if n + 1 < len(starts) else len(lines)
+        decl_line = start
+        while decl_line < end - 1 and (not lines[decl_line].strip() or inside_token[decl_line] or
+                                        _is_comment_line(lines[decl_line].strip(), language)):
+            decl_line += 1
+        depth = depth_at_start[decl_line]
+        if language in INDENT_LANGUAGES:
+            depth = 1 if lines[decl_line][:1].isspace() else 0
+        kind, name = _classify(lines[decl_line], depth, language)
+        units.append(CodeUnit(
+            start_line=start,
+            end_line=end,
+            kind=kind,
+            name=name,
+            depth=depth,
+            text="\n".join(lines[start:end]),
+            signature=lines[decl_line].strip()
+        ))
+
+    logger.debug(f"Indexed {len(units)} code units ({language})")
+    return units
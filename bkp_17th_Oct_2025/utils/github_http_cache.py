@@ -0,0 +1,108 @@
+"""
+GitHub HTTP Cache for AIVA MCP Server
+Conditional-request (ETag) cache for GitHub Contents API responses.
+
+Each entry stores the ETag of a response together with the already decoded
+value (file text or directory listing). Requests for a cached URL send
+``If-None-Match``; a 304 reply is answered from the cache without downloading
+or decoding the body and, for authenticated requests, without spending
+rate-limit budget.
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+try:
+    from .result_cache import PersistentLRUCache
+except ImportError:
+    from result_cache import PersistentLRUCache  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+USE_GITHUB_ETAG_CACHE = os.getenv("USE_GITHUB_ETAG_CACHE", "true").lower() in ("true", "1", "yes", "y")
+GITHUB_ETAG_CACHE_DIR = os.getenv(
+    "GITHUB_ETAG_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".aiva_cache", "github_http")
+)
+GITHUB_ETAG_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_ETAG_CACHE_MAX_ENTRIES", "2000"))
+GITHUB_ETAG_CACHE_MAX_BYTES = int(os.getenv("GITHUB_ETAG_CACHE_MAX_MB", "128")) * 1024 * 1024
+
+
+class GitHubETagCache(PersistentLRUCache):
+    """
+    Persistent LRU cache of ``{"etag": ..., "value": ...}`` entries keyed by request URL.
+
+    ``hits``/``misses`` count cache lookups; ``not_modified`` counts lookups that
+    GitHub confirmed with a 304, i.e. requests served without a download.
+    """
+
+    def __init__(self, cache_dir: str = GITHUB_ETAG_CACHE_DIR,
+                 max_size: int = GITHUB_ETAG_CACHE_MAX_ENTRIES,
+                 max_bytes: int = GITHUB_ETAG_CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_size, max_bytes)
+        self._not_modified = 0
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        """Build the cache key for a request URL (the URL carries the ref)"""
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached entry for a URL
+
+        Returns:
+            Dict with "etag" and "value", or None if the URL is not cached
+        """
+        entry = self.get(self.make_key(url))
+        if isinstance(entry, dict) and entry.get("etag"):
+            return entry
+        return None
+
+    def store(self, url: str, etag: str, value: Any):
+        """Cache the decoded value of a response together with its ETag"""
+        self.set(self.make_key(url), {"etag": etag, "value": value})
+
+    def record_not_modified(self):
+        """Count a request that GitHub answered with 304 Not Modified"""
+        with self._lock:
+            self._not_modified += 1
+
+    def clear(self):
+        """Clear all cache entries"""
+        with self._lock:
+            super().clear()
+            self._not_modified = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            stats = super().stats()
+            total_requests = stats["total_requests"]
+            not_modified_rate = (self._not_modified / total_requests * 100) if total_requests > 0 else 0
+            stats["not_modified"] = self._not_modified
+            stats["not_modified_rate"] = f"{not_modified_rate:.2f}%"
+            return stats
+
+
+# Global cache instance
+github_etag_cache = GitHubETagCache()
+
+
+def get_github_etag_cache_stats() -> Dict[str, Any]:
+    """Get GitHub HTTP cache statistics"""
+    stats = github_etag_cache.stats()
+    stats["enabled"] = USE_GITHUB_ETAG_CACHE
+    return stats
+
+
+def clear_github_etag_cache():
+    """Clear the GitHub HTTP cache"""
+    github_etag_cache.clear()
+    logger.info("GitHub HTTP cache cleared")
@@ -0,0 +1,402 @@
+"""
+Incremental Re-documentation for AIVA MCP Server
+Re-documents only the classes/functions/methods that changed since the last run.
+
+Every successful documentation run records the source it was generated from next
+to the documented output and analysis. On the next run the new source is diffed
+against that record at code-unit granularity (see code_structure.index_code_units):
+unchanged units reuse their previously documented text, changed units are sent to
+the agent, and the results are spliced back together in source order.
+
+The analysis is reused as-is by incremental runs, so the record also tracks how
+much of the source has been re-documented since the analysis was produced; once
+that cumulative share crosses INCREMENTAL_MAX_CHANGED_RATIO the next run is a full
+one and the analysis is regenerated.
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .code_structure import CodeUnit, index_code_units, detect_language
+    from .result_cache import normalize_source
+    from .code_documentation_helper import (
+        CHUNK_INSTRUCTION,
+        CHUNK_MAX_CONCURRENCY,
+        FILE_SKELETON_INSTRUCTION,
+        create_file_skeleton,
+    )
+except ImportError:
+    from code_structure import CodeUnit, index_code_units, detect_language  # type: ignore
+    from result_cache import normalize_source  # type: ignore
+    from code_documentation_helper import (  # type: ignore
+        CHUNK_INSTRUCTION,
+        CHUNK_MAX_CONCURRENCY,
+        FILE_SKELETON_INSTRUCTION,
+        create_file_skeleton,
+    )
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+USE_INCREMENTAL_DOCS = os.getenv("USE_INCREMENTAL_DOCS", "false").lower() in ("true", "1", "yes", "y")
+DOC_RECORD_DIR = os.getenv(
+    "DOC_RECORD_DIR",
+    os.path.join(os.path.expanduser("~"), ".aiva_cache", "documentation_records")
+)
+# Above this share of changed source characters (cumulative since the analysis was produced)
+# a full re-documentation is preferable and yields a fresh analysis
+INCREMENTAL_MAX_CHANGED_RATIO = float(os.getenv("INCREMENTAL_MAX_CHANGED_RATIO", "0.5"))
+
+INCREMENTAL_NOTE = (
+    "Note: This is a changed section of a previously documented file. "
+    "Document only this section and return the complete section."
+)
+
+
+@dataclass
+class DocumentationRecord:
+    """Source and output of the last successful documentation run for one file"""
+    source: str
+    documented_code: str
+    analysis: str
+    language: str
+    updated_at: float
+    # Share of the source re-documented incrementally since the analysis was produced
+    analysis_changed_ratio: float = 0.0
+
+
+class DocumentationRecordStore:
+    """
+    Persistent store of DocumentationRecord objects, one JSON file per documented file.
+
+    Records are keyed by a target string identifying the file (see record_target()).
+    """
+
+    def __init__(self, record_dir: str = DOC_RECORD_DIR):
+        self.record_dir = record_dir
+
+    def _record_path(self, target: str) -> str:
+        key = hashlib.sha256(target.encode("utf-8")).hexdigest()
+        return os.path.join(self.record_dir, f"{key}.json")
+
+    def get(self, target: str) -> Optional[DocumentationRecord]:
+        """
+        Load the record for a target
+
+        Args:
+            target: Target string from record_target()
+
+        Returns:
+            The stored record or None if there is none (or it is unreadable)
+        """
+        path = self._record_path(target)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return DocumentationRecord(**data["record"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable documentation record for {target}: {e}")
+            return None
+
+    def save(self, target: str, record: DocumentationRecord):
+        """
+        Persist the record for a target (atomically replaces the previous one)
+
+        Args:
+            target: Target string from record_target()
+            record: Record to store
+        """
+        path = self._record_path(target)
+        try:
+            os.makedirs(self.record_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"target": target, "record": asdict(record)}, f)
+            os.replace(tmp_path, path)
+            logger.info(f"Saved documentation record for {target}")
+        except OSError as e:
+            logger.warning(f"Could not save documentation record for {target}: {e}")
+
+    def delete(self, target: str):
+        """Remove the record for a target"""
+        try:
+            os.remove(self._record_path(target))
+        except OSError:
+            pass
+
+
+# Global record store
+record_store = DocumentationRecordStore()
+
+
+def record_target(original_path: Optional[str] = None, repo_info: Optional[Dict] = None) -> Optional[str]:
+    """
+    Build the record key for a documentation request.
+
+    The operation type (document, review, ...) is part of the key, so the output of
+    one operation is never reused for another on the same file.
+
+    Args:
+        original_path: Local file path (local mode)
+        repo_info: GitHub repository info with owner/repo/branch/path and
+            optionally operation_type (GitHub mode)
+
+    Returns:
+        Target string, or None when the request does not identify a single file
+    """
+    operation_type = (repo_info or {}).get("operation_type") or "document"
+    if repo_info and repo_info.get("path"):
+        return (f"github:{repo_info.get('owner', '')}/{repo_info.get('repo', '')}"
+                f"@{repo_info.get('branch', 'main')}:{repo_info['path']}#{operation_type}")
+    if original_path:
+        return f"local:{os.path.abspath(str(original_path))}#{operation_type}"
+    return None
+
+
+def _unit_keys(units: List[CodeUnit]) -> List[Tuple[str, str, int]]:
+    """Stable identity for each unit: (kind, name, occurrence); unnamed units are numbered in order"""
+    seen: Dict[Tuple[str, str], int] = {}
+    keys = []
+    for unit in units:
+        base = (unit.kind, unit.name) if unit.kind != "other" else ("other", "")
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        keys.append(base + (occurrence,))
+    return keys
+
+
+def plan_incremental_update(record: DocumentationRecord, new_source: str,
+                            language: Optional[str] = None) -> Optional[List[Tuple[bool, str]]]:
+    """
+    Work out which parts of the new source need documenting.
+
+    Units of the old source are aligned with units of the previously documented
+    code by (kind, name, occurrence). A new unit whose source is unchanged reuses
+    its documented text; everything else is marked for re-documentation.
+    Adjacent changed units are merged into one region. The change counts towards
+    the record's analysis_changed_ratio, so a series of small edits eventually
+    triggers a full run with a fresh analysis.
+
+    Args:
+        record: Record of the previous documentation run
+        new_source: Current source code
+        language: Language name (defaults to the record's language)
+
+    Returns:
+        Ordered list of (changed, text) segments, where text is the previously
+        documented code for unchanged segments and the new source for changed
+        ones; None when an incremental update is not possible or not worthwhile
+    """
+    language = language or record.language
+    old_units = index_code_units(record.source, language)
+    new_units = index_code_units(new_source, language)
+    # Records written before fences were stripped on save may still carry one
+    doc_units = index_code_units(_strip_code_fence(record.documented_code), language)
+
+    old_by_key = {key: normalize_source(unit.text) for key, unit in zip(_unit_keys(old_units), old_units)}
+    doc_by_key = {key: unit.text for key, unit in zip(_unit_keys(doc_units), doc_units)}
+
+    # Every named unit of the old source must be found in the documented output,
+    # otherwise the agent restructured the file and splicing would be unreliable
+    named_keys = [key for key in old_by_key if key[0] != "other"]
+    if not named_keys or any(key not in doc_by_key for key in named_keys):
+        logger.info("Previous documented output does not align with its source - full re-documentation needed")
+        return None
+    # Unnamed units (imports, top-level statements) can only be reused when they line up one-to-one
+    reuse_other = (sum(1 for key in old_by_key if key[0] == "other") ==
+                   sum(1 for key in doc_by_key if key[0] == "other"))
+
+    segments: List[Tuple[bool, str]] = []
+    changed_chars = 0
+    for key, unit in zip(_unit_keys(new_units), new_units):
+        reusable = (key in doc_by_key and (key[0] != "other" or reuse_other) and
+                    old_by_key.get(key) == normalize_source(unit.text))
+        if reusable:
+            segments.append((False, doc_by_key[key]))
+        else:
+            changed_chars += len(unit.text)
+            if segments and segments[-1][0]:
+                segments[-1] = (True, segments[-1][1] + "\n" + unit.text)
+            else:
+                segments.append((True, unit.text))
+
+    changed_ratio = changed_chars / max(1, len(new_source))
+    cumulative_ratio = record.analysis_changed_ratio + changed_ratio
+    logger.info(f"Incremental plan: {sum(1 for changed, _ in segments if changed)} changed regions, "
+                f"{changed_ratio:.1%} of source changed ({cumulative_ratio:.1%} since the last analysis)")
+    if cumulative_ratio > INCREMENTAL_MAX_CHANGED_RATIO:
+        logger.info(f"Change ratio above {INCREMENTAL_MAX_CHANGED_RATIO:.0%} - full re-documentation is preferable")
+        return None
+    return segments
+
+
+def _changed_ratio(segments: List[Tuple[bool, str]], new_source: str) -> float:
+    """Share of the new source covered by the changed segments of a plan"""
+    changed_chars = sum(len(text) for is_changed, text in segments if is_changed)
+    return min(1.0, changed_chars / max(1, len(new_source)))
+
+
+def _strip_code_fence(text: str) -> str:
+    """
+    Remove surrounding blank lines and a surrounding markdown code fence.
+
+    The indentation of the first code line is preserved. A ```java line left at
+    the top would be indexed as an open template literal, swallowing every unit.
+    """
+    lines = text.split("\n")
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if lines and lines[0].strip().startswith("```"):
+        lines.pop(0)
+        if lines and lines[-1].strip() == "```":
+            lines.pop()
+        while lines and not lines[-1].strip():
+            lines.pop()
+    return "\n".join(lines)
+
+
+def _extract_region_code(result: str) -> str:
+    """
+    Extract the documented code from an agent reply for one region.
+
+    Unlike _extract_chunk_code() the indentation of the first line is preserved
+    and a surrounding markdown code fence is removed.
+    """
+    for marker in ("### PART 2: DOCUMENTED CODE", "=== DOCUMENTED CODE ==="):
+        if marker in result:
+            result = result.split(marker, 1)[1]
+            break
+    return _strip_code_fence(result)
+
+
+def _base_indent(text: str) -> int:
+    """Smallest indentation of the non-blank lines in text"""
+    indents = [len(line) - len(line.lstrip()) for line in text.split("\n") if line.strip()]
+    return min(indents) if indents else 0
+
+
+def _document_region(region: str, file_context: str) -> str:
+    """Send one changed region to the agent and return its documented code"""
+    prompt = f"{file_context}\n{CHUNK_INSTRUCTION}\n{region}\n\n{INCREMENTAL_NOTE}"
+
+    # Import the agent function to avoid circular dependency
+    import code_documentation_tool
+
+    result = code_documentation_tool.run_documenter_prompt(prompt)
+    if not result or result.strip().startswith(("Error", "ERROR")):
+        raise RuntimeError(f"Agent failed on changed region: {(result or 'Empty result')[:200]}")
+    documented = _extract_region_code(result)
+
+    # Nested units (methods) must keep their indentation when spliced back into the class
+    missing_indent = _base_indent(region) - _base_indent(documented)
+    if missing_indent > 0:
+        documented = textwrap.indent(documented, " " * missing_indent)
+    # Keep the blank lines that separated the region from its neighbouring units
+    leading_blank = len(region) - len(region.lstrip("\n"))
+    trailing_blank = len(region) - len(region.rstrip("\n"))
+    return "\n" * leading_blank + documented + "\n" * trailing_blank
+
+
+def redocument_incrementally(record: DocumentationRecord, new_source: str, language: Optional[str] = None,
+                             max_concurrency: Optional[int] = None) -> Optional[Tuple[str, float]]:
+    """
+    Re-document only the changed units of a previously documented file.
+
+    Args:
+        record: Record of the previous documentation run
+        new_source: Current source code
+        language: Language name (defaults to the record's language)
+        max_concurrency: Maximum number of regions documented at once (default CHUNK_MAX_CONCURRENCY)
+
+    Returns:
+        Tuple of the agent-style result ("### PART 1" analysis + "### PART 2"
+        documented code) with the new documentation spliced in and the share of
+        the source changed since the analysis was produced (to be saved with the
+        next record), or None to fall back to a full run
+    """
+    language = language or record.language or detect_language(code=new_source)
+    try:
+        segments = plan_incremental_update(record, new_source, language)
+    except Exception as e:
+        logger.warning(f"Incremental planning failed: {e}")
+        return None
+    if segments is None:
+        return None
+
+    changed = [i for i, (is_changed, _) in enumerate(segments) if is_changed]
+    documented = [text for _, text in segments]
+
+    if changed:
+        skeleton = create_file_skeleton(new_source, language)
+        file_context = FILE_SKELETON_INSTRUCTION.format(total_chunks="all", skeleton=skeleton) if skeleton else ""
+        workers = max(1, min(max_concurrency or CHUNK_MAX_CONCURRENCY, len(changed)))
+        logger.info(f"Re-documenting {len(changed)} changed regions with max {workers} in flight")
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-incremental") as executor:
+                results = executor.map(lambda i: _document_region(segments[i][1], file_context), changed)
+                for i, region_doc in zip(changed, results):
+                    documented[i] = region_doc
+        except Exception as e:
+            logger.warning(f"Incremental re-documentation failed, falling back to full run: {e}")
+            return None
+    else:
+        logger.info("Source unchanged since last documentation run - reusing previous output")
+
+    spliced = "\n".join(documented)
+    analysis_changed_ratio = record.analysis_changed_ratio + _changed_ratio(segments, new_source)
+    return f"""### PART 1: COMPREHENSIVE ANALYSIS
+
+{record.analysis}
+
+Note: This file was updated incrementally; {len(changed)} changed region(s) were re-documented.
+
+### PART 2: DOCUMENTED CODE
+
+{spliced}""", analysis_changed_ratio
+
+
+def save_documentation_record(target: Optional[str], source: str, documented_code: str,
+                              analysis: str, language: Optional[str] = None,
+                              analysis_changed_ratio: float = 0.0):
+    """
+    Record a successful documentation run so the next one can be incremental.
+
+    Only record real agent output: synthetic or fallback analyses would be reused
+    by every later incremental run.
+
+    Args:
+        target: Target string from record_target() (nothing is saved when None)
+        source: Source code that was documented
+        documented_code: Documented code produced for it (a markdown fence is removed)
+        analysis: Analysis produced for it
+        language: Language name, preferably from the file extension (guessed from
+            the source when omitted, which only tells python from java)
+        analysis_changed_ratio: Share of the source changed since the analysis was
+            produced (0 for a full run, which generates a fresh analysis)
+    """
+    documented_code = _strip_code_fence(documented_code or "")
+    if not target or not source or not documented_code.strip():
+        return
+    record_store.save(target, DocumentationRecord(
+        source=source,
+        documented_code=documented_code,
+        analysis=analysis,
+        language=language or detect_language(code=source),
+        updated_at=time.time(),
+        analysis_changed_ratio=analysis_changed_ratio
+    ))
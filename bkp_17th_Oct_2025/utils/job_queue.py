@@ -0,0 +1,296 @@
+"""
+Job Queue for AIVA MCP Server
+Bounded job queue and worker pool for blocking documentation work.
+
+The API endpoints are ``async def`` but documentation, analysis and GitHub calls
+block for seconds to minutes. Running them inline stalls the event loop for every
+other client (a single long agent run made /health time out). Work is instead
+submitted to a JobQueue:
+
+- A bounded FIFO queue (JOB_QUEUE_MAX_SIZE) in front of JOB_WORKERS worker threads
+- submit() raises JobQueueFullError when the queue is full, so callers can answer
+  429 instead of piling up requests (backpressure)
+- Every job has an id, a status (queued, running, succeeded, failed), timestamps and
+  its result or error; finished jobs are kept for JOB_RESULT_TTL_SECONDS
+- run() submits a job and awaits it without blocking the event loop; cancelling the
+  awaiting task (e.g. the client disconnected) cancels a job that has not started yet
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "32"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+# Upper bound on finished jobs kept for status/result lookups
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+
+
+class JobStatus:
+    """Lifecycle states of a job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """Raised by JobQueue.submit() when the queue has no free slot."""
+
+    def __init__(self, max_size: int, retry_after: int = 5):
+        super().__init__(f"Job queue is full ({max_size} jobs waiting)")
+        self.max_size = max_size
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    """One unit of blocking work and its outcome"""
+    job_id: str
+    operation: str
+    func: Callable[..., Any]
+    args: tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    status: str = JobStatus.QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    future: Future = field(default_factory=Future, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status view of the job (without the result payload)"""
+        now = time.time()
+        return {
+            "job_id": self.job_id,
+            "operation": self.operation,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": round((self.started_at or now) - self.submitted_at, 3),
+            "run_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Bounded FIFO job queue served by a pool of worker threads.
+
+    Workers are started on the first submit(), so importing the module is free.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_size: int = JOB_QUEUE_MAX_SIZE,
+                 result_ttl: int = JOB_RESULT_TTL_SECONDS, max_finished: int = JOB_MAX_FINISHED):
+        """
+        Initialize the queue
+
+        Args:
+            workers: Number of worker threads running jobs
+            max_size: Jobs that may wait for a worker before submit() is rejected
+            result_ttl: Seconds a finished job stays available for status/result lookups
+            max_finished: Maximum number of finished jobs kept
+        """
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=self.max_size)
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    def _start_workers(self):
+        """Start the worker threads once (called with the lock held)"""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue started: {self.workers} workers, {self.max_size} queue slots")
+
+    def submit(self, operation: str, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """
+        Queue a blocking call.
+
+        Args:
+            operation: Name of the operation (shown in status and metrics)
+            func: Blocking callable to run on a worker thread
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            The queued Job
+
+        Raises:
+            JobQueueFullError: If all queue slots are taken
+        """
+        job = Job(job_id=uuid.uuid4().hex, operation=operation, func=func, args=args, kwargs=kwargs)
+        with self._lock:
+            self._start_workers()
+            self._expire_finished()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._stats["rejected"] += 1
+                logger.warning(f"Job queue full, rejecting '{operation}'")
+                raise JobQueueFullError(self.max_size)
+            self._jobs[job.job_id] = job
+            self._stats["submitted"] += 1
+        logger.info(f"Queued job {job.job_id} ({operation}), {self._queue.qsize()} waiting")
+        return job
+
+    async def run(self, operation: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Submit a job and await its result without blocking the event loop.
+
+        Raises:
+            JobQueueFullError: If all queue slots are taken
+            Exception: Whatever the job raised
+        """
+        return await self.wait(self.submit(operation, func, *args, **kwargs))
+
+    async def wait(self, job: Job) -> Any:
+        """
+        Await the result of a submitted job without blocking the event loop.
+
+        Cancelling the awaiting task cancels the job if it is still queued; a running
+        job always completes.
+        """
+        return await asyncio.wrap_future(job.future)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by id (None if unknown or expired)"""
+        with self._lock:
+            self._expire_finished()
+            return self._jobs.get(job_id)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._execute(job)
+            except Exception as e:
+                # A worker must outlive every job, otherwise the pool shrinks for good
+                logger.exception(f"Job worker failed on job {job.job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, job: Job):
+        """Run one job on the current worker thread and record its outcome"""
+        # Fails if a waiter cancelled the job while it was queued; once running, the
+        # future can no longer be cancelled and its outcome can always be set
+        if not job.future.set_running_or_notify_cancel():
+            logger.info(f"Job {job.job_id} ({job.operation}) was cancelled before it started")
+            with self._lock:
+                job.status = JobStatus.FAILED
+                job.error = "Cancelled before it started"
+                self._finish(job)
+            return
+        with self._lock:
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            self._running += 1
+        logger.info(f"Running job {job.job_id} ({job.operation}) after {job.started_at - job.submitted_at:.2f}s in queue")
+        try:
+            with span("job", operation=job.operation) as current:
+                current.add("queue_wait_ms", (job.started_at - job.submitted_at) * 1000)
+                result = job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            logger.error(f"Job {job.job_id} ({job.operation}) failed: {e}")
+            with self._lock:
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+                self._running -= 1
+                self._finish(job)
+            job.future.set_exception(e)
+        else:
+            with self._lock:
+                job.status = JobStatus.SUCCEEDED
+                job.result = result
+                self._running -= 1
+                self._finish(job)
+            job.future.set_result(result)
+
+    def _finish(self, job: Job):
+        """Book-keeping for a finished job (called with the lock held)"""
+        job.finished_at = time.time()
+        # The inputs (source code, file lists) are not needed any more
+        job.args, job.kwargs = (), {}
+        self._stats[job.status] += 1
+        self._finished[job.job_id] = None
+        self._expire_finished()
+
+    def _expire_finished(self):
+        """Drop finished jobs past their TTL or beyond max_finished (called with the lock held)"""
+        cutoff = time.time() - self.result_ttl
+        while self._finished:
+            job_id = next(iter(self._finished))
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished_at >= cutoff and len(self._finished) <= self.max_finished:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth, worker usage and job counters"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queue.qsize(),
+                "max_queue_size": self.max_size,
+                "tracked_jobs": len(self._jobs),
+                **self._stats,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the workers after the jobs already queued"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                # Workers are daemon threads; they end with the process
+                break
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+# Global job queue instance
+job_queue = JobQueue()
+
+
+def get_job_queue_stats() -> Dict[str, Any]:
+    """Get statistics of the global job queue"""
+    return job_queue.stats()
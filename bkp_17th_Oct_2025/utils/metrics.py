@@ -0,0 +1,301 @@
+"""
+Pipeline Metrics for AIVA MCP Server
+In-process registry of per-stage spans and counters.
+
+Every stage of the documentation pipeline (fetch, discovery, chunking, agent
+calls, parsing, cleaning, commit) runs inside ``span(stage)`` or a function
+decorated with ``@traced(stage)``. A span measures its duration and carries
+counters: ``chars_in``/``chars_out`` (text sizes), ``bytes_in``/``bytes_out``
+(HTTP payloads), ``tokens_in``/``tokens_out``, ``retries``, ``cache_hits``, ...
+When it ends, the registry folds it into per-stage aggregates and keeps it in
+a short list of recent spans.
+
+Spans nest per thread and per asyncio task (contextvars). Helpers that do not
+know which stage they run in (HTTP retries, cache lookups, token usage) report
+to ``current_span()``, so their counters land on the innermost open span.
+
+The registry is served on /metrics by tools_api/main.py and mcp_server/main.py,
+in Prometheus text format or as JSON with ``?format=json``.
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+USE_PIPELINE_METRICS = os.getenv("USE_PIPELINE_METRICS", "true").lower() in ("true", "1", "yes", "y")
+METRICS_RECENT_SPANS = int(os.getenv("METRICS_RECENT_SPANS", "200"))
+# Durations kept per stage for the p50/p95 quantiles
+METRICS_LATENCY_SAMPLES = int(os.getenv("METRICS_LATENCY_SAMPLES", "1024"))
+METRICS_PREFIX = "aiva"
+
+
+class Span:
+    """One timed execution of a pipeline stage."""
+
+    __slots__ = ("stage", "parent", "attributes", "counters", "started_at", "duration", "error")
+
+    def __init__(self, stage: str, parent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.stage = stage
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.counters: Dict[str, float] = {}
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.error = False
+
+    def add(self, counter: str, value: float = 1):
+        """Add to a counter of this span (bytes_in, tokens_out, retries, cache_hits, ...)"""
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set(self, **attributes):
+        """Attach descriptive attributes (file path, mode, ...)"""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "parent": self.parent,
+            "started_at": self.started_at,
+            "duration_seconds": round(self.duration, 6),
+            "error": self.error,
+            "counters": dict(self.counters),
+            "attributes": dict(self.attributes),
+        }
+
+
+class _NullSpan(Span):
+    """Span handed out when metrics are disabled or no span is open; records nothing."""
+
+    def add(self, counter: str, value: float = 1):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan("none")
+
+
+class _StageStats:
+    """Aggregates of all finished spans of one stage."""
+
+    def __init__(self, latency_samples: int):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.samples = deque(maxlen=latency_samples)
+        self.counters: Dict[str, float] = {}
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Thread-safe registry of per-stage aggregates and recent spans."""
+
+    def __init__(self, recent_spans: int = METRICS_RECENT_SPANS, latency_samples: int = METRICS_LATENCY_SAMPLES):
+        self._lock = threading.Lock()
+        self._latency_samples = latency_samples
+        self._stages: Dict[str, _StageStats] = {}
+        self._recent = deque(maxlen=recent_spans)
+        self._started_at = time.time()
+
+    def _stage(self, stage: str) -> _StageStats:
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = _StageStats(self._latency_samples)
+        return stats
+
+    def record(self, span: Span):
+        """Fold a finished span into the aggregates of its stage"""
+        with self._lock:
+            stats = self._stage(span.stage)
+            stats.count += 1
+            stats.errors += int(span.error)
+            stats.total_seconds += span.duration
+            stats.max_seconds = max(stats.max_seconds, span.duration)
+            stats.samples.append(span.duration)
+            for counter, value in span.counters.items():
+                stats.counters[counter] = stats.counters.get(counter, 0) + value
+            self._recent.append(span)
+
+    def increment(self, stage: str, counter: str, value: float = 1):
+        """Add to a stage counter without a span (events outside any timed stage)"""
+        with self._lock:
+            stats = self._stage(stage)
+            stats.counters[counter] = stats.counters.get(counter, 0) + value
+
+    def reset(self):
+        """Drop all aggregates and recent spans"""
+        with self._lock:
+            self._stages.clear()
+            self._recent.clear()
+            self._started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the aggregates of every stage and the recent spans"""
+        with self._lock:
+            stages = {}
+            for stage, stats in sorted(self._stages.items()):
+                stages[stage] = {
+                    "count": stats.count,
+                    "errors": stats.errors,
+                    "duration_seconds": {
+                        "total": round(stats.total_seconds, 6),
+                        "mean": round(stats.total_seconds / stats.count, 6) if stats.count else 0.0,
+                        "max": round(stats.max_seconds, 6),
+                        "p50": round(stats.quantile(0.5), 6),
+                        "p95": round(stats.quantile(0.95), 6),
+                    },
+                    "counters": dict(stats.counters),
+                }
+            return {
+                "enabled": USE_PIPELINE_METRICS,
+                "uptime_seconds": round(time.time() - self._started_at, 3),
+                "stages": stages,
+                "recent_spans": [span.to_dict() for span in self._recent],
+            }
+
+    def render_prometheus(self) -> str:
+        """Render the aggregates in the Prometheus text exposition format"""
+        duration = f"{METRICS_PREFIX}_stage_duration_seconds"
+        errors = f"{METRICS_PREFIX}_stage_errors_total"
+        counters = f"{METRICS_PREFIX}_stage_counter_total"
+        lines = [
+            f"# HELP {duration} Duration of documentation pipeline stages.",
+            f"# TYPE {duration} summary",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for stage, stats in stages:
+                label = f'stage="{_label(stage)}"'
+                lines.append(f'{duration}{{{label},quantile="0.5"}} {stats.quantile(0.5):.6f}')
+                lines.append(f'{duration}{{{label},quantile="0.95"}} {stats.quantile(0.95):.6f}')
+                lines.append(f"{duration}_sum{{{label}}} {stats.total_seconds:.6f}")
+                lines.append(f"{duration}_count{{{label}}} {stats.count}")
+            lines.append(f"# HELP {errors} Failed executions of documentation pipeline stages.")
+            lines.append(f"# TYPE {errors} counter")
+            for stage, stats in stages:
+                lines.append(f'{errors}{{stage="{_label(stage)}"}} {stats.errors}')
+            lines.append(f"# HELP {counters} Bytes, tokens, retries and cache hits per pipeline stage.")
+            lines.append(f"# TYPE {counters} counter")
+            for stage, stats in stages:
+                for counter, value in sorted(stats.counters.items()):
+                    lines.append(f'{counters}{{stage="{_label(stage)}",counter="{_label(counter)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+# Global registry instance
+metrics_registry = MetricsRegistry()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("aiva_current_span", default=None)
+
+
+@contextmanager
+def span(stage: str, **attributes) -> Iterator[Span]:
+    """
+    Time a pipeline stage and record it in the registry when it ends.
+
+    An exception escaping the block marks the span as failed; code that reports
+    failures as return values can set ``span.error`` itself.
+
+    Args:
+        stage: Stage name ("github.fetch", "chunking", "agent_call", ...)
+        **attributes: Descriptive attributes kept with the span
+
+    Yields:
+        The open Span (a no-op span when USE_PIPELINE_METRICS is off)
+    """
+    if not USE_PIPELINE_METRICS:
+        yield _NULL_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(stage, parent.stage if parent else None, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        metrics_registry.record(current)
+
+
+def traced(stage: str, failed: Optional[Callable[[Any], bool]] = None):
+    """
+    Decorator running a function (sync or async) inside span(stage).
+    
+    A str return value is counted as ``chars_out``.
+    
+    Args:
+        stage: Stage name
+        failed: Optional predicate marking the span as failed from the return value,
+                for functions that report errors as strings
+    """
+    def finish(current: Span, result: Any) -> Any:
+        if isinstance(result, str):
+            current.add("chars_out", len(result))
+        if failed is not None and failed(result):
+            current.error = True
+        return result
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage) as current:
+                    return finish(current, await func(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage) as current:
+                return finish(current, func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def current_span() -> Span:
+    """Get the innermost open span of this thread/task (a no-op span if there is none)"""
+    return _current_span.get() or _NULL_SPAN
+
+
+def get_metrics_snapshot() -> Dict[str, Any]:
+    """Get pipeline metrics as a JSON-serializable dict"""
+    return metrics_registry.snapshot()
+
+
+def render_prometheus_metrics() -> str:
+    """Get pipeline metrics in the Prometheus text format"""
+    return metrics_registry.render_prometheus()
+
+
+def reset_metrics():
+    """Clear all pipeline metrics"""
+    metrics_registry.reset()
+    logger.info("Pipeline metrics reset")
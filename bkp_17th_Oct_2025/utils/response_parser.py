@@ -2,10 +2,173 @@
 Response parsing utilities for AIVA MCP Server
 """
 
+import re
 import logging
+from typing import Optional
+
+from .metrics import current_span, traced
 
 logger = logging.getLogger(__name__)
 
+# Rules removing analysis artifacts from a documented code section, applied in order.
+# Each rule is (pattern, key): ``key`` is a literal that every match of the pattern
+# contains, so a rule whose key does not occur in the text cannot match and is skipped.
+# IMPORTANT: Be very careful not to remove valid code comments that are part of the documentation
+CLEANUP_RULES = [
+    # Specific analysis markers that should NOT be in code files
+    (r"=== ANALYSIS ===.*?(?=\n=== |^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '=== ANALYSIS ==='),
+    (r"# === PART 2: DOCUMENTED SOURCE CODE ===.*?(?=\n)", '# === PART 2: DOCUMENTED SOURCE CODE ==='),
+    (r"### PART 2: DOCUMENTED SOURCE CODE.*?(?=\n)", '### PART 2: DOCUMENTED SOURCE CODE'),
+    
+    # TypeScript Implementation Checklist - can appear after code blocks
+    (r"```\s*\n### TypeScript Implementation Checklist Status:.*?(?=\n### PART|\n```|\Z)", '### TypeScript Implementation Checklist Status:'),
+    (r"### TypeScript Implementation Checklist Status:.*?(?=\n### PART|\n```|\Z)", '### TypeScript Implementation Checklist Status:'),
+    (r"\*\*✓ Type Annotation Coverage:\*\*.*?(?=\n### PART|\n```|\Z)", '**✓ Type Annotation Coverage:**'),
+    (r"\*\*✓ 'any' Type Usage:\*\*.*?(?=\n### PART|\n```|\Z)", "**✓ 'any' Type Usage:**"),
+    (r"\*\*✓ Type Aliases:\*\*.*?(?=\n### PART|\n```|\Z)", '**✓ Type Aliases:**'),
+    (r"\*\*✗ Generic Usage:\*\*.*?(?=\n### PART|\n```|\Z)", '**✗ Generic Usage:**'),
+    (r"\*\*✗ Null Safety:\*\*.*?(?=\n### PART|\n```|\Z)", '**✗ Null Safety:**'),
+    (r"\*\*✗ Decorator Usage:\*\*.*?(?=\n### PART|\n```|\Z)", '**✗ Decorator Usage:**'),
+    
+    # Summary and priority sections
+    (r"### Summary Score:.*?(?=\n### PART|\n```|\Z)", '### Summary Score:'),
+    (r"### Priority Improvements:.*?(?=\n### PART|\n```|\Z)", '### Priority Improvements:'),
+    (r"TypeScript Best Practices Score:.*?(?=\n### PART|\n```|\Z)", 'TypeScript Best Practices Score:'),
+    
+    # Analysis sections with numbered headings (#### 1., ### 2., etc.) - but only standalone ones
+    (r"^\s*#{2,4} \d+\. [A-Z][A-Z\s&]+.*?(?=\n^\s*#{2,4} \d+\.|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## '),
+    
+    # Analysis sections with named headings - but only standalone ones
+    (r"^\s*#{2,4} [A-Z][A-Z\s&]+ EVALUATION.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", ' EVALUATION'),
+    (r"^\s*#{2,4} [A-Z][A-Z\s&]+ ASSESSMENT.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", ' ASSESSMENT'),
+    
+    # Executive Summary and other analysis sections that shouldn't be in code
+    (r"^\s*#{2,4} Executive Summary.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Executive Summary'),
+    (r"^\s*#{2,4} Code Overview.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Code Overview'),
+    (r"^\s*#{2,4} Architecture Analysis.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Architecture Analysis'),
+    (r"^\s*#{2,4} Security Evaluation.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Security Evaluation'),
+    (r"^\s*#{2,4} Performance.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Performance'),
+    (r"^\s*#{2,4} Refactoring.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Refactoring'),
+    (r"^\s*#{2,4} Actionable Next Steps.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '## Actionable Next Steps'),
+    
+    # Security patterns (OWASP, etc.) - only when they're clearly analysis
+    (r"^\s*- \*\*A\d+:.*?(?=\n^\s*- \*\*A|\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)", '- **A'),
+    
+    # Analysis checkmarks and symbols - only standalone lines
+    (r"^\s*✓.*?(?=\n)", '✓'),
+    (r"^\s*✗.*?(?=\n)", '✗'),
+    (r"^\s*❌.*?(?=\n)", '❌'),
+    (r"^\s*⚠️.*?(?=\n)", '⚠️'),
+    
+    # Specific improvement recommendations
+    (r"- \*\*Implement stricter.*?(?=\n### PART|\n```|\Z)", '- **Implement stricter'),
+    (r"- \*\*Switch to parameterized.*?(?=\n### PART|\n```|\Z)", '- **Switch to parameterized'),
+    (r"- \*\*Enhance error handling.*?(?=\n### PART|\n```|\Z)", '- **Enhance error handling'),
+    (r"\d+\. \*\*.*?\*\*:.*?(?=\n\d+\.|\n### PART|\n```|\Z)", '. **'),
+    
+    # GitHub operation messages and metadata - these are never valid code
+    (r"🎯 GitHub Operation.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '🎯 GitHub Operation'),
+    (r"📁 Repository:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '📁 Repository:'),
+    (r"🌿 Branch:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '🌿 Branch:'),
+    (r"📄 Documented file:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '📄 Documented file:'),
+    (r"📊 Analysis file:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '📊 Analysis file:'),
+    (r"🔄 Operation type:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '🔄 Operation type:'),
+    (r"✨ No local files created.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '✨ No local files created'),
+    
+    # Next step instructions - these are never valid code
+    (r"=== NEXT STEP ===.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '=== NEXT STEP ==='),
+    (r"To commit this documented code to GitHub.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", 'To commit this documented code to GitHub'),
+    (r"operation='document_commit'.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", "operation='document_commit'"),
+    (r"through \"### PART 2: DOCUMENTED CODE\".*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", 'through "### PART 2: DOCUMENTED CODE"'),
+    
+    # Additional GitHub commit instruction patterns
+    (r"file_path='.*?'.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", "file_path='"),
+    (r"generated_code='<copy the ENTIRE response.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", "generated_code='<copy the ENTIRE response"),
+    (r"confirm='yes'.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", "confirm='yes'"),
+    (r"⚠️.*?IMPORTANT.*?Copy the FULL response.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", 'Copy the FULL response'),
+    (r"starting from \"### PART 1.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", 'starting from "### PART 1'),
+    
+    # Horizontal rules and separators - only when standalone
+    (r"^\s*---+.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)", '---'),
+]
+
+# Literals shared by many keys: a key containing a gate is only searched for when
+# the gate occurs, so plain code is scanned for a handful of strings, not every key
+_KEY_GATES = ("## ", "- **", "=== ", "='")
+
+
+def _key_gate(key: str):
+    return next((gate for gate in _KEY_GATES if gate in key), None)
+
+
+def _starts_line(pattern: str, key: str) -> bool:
+    """Whether every match of pattern starts a line with key (``^\\s*key`` or ``^\\s*#{2,4} ...``)"""
+    if not pattern.startswith(r"^\s*"):
+        return False
+    rest = pattern[len(r"^\s*"):]
+    if key.startswith("## "):
+        return rest.startswith("#{2,4} " + key[3:])
+    return rest.replace("\\", "").startswith(key)
+
+
+_CLEANUP_PATTERNS = [(re.compile(pattern, re.DOTALL | re.MULTILINE), key, _starts_line(pattern, key))
+                     for pattern, key in CLEANUP_RULES]
+_CLEANUP_KEY_GATES = {key: _key_gate(key) for _, key in CLEANUP_RULES}
+# Same as \n{3,}, but the literal prefix lets the regex engine skip ahead with a fast search
+_EXCESS_BLANK_LINES = re.compile(r'\n\n\n+')
+
+
+def _present_keys(text: str) -> set:
+    """Keys of CLEANUP_RULES occurring in text"""
+    gates = {gate for gate in _KEY_GATES if gate in text}
+    return {key for key, gate in _CLEANUP_KEY_GATES.items() if (gate is None or gate in gates) and key in text}
+
+
+def _key_at_line_start(text: str, key: str) -> bool:
+    """Whether key occurs with only whitespace (or, for headings, more '#') before it on its line"""
+    position = text.find(key)
+    while position != -1:
+        prefix = text[text.rfind("\n", 0, position) + 1:position]
+        if key.startswith("#"):
+            prefix = prefix.rstrip("#")
+        if not prefix or prefix.isspace():
+            return True
+        position = text.find(key, position + 1)
+    return False
+
+
+def _apply_cleanup_rules(text: str) -> str:
+    """
+    Apply CLEANUP_RULES in order, skipping rules that cannot match.
+
+    Which keys occur is found with plain substring searches, once per version of the
+    text: removals only delete text, and the key set is re-checked after any rule
+    actually removed something (a deletion can join two fragments into a key).
+    Rules anchored at a line start are also skipped when no occurrence of their key
+    starts a line. Skipped rules would leave the text unchanged, so the result is
+    identical to running every rule (see _apply_all_cleanup_rules).
+    """
+    present = None
+    for pattern, key, starts_line in _CLEANUP_PATTERNS:
+        if present is None:
+            present = _present_keys(text)
+        if key not in present or (starts_line and not _key_at_line_start(text, key)):
+            continue
+        cleaned = pattern.sub("", text)
+        if len(cleaned) != len(text):
+            text = cleaned
+            present = None
+    return text
+
+
+def _apply_all_cleanup_rules(text: str) -> str:
+    """Reference: run every rule of CLEANUP_RULES in order (one full pass each)."""
+    for pattern, _, _ in _CLEANUP_PATTERNS:
+        text = pattern.sub("", text)
+    return text
+
+
+@traced("clean")
 def clean_documented_code(documented_code: str) -> str:
     """
     Clean the documented code section by removing analysis artifacts and non-code content.
@@ -18,107 +181,141 @@ def clean_documented_code(documented_code: str) -> str:
     """
     if not documented_code:
         return documented_code
+    current_span().add("chars_in", len(documented_code))
     
-    # Generic patterns to remove from documented code (language-agnostic)
-    # IMPORTANT: Be very careful not to remove valid code comments that are part of the documentation
-    removal_patterns = [
-        # Specific analysis markers that should NOT be in code files
-        r"=== ANALYSIS ===.*?(?=\n=== |^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"# === PART 2: DOCUMENTED SOURCE CODE ===.*?(?=\n)",
-        r"### PART 2: DOCUMENTED SOURCE CODE.*?(?=\n)",
-        
-        # TypeScript Implementation Checklist - can appear after code blocks
-        r"```\s*\n### TypeScript Implementation Checklist Status:.*?(?=\n### PART|\n```|\Z)",
-        r"### TypeScript Implementation Checklist Status:.*?(?=\n### PART|\n```|\Z)",
-        r"\*\*✓ Type Annotation Coverage:\*\*.*?(?=\n### PART|\n```|\Z)",
-        r"\*\*✓ 'any' Type Usage:\*\*.*?(?=\n### PART|\n```|\Z)",
-        r"\*\*✓ Type Aliases:\*\*.*?(?=\n### PART|\n```|\Z)",
-        r"\*\*✗ Generic Usage:\*\*.*?(?=\n### PART|\n```|\Z)",
-        r"\*\*✗ Null Safety:\*\*.*?(?=\n### PART|\n```|\Z)",
-        r"\*\*✗ Decorator Usage:\*\*.*?(?=\n### PART|\n```|\Z)",
-        
-        # Summary and priority sections
-        r"### Summary Score:.*?(?=\n### PART|\n```|\Z)",
-        r"### Priority Improvements:.*?(?=\n### PART|\n```|\Z)",
-        r"TypeScript Best Practices Score:.*?(?=\n### PART|\n```|\Z)",
-        
-        # Analysis sections with numbered headings (#### 1., ### 2., etc.) - but only standalone ones
-        r"^\s*#{2,4} \d+\. [A-Z][A-Z\s&]+.*?(?=\n^\s*#{2,4} \d+\.|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        
-        # Analysis sections with named headings - but only standalone ones  
-        r"^\s*#{2,4} [A-Z][A-Z\s&]+ EVALUATION.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} [A-Z][A-Z\s&]+ ASSESSMENT.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        
-        # Executive Summary and other analysis sections that shouldn't be in code
-        r"^\s*#{2,4} Executive Summary.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} Code Overview.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} Architecture Analysis.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} Security Evaluation.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} Performance.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} Refactoring.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        r"^\s*#{2,4} Actionable Next Steps.*?(?=\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        
-        # Security patterns (OWASP, etc.) - only when they're clearly analysis
-        r"^\s*- \*\*A\d+:.*?(?=\n^\s*- \*\*A|\n^\s*#{2,4}|\n^\s*/\*\*|\n^\s*#|\n^\s*//|\n^\s*class |\n^\s*function |\n^\s*def |\n^\s*import |\n^\s*package |\Z)",
-        
-        # Analysis checkmarks and symbols - only standalone lines
-        r"^\s*✓.*?(?=\n)",
-        r"^\s*✗.*?(?=\n)",
-        r"^\s*❌.*?(?=\n)",
-        r"^\s*⚠️.*?(?=\n)",
-        
-        # Specific improvement recommendations
-        r"- \*\*Implement stricter.*?(?=\n### PART|\n```|\Z)",
-        r"- \*\*Switch to parameterized.*?(?=\n### PART|\n```|\Z)",
-        r"- \*\*Enhance error handling.*?(?=\n### PART|\n```|\Z)",
-        r"\d+\. \*\*.*?\*\*:.*?(?=\n\d+\.|\n### PART|\n```|\Z)",
-        
-        # GitHub operation messages and metadata - these are never valid code
-        r"🎯 GitHub Operation.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"📁 Repository:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"🌿 Branch:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"📄 Documented file:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"📊 Analysis file:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"🔄 Operation type:.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"✨ No local files created.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        
-        # Next step instructions - these are never valid code
-        r"=== NEXT STEP ===.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"To commit this documented code to GitHub.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"operation='document_commit'.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"through \"### PART 2: DOCUMENTED CODE\".*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        
-        # Additional GitHub commit instruction patterns
-        r"file_path='.*?'.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"generated_code='<copy the ENTIRE response.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"confirm='yes'.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"⚠️.*?IMPORTANT.*?Copy the FULL response.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        r"starting from \"### PART 1.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-        
-        # Horizontal rules and separators - only when standalone
-        r"^\s*---+.*?(?=\n|^/\*\*|^#|^//|^class |^function |^def |^import |^package |\Z)",
-    ]
-    
-    import re
-    cleaned_code = documented_code
-    
-    for pattern in removal_patterns:
-        cleaned_code = re.sub(pattern, "", cleaned_code, flags=re.DOTALL | re.MULTILINE)
+    cleaned_code = _apply_cleanup_rules(documented_code)
     
     # Clean up excessive whitespace
-    cleaned_code = re.sub(r'\n{3,}', '\n\n', cleaned_code)
+    cleaned_code = _EXCESS_BLANK_LINES.sub('\n\n', cleaned_code)
     cleaned_code = cleaned_code.strip()
     
     logger.info(f"Cleaned documented code: {len(documented_code)} → {len(cleaned_code)} chars")
     
     return cleaned_code
 
-def parse_analysis_and_code(agent_response: str) -> tuple[str, str]:
+
+# Section markers of an agent response, each list in order of preference
+PART2_MARKERS = (
+    "### PART 2: DOCUMENTED CODE",
+    "PART 2: DOCUMENTED CODE",
+    "## PART 2: DOCUMENTED CODE",
+    "# PART 2: DOCUMENTED CODE",
+    "=== PART 2: DOCUMENTED CODE ===",
+    "## DOCUMENTED CODE",
+    "### DOCUMENTED CODE",
+    "DOCUMENTED CODE:",
+    "=== DOCUMENTED CODE ===",
+    "**DOCUMENTED CODE**",
+    "DOCUMENTED CODE",
+)
+
+PART1_MARKERS = (
+    "### PART 1: COMPREHENSIVE ANALYSIS",
+    "PART 1: COMPREHENSIVE ANALYSIS",
+    "## PART 1: COMPREHENSIVE ANALYSIS",
+    "# PART 1: COMPREHENSIVE ANALYSIS",
+    "=== PART 1: COMPREHENSIVE ANALYSIS ===",
+    "## ANALYSIS",
+    "### ANALYSIS",
+    "=== ANALYSIS ===",
+    "**ANALYSIS**",
+    "ANALYSIS:",
+)
+
+CODE_FENCE_MARKERS = (
+    "```typescript", "```javascript", "```python", "```java",
+    "```cpp", "```c", "```html", "```css", "```sql", "```",
+)
+
+# Every marker contains one of these cores. Each occurrence of a core is a candidate
+# position for the markers built on it, confirmed with startswith() at the marker's offset,
+# so the text is searched once per core instead of once per marker.
+_MARKER_CORES = ("DOCUMENTED CODE", "ANALYSIS", "```")
+_MARKERS_BY_CORE: dict[str, list[tuple[str, int]]] = {core: [] for core in _MARKER_CORES}
+for _marker in dict.fromkeys(PART2_MARKERS + PART1_MARKERS + CODE_FENCE_MARKERS):
+    _core = next(core for core in _MARKER_CORES if core in _marker)
+    _MARKERS_BY_CORE[_core].append((_marker, _marker.index(_core)))
+_MAX_MARKER_LENGTH = max(len(marker) for markers in _MARKERS_BY_CORE.values() for marker, _ in markers)
+
+
+class MarkerIndex:
+    """
+    First position of every response marker, found in one scan of the text per core.
+
+    Text is fed in order, either all at once or chunk by chunk as a streamed response
+    arrives; only the new text is scanned (plus the last few characters of the previous
+    chunk, so a marker split across chunks is still found). ``first`` maps every marker
+    seen so far to the position of its first occurrence in the whole response.
+    """
+
+    def __init__(self, text: str = ""):
+        self.first: dict[str, int] = {}
+        self.length = 0
+        self._tail = ""
+        if text:
+            self.feed(text)
+
+    def feed(self, chunk: str) -> "MarkerIndex":
+        """Index the next chunk of the response"""
+        if not chunk:
+            return self
+        window = self._tail + chunk
+        window_start = self.length - len(self._tail)
+        fed_from = len(self._tail)
+        self.length += len(chunk)
+        for core, markers in _MARKERS_BY_CORE.items():
+            pending = [(marker, offset) for marker, offset in markers if marker not in self.first]
+            position = window.find(core) if pending else -1
+            while position != -1:
+                for marker, offset in list(pending):
+                    begin = position - offset
+                    # Occurrences ending in the carried tail were recorded by an earlier feed
+                    if begin >= 0 and begin + len(marker) > fed_from and window.startswith(marker, begin):
+                        self.first[marker] = window_start + begin
+                        pending.remove((marker, offset))
+                if not pending:
+                    break
+                position = window.find(core, position + 1)
+        self._tail = window[-(_MAX_MARKER_LENGTH - 1):]
+        return self
+
+    def find(self, marker: str) -> int:
+        """Position of the first occurrence of marker, -1 if not seen (yet)"""
+        return self.first.get(marker, -1)
+
+    def part2_marker(self) -> Optional[str]:
+        """Most preferred PART 2 marker seen so far"""
+        return next((marker for marker in PART2_MARKERS if marker in self.first), None)
+
+    @property
+    def split_known(self) -> bool:
+        """
+        Whether the PART 2 split point is final before the response is complete.
+
+        True as soon as the preferred marker has arrived; a looser marker seen so far
+        may still be overruled by a more preferred one later in the stream.
+        """
+        return PART2_MARKERS[0] in self.first
+
+
+def _strip_bounds(text: str, start: int, end: int) -> tuple[int, int]:
+    """Bounds of text[start:end].strip() within text, without copying"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+@traced("parse")
+def parse_analysis_and_code(agent_response: str, markers: Optional[MarkerIndex] = None) -> tuple[str, str]:
     """
     Parse the agent response to separate analysis sections from documented code.
     
     Args:
         agent_response (str): Full response from the documentation agent
+        markers (MarkerIndex, optional): Index already fed with the whole response
+            (e.g. while it was streamed); built here when not given
         
     Returns:
         tuple[str, str]: (analysis_sections, documented_code)
@@ -129,77 +326,50 @@ def parse_analysis_and_code(agent_response: str) -> tuple[str, str]:
             return "", ""
 
         logger.info(f"Parsing response of {len(agent_response)} characters")
+        current_span().add("chars_in", len(agent_response))
+        
+        if markers is None or markers.length != len(agent_response):
+            markers = MarkerIndex(agent_response)
         
         analysis_sections = ""
         documented_code = ""
         
-        # Define all possible markers in order of preference
-        part2_markers = [
-            "### PART 2: DOCUMENTED CODE",
-            "PART 2: DOCUMENTED CODE", 
-            "## PART 2: DOCUMENTED CODE",
-            "# PART 2: DOCUMENTED CODE",
-            "=== PART 2: DOCUMENTED CODE ===",
-            "## DOCUMENTED CODE",
-            "### DOCUMENTED CODE",
-            "DOCUMENTED CODE:",
-            "=== DOCUMENTED CODE ===",
-            "**DOCUMENTED CODE**",
-            "DOCUMENTED CODE",
-        ]
-        
-        part1_markers = [
-            "### PART 1: COMPREHENSIVE ANALYSIS",
-            "PART 1: COMPREHENSIVE ANALYSIS",
-            "## PART 1: COMPREHENSIVE ANALYSIS", 
-            "# PART 1: COMPREHENSIVE ANALYSIS",
-            "=== PART 1: COMPREHENSIVE ANALYSIS ===",
-            "## ANALYSIS",
-            "### ANALYSIS", 
-            "=== ANALYSIS ===",
-            "**ANALYSIS**",
-            "ANALYSIS:",
-        ]
-        
         # First, try to find PART 2 marker and split there
-        found_part2 = False
-        for marker in part2_markers:
-            if marker in agent_response:
-                logger.info(f"Found PART 2 marker: {marker}")
-                parts = agent_response.split(marker, 1)
-                if len(parts) == 2:
-                    analysis_sections = parts[0].strip()
-                    documented_code = parts[1].strip()
-                    found_part2 = True
-                    break
-        
-        # If we found PART 2, clean up PART 1 markers from analysis
-        if found_part2 and analysis_sections:
-            for a_marker in part1_markers:
-                if a_marker in analysis_sections:
+        marker = markers.part2_marker()
+        found_part2 = marker is not None
+        if found_part2:
+            logger.info(f"Found PART 2 marker: {marker}")
+            split_at = markers.find(marker)
+            analysis_start, analysis_end = _strip_bounds(agent_response, 0, split_at)
+            code_start, code_end = _strip_bounds(agent_response, split_at + len(marker), len(agent_response))
+            documented_code = agent_response[code_start:code_end]
+            
+            # Clean up PART 1 markers from analysis
+            analysis_cut = None
+            for a_marker in PART1_MARKERS:
+                position = markers.find(a_marker)
+                if position >= analysis_start and position + len(a_marker) <= analysis_end:
                     logger.info(f"Removing PART 1 marker: {a_marker}")
-                    analysis_sections = analysis_sections.replace(a_marker, "", 1).strip()
+                    analysis_cut = (position, position + len(a_marker))
                     break
+            if analysis_cut:
+                analysis_sections = (agent_response[analysis_start:analysis_cut[0]]
+                                     + agent_response[analysis_cut[1]:analysis_end]).strip()
+            else:
+                analysis_sections = agent_response[analysis_start:analysis_end]
         
         # If no PART 2 found, try alternative approaches
         if not found_part2:
             logger.info("No PART 2 marker found, trying alternative parsing")
             
             # Look for code block patterns
-            code_patterns = [
-                "```typescript", "```javascript", "```python", "```java", 
-                "```cpp", "```c", "```html", "```css", "```sql", "```"
-            ]
-            
-            for pattern in code_patterns:
-                if pattern in agent_response:
-                    # Find the first code block
-                    code_start = agent_response.find(pattern)
-                    if code_start > 100:  # Ensure there's enough content before for analysis
-                        analysis_sections = agent_response[:code_start].strip()
-                        documented_code = agent_response[code_start:].strip()
-                        logger.info(f"Split on code pattern: {pattern}")
-                        break
+            for pattern in CODE_FENCE_MARKERS:
+                code_start = markers.find(pattern)
+                if code_start > 100:  # Ensure there's enough content before for analysis
+                    analysis_sections = agent_response[:code_start].strip()
+                    documented_code = agent_response[code_start:].strip()
+                    logger.info(f"Split on code pattern: {pattern}")
+                    break
         
         # Final fallback: if still no split and response is large, try to split roughly
         if not documented_code and len(agent_response) > 1000:
@@ -208,13 +378,13 @@ def parse_analysis_and_code(agent_response: str) -> tuple[str, str]:
             # Find paragraph break near middle
             search_start = max(0, mid_point - 500)
             search_end = min(len(agent_response), mid_point + 500)
-            search_section = agent_response[search_start:search_end]
             
             # Look for double newlines (paragraph breaks)
             paragraph_breaks = []
-            for i, char in enumerate(search_section):
-                if char == '\n' and i < len(search_section) - 1 and search_section[i+1] == '\n':
-                    paragraph_breaks.append(search_start + i)
+            position = agent_response.find("\n\n", search_start, search_end)
+            while position != -1:
+                paragraph_breaks.append(position)
+                position = agent_response.find("\n\n", position + 1, search_end)
             
             if paragraph_breaks:
                 split_point = paragraph_breaks[len(paragraph_breaks) // 2]
@@ -0,0 +1,318 @@
+"""
+Documentation Result Cache for AIVA MCP Server
+Persistent, content-addressed cache for Code Documenter Agent results.
+
+Features:
+- Keys derived from (normalized source hash, instruction template hash, language, include_analysis,
+  pipeline settings that change the output)
+- Thread-safe access with on-disk persistence (one JSON file per entry)
+- Size-bounded LRU eviction (entry count and total bytes)
+- Hit/miss/eviction statistics, mirroring CredentialCache in caching.py
+
+PersistentLRUCache holds the storage logic and is shared with other on-disk
+caches (see github_http_cache.py).
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+USE_DOC_RESULT_CACHE = os.getenv("USE_DOC_RESULT_CACHE", "true").lower() in ("true", "1", "yes", "y")
+DOC_RESULT_CACHE_DIR = os.getenv(
+    "DOC_RESULT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".aiva_cache", "documentation_results")
+)
+DOC_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("DOC_RESULT_CACHE_MAX_ENTRIES", "500"))
+DOC_RESULT_CACHE_MAX_BYTES = int(os.getenv("DOC_RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Results starting with these prefixes are error messages and must never be cached
+_UNCACHEABLE_PREFIXES = ("Error", "ERROR", "WARNING", "❌", "⚠️")
+# Written into a chunked result when chunks failed and their code is missing (see
+# code_documentation_helper); a partial result caused by a transient agent failure
+# must not be served on every later hit
+PARTIAL_RESULT_MARKER = "WARNING: Incomplete documentation - "
+# Placeholders of failed chunks, in case one reaches a result
+_CHUNK_FAILURE_MARKERS = (PARTIAL_RESULT_MARKER, "// Error processing chunk ", "// Exception in chunk ",
+                          "// Error: Chunk ", "// Error: Region ")
+
+
+def normalize_source(source: str) -> str:
+    """
+    Normalize source code so that cosmetic differences do not change the cache key.
+
+    Line endings are unified, trailing whitespace is stripped from every line and
+    leading/trailing blank lines are removed.
+    """
+    lines = source.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ResultCacheEntry:
+    """Represents a cached documentation result with metadata"""
+    key: str
+    size: int
+    created_at: float
+    last_accessed: float = field(default_factory=time.time)
+    access_count: int = 0
+
+
+class PersistentLRUCache:
+    """
+    Thread-safe, persistent LRU cache of JSON-serializable values.
+
+    Entries are stored as ``<key>.json`` files in ``cache_dir``; the in-memory
+    index is rebuilt from the directory on first use so values survive restarts.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int, max_bytes: int):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory where cache entries are persisted
+            max_size: Maximum number of entries to keep
+            max_bytes: Maximum total size of cached entries in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._index: Dict[str, ResultCacheEntry] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+
+        # Performance metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the in-memory index from the cache directory (once)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                key = name[:-len(".json")]
+                self._index[key] = ResultCacheEntry(
+                    key=key,
+                    size=stat.st_size,
+                    created_at=stat.st_mtime,
+                    last_accessed=stat.st_mtime
+                )
+                self._total_bytes += stat.st_size
+            if self._index:
+                logger.info(f"Cache loaded {len(self._index)} entries from {self.cache_dir}")
+        except OSError as e:
+            logger.warning(f"Cache directory unavailable ({self.cache_dir}): {e}")
+
+    def _remove(self, key: str):
+        """Remove an entry from the index and disk"""
+        entry = self._index.pop(key, None)
+        if entry:
+            self._total_bytes -= entry.size
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict_lru(self, incoming_size: int = 0):
+        """Evict least recently used entries until the new entry fits"""
+        if len(self._index) < self.max_size and self._total_bytes + incoming_size <= self.max_bytes:
+            return
+
+        sorted_items = sorted(self._index.values(), key=lambda e: e.last_accessed)
+
+        # Remove 20% of cache to make room, then keep going if still over the byte budget
+        items_to_remove = max(1, len(sorted_items) // 5)
+        for i, entry in enumerate(sorted_items):
+            if (i >= items_to_remove and
+                    self._total_bytes + incoming_size <= self.max_bytes):
+                break
+            self._remove(entry.key)
+            self._evictions += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from cache
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value or None if not found
+        """
+        with self._lock:
+            self._load_index()
+            entry = self._index.get(key)
+            if entry is not None:
+                try:
+                    with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                        value = json.load(f)["value"]
+                    entry.access_count += 1
+                    entry.last_accessed = time.time()
+                    try:
+                        os.utime(self._entry_path(key))
+                    except OSError:
+                        pass
+                    self._hits += 1
+                    return value
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                    self._remove(key)
+
+            self._misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """
+        Store a value in cache
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value to cache
+        """
+        payload = json.dumps({"value": value, "created_at": time.time()})
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.info(f"Value too large to cache ({size} bytes)")
+            return
+
+        with self._lock:
+            self._load_index()
+            if key in self._index:
+                self._remove(key)
+            self._evict_lru(size)
+
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = self._entry_path(key) + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._entry_path(key))
+            except OSError as e:
+                logger.warning(f"Could not persist cache entry: {e}")
+                return
+
+            now = time.time()
+            self._index[key] = ResultCacheEntry(key=key, size=size, created_at=now, last_accessed=now)
+            self._total_bytes += size
+
+    def invalidate(self, key: str):
+        """Remove a specific key from cache"""
+        with self._lock:
+            self._load_index()
+            self._remove(key)
+
+    def clear(self):
+        """Clear all cache entries"""
+        with self._lock:
+            self._load_index()
+            for key in list(self._index.keys()):
+                self._remove(key)
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            self._load_index()
+            total_requests = self._hits + self._misses
+            hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
+
+            return {
+                "size": len(self._index),
+                "max_size": self.max_size,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": f"{hit_rate:.2f}%",
+                "total_requests": total_requests,
+                "cache_dir": self.cache_dir
+            }
+
+
+class DocumentationResultCache(PersistentLRUCache):
+    """Persistent LRU cache for documentation results, keyed by request content"""
+
+    def __init__(self, cache_dir: str = DOC_RESULT_CACHE_DIR,
+                 max_size: int = DOC_RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = DOC_RESULT_CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_size, max_bytes)
+
+    @staticmethod
+    def make_key(source: str, instruction: str, language: str = "", include_analysis: bool = True,
+                 settings: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build a content-addressed cache key.
+
+        Args:
+            source: Source code (or full prompt) sent to the agent
+            instruction: Instruction template the prompt is built from
+            language: Programming language of the source, if known
+            include_analysis: Whether PART 1 analysis was requested
+            settings: JSON-serializable pipeline settings that change the result
+                (chunk instructions, analysis mode, large-file strategy, ...)
+
+        Returns:
+            Hex digest identifying the request
+        """
+        parts = [
+            _sha256(normalize_source(source)),
+            _sha256(instruction),
+            (language or "").lower(),
+            "analysis" if include_analysis else "code_only",
+            _sha256(json.dumps(settings or {}, sort_keys=True)),
+        ]
+        return _sha256("|".join(parts))
+
+
+def is_cacheable_result(result: Optional[str]) -> bool:
+    """Only complete, successful agent results are worth caching"""
+    if not result or not result.strip() or result.strip().startswith(_UNCACHEABLE_PREFIXES):
+        return False
+    return not any(marker in result for marker in _CHUNK_FAILURE_MARKERS)
+
+
+# Global cache instance
+result_cache = DocumentationResultCache()
+
+
+def get_result_cache_stats() -> Dict[str, Any]:
+    """Get documentation result cache statistics"""
+    stats = result_cache.stats()
+    stats["enabled"] = USE_DOC_RESULT_CACHE
+    return stats
+
+
+def clear_result_cache():
+    """Clear the documentation result cache"""
+    result_cache.clear()
+    logger.info("Documentation result cache cleared")
@@ -0,0 +1,127 @@
+"""
+Single-Flight Request Coalescing for AIVA MCP Server
+Deduplicates identical documentation and agent requests that are in flight at the same time.
+
+When two users (or an agent retry) ask for the same work at the same moment, only the
+first caller (the leader) runs it; every concurrent caller with the same key waits for
+the leader and receives the same result or exception. Nothing is kept after the call
+finishes - completed results are the job of result_cache.py.
+
+Keys are built by flight_key() from the operation, its scope (repository, path, agent)
+and the blob SHA of the source or a hash of the content.
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .metrics import current_span
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+USE_REQUEST_COALESCING = os.getenv("USE_REQUEST_COALESCING", "true").lower() in ("true", "1", "yes", "y")
+
+
+def flight_key(operation: str, *scope: Optional[str], blob_sha: Optional[str] = None, content: Optional[str] = None) -> str:
+    """
+    Build a single-flight key.
+
+    Args:
+        operation: Operation name ("generate_documentation", "invoke_agent", ...)
+        *scope: Repository, path, agent, ... (None and "" are kept as empty fields)
+        blob_sha: Git blob SHA of the source, when known
+        content: Source or prompt text, hashed when no blob SHA is given
+
+    Returns:
+        Key string identifying identical requests
+    """
+    if blob_sha:
+        version = f"blob:{blob_sha}"
+    else:
+        version = "sha256:" + hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+    return "|".join([operation, *(part or "" for part in scope), version])
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    do() serves blocking callers (worker threads), do_async() serves coroutines;
+    both share the same in-flight table, so a thread and a task asking for the same
+    key also share one run.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    def _join(self, key: str):
+        """Return (future, is_leader) for key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self._stats["executions"] += 1
+                return future, True
+            self._stats["coalesced"] += 1
+        logger.info(f"[{self.name}] Joining in-flight request {key[:120]}")
+        current_span().add("coalesced")
+        return future, False
+
+    def _complete(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) unless a call with the same key is in flight,
+        in which case wait for it and return (or raise) its outcome.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._complete(key, future, error=e)
+            raise
+        self._complete(key, future, result)
+        return result
+
+    async def do_async(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Await func(*args, **kwargs) unless a call with the same key is in flight,
+        in which case await its outcome without blocking the event loop.
+
+        A follower that is cancelled leaves the shared run alone; if the leader is
+        cancelled, its followers receive the CancelledError as well.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._complete(key, future, error=e)
+            raise
+        self._complete(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Get execution/coalescing counters and the number of calls in flight"""
+        with self._lock:
+            return {"in_flight": len(self._calls), **self._stats}
@@ -0,0 +1,174 @@
+"""
+Token Counter for AIVA MCP Server
+Pluggable token counting used to budget prompts and chunks in model tokens.
+
+The default counter uses tiktoken's BPE encoder when the package is installed;
+the encoder is loaded once per encoding and shared. Without tiktoken an
+approximate local BPE counter is used: text is split with the same kind of
+pre-tokenization regex GPT tokenizers apply before merging, and every piece is
+costed from its length and character class (piece costs are memoized).
+
+Any object with ``count(text) -> int`` can be installed with set_token_counter().
+
+Version: 1.0.0
+Date: 18/10/2026
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration loaded from environment (.env)
+# "auto" uses tiktoken when installed, otherwise the approximate counter
+TOKEN_COUNTER = os.getenv("TOKEN_COUNTER", "auto").lower()
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+
+class TokenCounter:
+    """Base class for token counters."""
+
+    name = "base"
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in text"""
+        raise NotImplementedError
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Return the longest prefix of text that fits in max_tokens.
+
+        The generic version binary-searches the prefix length, which needs
+        O(log n) counts; counters that can decode tokens override it.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str):
+    """Load a tiktoken encoding once per process"""
+    return tiktoken.get_encoding(encoding_name)
+
+
+class TiktokenCounter(TokenCounter):
+    """Exact BPE token counts using tiktoken."""
+
+    def __init__(self, encoding_name: str = TOKENIZER_ENCODING):
+        if not TIKTOKEN_AVAILABLE:
+            raise ImportError("tiktoken is not installed")
+        self.encoding_name = encoding_name
+        self.name = f"tiktoken:{encoding_name}"
+
+    def count(self, text: str) -> int:
+        return len(_get_encoding(self.encoding_name).encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        encoding = _get_encoding(self.encoding_name)
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+
+# Pre-tokenization in the style of the GPT BPE tokenizers: contractions, words with
+# an optional leading space, numbers of up to 3 digits, punctuation runs, whitespace
+_PRETOKENIZE_PATTERN = re.compile(
+    r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|_+|\s+(?!\S)|\s+"""
+)
+# Case/underscore boundaries inside identifiers usually start a new token
+_SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[^\W\d_]+")
+
+
+@lru_cache(maxsize=65536)
+def _piece_tokens(piece: str) -> int:
+    """Estimated BPE token count of one pre-tokenized piece"""
+    text = piece.lstrip(" ")
+    if not text:
+        return 1
+    if text.isspace():
+        # Indentation and blank lines merge into few tokens
+        return max(1, math.ceil(len(text) / 8))
+    if not text.isascii():
+        # Non-ASCII text is split into byte-level tokens more often
+        return max(1, math.ceil(len(text.encode("utf-8")) / 3))
+    if text[0].isdigit():
+        return 1
+    if text[0].isalpha():
+        # Common words are one token; long identifiers split per subword
+        return sum(max(1, math.ceil(len(part) / 6)) for part in _SUBWORD_PATTERN.findall(text)) or 1
+    # Punctuation runs: frequent pairs such as "()", "=>", "{\n" merge
+    return max(1, math.ceil(len(text) / 2))
+
+
+class ApproximateBPECounter(TokenCounter):
+    """Dependency-free token estimate using BPE-style pre-tokenization."""
+
+    name = "approximate-bpe"
+
+    def count(self, text: str) -> int:
+        return sum(_piece_tokens(match.group()) for match in _PRETOKENIZE_PATTERN.finditer(text))
+
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+
+
+def _create_default_counter() -> TokenCounter:
+    """Build the counter selected by TOKEN_COUNTER"""
+    if TOKEN_COUNTER in ("auto", "tiktoken") and TIKTOKEN_AVAILABLE:
+        try:
+            counter = TiktokenCounter()
+            counter.count("warm up")  # Loads (and caches) the encoder now rather than mid-request
+            return counter
+        except Exception as e:
+            logger.warning(f"tiktoken encoder '{TOKENIZER_ENCODING}' unavailable ({e}), using approximate counter")
+    elif TOKEN_COUNTER == "tiktoken":
+        logger.warning("TOKEN_COUNTER=tiktoken but tiktoken is not installed, using approximate counter")
+    return ApproximateBPECounter()
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide token counter (created on first use)"""
+    global _counter
+    with _counter_lock:
+        if _counter is None:
+            _counter = _create_default_counter()
+            logger.info(f"Token counter: {_counter.name}")
+        return _counter
+
+
+def set_token_counter(counter: Optional[TokenCounter]):
+    """Install a custom token counter (None restores the default)"""
+    global _counter
+    with _counter_lock:
+        _counter = counter
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text with the configured counter"""
+    return get_token_counter().count(text)